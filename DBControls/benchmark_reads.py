@@ -0,0 +1,77 @@
+"""
+Compares ORM reads (`Hedgeye.getData`, `NASDAQ.getData`) with the raw fast path in fast_read.py on a synthetic history.
+Usage: python -m DBControls.benchmark_reads [number of tickers] [number of days]
+"""
+
+from DBControls.db_read_write import Hedgeye, NASDAQ, configureDatabase, disposeEngines
+from DBControls.fast_read import readHedgeye, readComposite
+from DBControls.query_cache import query_cache
+from datetime import date, timedelta
+from time import perf_counter
+import tempfile
+import random
+import sys
+import os
+
+
+def buildHistory(tickers, days):
+    """Writes `days` weekdays of fake rows for `tickers` tickers into the current database."""
+    day = date(2015, 1, 1)
+    hedgeye_rows, nasdaq_rows = [], []
+
+    while len(nasdaq_rows) < days:
+        if day.weekday() < 5:
+            for t in range(tickers):
+                close = random.uniform(10, 500)
+                hedgeye_rows.append({'date': day.isoformat(), 'ticker': f'T{t:03d}', 'description': f'TICKER {t}',
+                                     'buy': close * 0.95, 'sell': close * 1.05, 'close': close, 'delta_ww': 0.0,
+                                     'od_delta': 0.0, 'ow_delta': 0.0, 'om_delta': 0.0, 'tm_delta': 0.0, 'sm_delta': 0.0,
+                                     'oy_delta': 0.0, 'ra_buy': -5.0, 'ra_sell': 5.0})
+            nasdaq_rows.append({'date': day.isoformat(), 'advancing_V': 1.0, 'declining_V': 1.0, 'total_V': 2.0,
+                                'advances': 2000.0, 'declines': 2000.0, 'net_hl': 0.0})
+        day += timedelta(days=1)
+
+    Hedgeye.writeMany(hedgeye_rows)
+    NASDAQ.writeMany(nasdaq_rows)
+    return [row['date'] for row in nasdaq_rows]
+
+
+def timeIt(function, repeat):
+    """Returns the best of `repeat` timings of function() and its result. Every run starts from an empty query cache, so reads hit the database."""
+    best = float('inf')
+    for _ in range(repeat):
+        query_cache.clear() # Otherwise every run after the first times a dictionary lookup
+        start = perf_counter()
+        result = function()
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def report(label, orm, fast, rows):
+    print(f'{label:<34} ORM {orm * 1e3:8.2f} ms   fast {fast * 1e3:8.2f} ms   '
+          f'{orm / rows * 1e6:6.2f} -> {fast / rows * 1e6:5.2f} us/row   x{orm / fast:4.1f}')
+
+
+if __name__ == '__main__':
+    tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    with tempfile.TemporaryDirectory() as directory:
+        configureDatabase(os.path.join(directory, 'benchmark.db'))
+        dates = buildHistory(tickers, days)
+        print(f'{tickers} tickers x {days} days = {tickers * days} Hedgeye rows\n')
+
+        orm, rows = timeIt(lambda: Hedgeye.getData(ticker='T000'), 5)
+        fast, _ = timeIt(lambda: readHedgeye(ticker='T000'), 5)
+        report('One ticker, full history', orm, fast, len(rows))
+
+        orm, rows = timeIt(lambda: Hedgeye.getData(date=dates[-1]), 20)
+        fast, _ = timeIt(lambda: readHedgeye(date=dates[-1]), 20)
+        report('One date, every ticker', orm, fast, len(rows))
+
+        sample = dates[-250:]
+        orm, _ = timeIt(lambda: [NASDAQ.getData(date=d) for d in sample], 3)
+        fast, _ = timeIt(lambda: [readComposite(NASDAQ, date=d) for d in sample], 3)
+        report('250 single-row NASDAQ lookups', orm, fast, len(sample))
+
+        disposeEngines()
@@ -1,20 +1,104 @@
-from datetime import datetime, timedelta
+from DBControls.db_read_write import BreadthIndicators, IndicatorState, createSession
+from DBControls.fast_read import readCompositeArrays, readIndicatorHistory, readIndicatorState
+from DBControls.hedgeye_metrics import round_values
+from DBControls.trading_calendar import trading_calendar
+from DBControls.day_numbers import toDayNumber, fromDayNumber, validateDate
+from collections import namedtuple
 import numpy as np
 
+# The lookbacks walk back a span of calendar days over trading sessions and sum the newest N sessions with data
+# together with today's value. {metric: (span in days, earlier sessions summed)}
+WINDOWS = {
+    'td_breakaway': (40, 9),
+    'Td_breakaway': (50, 19),
+    'fd_ad_thrust': (30, 4),
+    'fd_ud_V_thrust': (30, 4),
+    'tod_avg': (50, 20),
+    'std_avg': (100, 62)
+}
+VOLUME_DELTA_DAYS = 49 # The volume delta compares with the newest session in this many days
+HISTORY_DAYS = max(span for span, _ in WINDOWS.values()) # Everything a row can look back to
+HISTORY_COLUMNS = ('total_V', 'advancing_V', 'declining_V', 'advances', 'declines', 'net_hl')
+RAW_COLUMNS = ('advancing_V', 'declining_V', 'total_V', 'advances', 'declines', 'new_highs', 'new_lows')
+DERIVED_COLUMNS = ('delta_V', 'upside_day', 'downside_day', 'net_ad', 'td_breakaway', 'Td_breakaway', 'ad_ratio', 'ad_thrust',
+                   'fd_ad_thrust', 'fd_ud_V_thrust', 'net_hl', 'tod_avg', 'std_avg')
 
-def compute_volume_delta(table, date, total_V):
+
+def lookback_days():
+    """Calendar days of history a new row needs: the lookback windows and the window of every registered indicator
+    (recursive ones carry their history in their persisted state instead), None for all of it."""
+    windows = [HISTORY_DAYS] + [indicator.window for indicator in INDICATORS.values() if indicator.step is None]
+    return None if None in windows else max(windows)
+
+
+def load_sessions(table, start=None, end=None):
+    """
+    Loads the history columns and every registered indicator input between two day numbers with one query.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        start (int, optional): First day number to include. Defaults to None (no lower bound).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+    Returns:\n
+        dict: `readCompositeArrays` arrays of the trading sessions only, sorted by day.
+    """
+    inputs = [column for indicator in INDICATORS.values() for column in indicator.inputs if column not in INDICATORS]
+    arrays = readCompositeArrays(table, tuple(dict.fromkeys(HISTORY_COLUMNS + tuple(inputs))), start, end)
+    sessions = np.isin(arrays['day'], trading_calendar.sessions) # Holidays are never looked back to
+    return {key: array[sessions] for key, array in arrays.items()}
+
+
+def load_history(table, date):
+    """
+    Fetches everything the lookbacks and the registered indicators of one row can reference with a single query.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        date (str): Date of the row being computed, 'yyyy-mm-dd'.\n
+    Returns:\n
+        dict: `load_sessions` arrays of the `lookback_days` before the date.
+    """
+    day = toDayNumber(date)
+    days = lookback_days()
+    return load_sessions(table, day - days if days is not None else None, day - 1)
+
+
+def prefix_sums(values):
+    """Cumulative sums with a leading 0, so the sum of values[i:j] is sums[j] - sums[i]."""
+    return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+
+def window_sums(days, sums, targets, span, count):
+    """
+    Rolling sums over sessions for many target days at once, in O(1) per target.\n
+    Args:\n
+        days (numpy.ndarray): Sorted day numbers of the rows with data.\n
+        sums (numpy.ndarray): `prefix_sums` of the column being summed, aligned with days.\n
+        targets (numpy.ndarray): Day numbers to compute the window before (the target day itself is excluded).\n
+        span (int): Calendar days the window reaches back.\n
+        count (int): Newest rows within the span to sum.\n
+    Returns:\n
+        numpy.ndarray: float64 sums, NaN where fewer than count rows fall within the span.
+    """
+    end = np.searchsorted(days, targets, side='left') # Rows before the target
+    first = np.searchsorted(days, targets - span, side='left') # Oldest row within the span
+    start = np.maximum(end - count, 0)
+    return np.where(end - first >= count, sums[end] - sums[start], np.nan)
+
+
+def window_sum(history, date, column, span, count):
+    """Scalar `rolling_sums` of one history column before date, or None when the window is short or has a missing value."""
+    total = rolling_sums(history['day'], history[column], np.array([toDayNumber(date)]), span, count)[0]
+    return None if np.isnan(total) else float(total)
+
+
+def compute_volume_delta(table, date, total_V, history=None):
     """[(total_V - old_data.total_V) / old_data.total_V] * 100 (%)"""
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    history = history if history is not None else load_history(table, date)
+    day = toDayNumber(date)
+    i = np.searchsorted(history['day'], day, side='left') - 1 # Newest session before the date
     
-    for i in range(1, 50):
-        new_date_obj = date_obj - timedelta(days=i)
-        
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = table.getData(date=new_date)
-        
-            if old_data:
-                return round(((total_V - old_data.total_V) / old_data.total_V) * 100, 2)
+    if i >= 0 and history['day'][i] >= day - VOLUME_DELTA_DAYS:
+        old_total_V = float(history['total_V'][i])
+        return round(((total_V - old_total_V) / old_total_V) * 100, 2)
     return None
         
 
@@ -39,54 +123,32 @@ def compute_net_advance_decline(advances, declines):
     return round(advances - declines, 2)
 
 
-def compute_td_breakaway_momentum(table, date, advances, declines):
+def compute_td_breakaway_momentum(table, date, advances, declines, history=None):
     """(sum of advances in 10 days) / (sum of declines in 10 days)"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    history = history if history is not None else load_history(table, date)
+    A = window_sum(history, date, 'advances', *WINDOWS['td_breakaway'])
+    D = window_sum(history, date, 'declines', *WINDOWS['td_breakaway'])
+    if A is None or D is None:
+        return None
     
-    for _ in range(40):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append((old_data.advances, old_data.declines))
-
-        if len(data) == 9:        
-            A = (advances + np.sum(np.array(data)[:, 0]))
-            D = (declines + np.sum(np.array(data)[:, 1]))
-
-            if D == 0:
-                raise ZeroDivisionError('10-Day sum of declines is 0. Cannot calculate 10-Day Breakaway Momentum.')
-            return round(A / D, 2)
-    return None
+    A, D = advances + A, declines + D
+    if D == 0:
+        raise ZeroDivisionError('10-Day sum of declines is 0. Cannot calculate 10-Day Breakaway Momentum.')
+    return round(A / D, 2)
     
     
-def compute_Td_breakaway_momentum(table, date, advances, declines):
+def compute_Td_breakaway_momentum(table, date, advances, declines, history=None):
     """(sum of advances in 20 days) / (sum of declines in 20 days)"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    history = history if history is not None else load_history(table, date)
+    A = window_sum(history, date, 'advances', *WINDOWS['Td_breakaway'])
+    D = window_sum(history, date, 'declines', *WINDOWS['Td_breakaway'])
+    if A is None or D is None:
+        return None
     
-    for _ in range(50):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append((old_data.advances, old_data.declines))
-
-        if len(data) == 19:
-            A = (advances + np.sum(np.array(data)[:, 0]))
-            D = (declines + np.sum(np.array(data)[:, 1]))
-
-            if D == 0:
-                raise ZeroDivisionError('20-Day sum of declines is 0. Cannot calculate 20-Day Breakaway Momentum.')
-            return round(A / D, 2)
-    return None
+    A, D = advances + A, declines + D
+    if D == 0:
+        raise ZeroDivisionError('20-Day sum of declines is 0. Cannot calculate 20-Day Breakaway Momentum.')
+    return round(A / D, 2)
     
 
 def compute_advance_decline_ratio(advances, declines):
@@ -105,55 +167,33 @@ def compute_advance_decline_thrust(advances, declines):
     return round((advances / (advances + declines)) * 100, 2)
 
 
-def compute_fd_advance_decline_thrust(table, date, advances, declines):
+def compute_fd_advance_decline_thrust(table, date, advances, declines, history=None):
     """[(sum of advances in 5 days) / ((sum of advances in 5 days) + (sum of advances in 5 days))] * 100 (%)"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    history = history if history is not None else load_history(table, date)
+    A = window_sum(history, date, 'advances', *WINDOWS['fd_ad_thrust'])
+    D = window_sum(history, date, 'declines', *WINDOWS['fd_ad_thrust'])
+    if A is None or D is None:
+        return None
     
-    for _ in range(30):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append((old_data.advances, old_data.declines))
-        
-        if len(data) == 4:
-            A = (advances + np.sum(np.array(data)[:, 0]))
-            D = (declines + np.sum(np.array(data)[:, 1]))
-
-            if (A + D) == 0:
-                raise ZeroDivisionError('5-Day sum of advances and declines is 0. Cannot calculate 5-Day Whaley Breadth percentage.')
-            return round((A / (A + D)) * 100, 2)
-    return None
+    A, D = advances + A, declines + D
+    if (A + D) == 0:
+        raise ZeroDivisionError('5-Day sum of advances and declines is 0. Cannot calculate 5-Day Whaley Breadth percentage.')
+    return round((A / (A + D)) * 100, 2)
     
     
-def compute_fd_up_down_volume(table, date, advancing_V, declining_V):
+def compute_fd_up_down_volume(table, date, advancing_V, declining_V, history=None):
     """[(sum of advancing_volume in 5 days) / ((sum of advancing_volume in 5 days) + (sum of declining_volume in 5 days))] * 100 (%)"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    history = history if history is not None else load_history(table, date)
+    A = window_sum(history, date, 'advancing_V', *WINDOWS['fd_ud_V_thrust'])
+    D = window_sum(history, date, 'declining_V', *WINDOWS['fd_ud_V_thrust'])
+    if A is None or D is None:
+        return None
     
-    for _ in range(30):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append((old_data.advancing_V, old_data.declining_V))
-
-        if len(data) == 4:
-            A = (advancing_V + np.sum(np.array(data)[:, 0]))
-            D = (declining_V + np.sum(np.array(data)[:, 1]))
-
-            if (A + D) == 0:
-                raise ZeroDivisionError('5-Day sum of advanceing volume and declining volumn is 0.' + 
-                                        'Cannot calculate 5-Day Up/Down Volume Thrust percentage.')
-            return round((A / (A + D)) * 100, 2)
-    return None
+    A, D = advancing_V + A, declining_V + D
+    if (A + D) == 0:
+        raise ZeroDivisionError('5-Day sum of advanceing volume and declining volumn is 0.' + 
+                                'Cannot calculate 5-Day Up/Down Volume Thrust percentage.')
+    return round((A / (A + D)) * 100, 2)
     
     
 def compute_net_highs_lows(new_highs, new_lows):
@@ -161,53 +201,29 @@ def compute_net_highs_lows(new_highs, new_lows):
     return round(new_highs - new_lows, 2)
 
 
-def compute_tod_avg_highs_lows(table, date, today_net_hl):
+def compute_tod_avg_highs_lows(table, date, today_net_hl, history=None):
     """(sum of last 21 new highs and lows) / 21"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
-    
-    for _ in range(50):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append(old_data.net_hl)
-
-        if len(data) == 20:
-            net_sum = (today_net_hl + np.sum(np.array(data)))
-            return round(net_sum / 21, 2)
-    return None
+    history = history if history is not None else load_history(table, date)
+    net_sum = window_sum(history, date, 'net_hl', *WINDOWS['tod_avg'])
+    if net_sum is None:
+        return None
+    return round((today_net_hl + net_sum) / 21, 2)
 
 
-def compute_std_avg_highs_lows(table, date, today_net_hl):
+def compute_std_avg_highs_lows(table, date, today_net_hl, history=None):
     """(sum of last 63 new highs and lows) / 63"""
-    data = []
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
-    
-    for _ in range(100):
-        new_date_obj = date_obj - timedelta(days=1)
-        new_date = new_date_obj.strftime('%Y-%m-%d')
-        date_obj = datetime.strptime(new_date, '%Y-%m-%d')
-        
-        if new_date_obj.weekday() < 5:
-            old_data = table.getData(date=new_date)
-            if old_data:
-                data.append(old_data.net_hl)
-
-        if len(data) == 62:        
-            net_sum = (today_net_hl + np.sum(np.array(data)))
-            return round(net_sum / 63, 2)
-    return None
+    history = history if history is not None else load_history(table, date)
+    net_sum = window_sum(history, date, 'net_hl', *WINDOWS['std_avg'])
+    if net_sum is None:
+        return None
+    return round((today_net_hl + net_sum) / 63, 2)
 
 
-def add_row(table, date, advancing_V, declining_V, total_V, close, advances, declines, new_highs, new_lows):
+def compute_row(table, date, advancing_V, declining_V, total_V, close, advances, declines, new_highs, new_lows, history=None):
     """
-    Adds a new row to the given table with the provided market data. It also calculates market performance metrics and stores them in the database.\n
+    Validates the provided market data and calculates the market performance metrics for a new row without writing it.\n
     Args:\n
-        table (Table object): The table object where the data will be written.\n
+        table (Table object): The table object whose history is used for the calculations.\n
         date (str): The date in the format yyyy-mm-dd.\n
         advancing_V (int, float): The advancing volume for the day.\n
         declining_V (int, float): The declining volume for the day.\n
@@ -216,6 +232,9 @@ def add_row(table, date, advancing_V, declining_V, total_V, close, advances, dec
         declines (int, float): Declining issues for the day.\n
         new_highs (int, float): New highs for the day.\n
         new_lows (int, float): New lows for the day.\n
+        history (dict, optional): Result of `load_history` for the table and date. Defaults to None (fetched).\n
+    Returns:\n
+        dict: Row keyed like the arguments of `table.writeData`.\n
     Raises:\n
         TypeError: If the date is not a string, or if any of the other input values are not float or integer.\n
         ValueError: If the date is not in the correct format.\n
@@ -230,30 +249,442 @@ def add_row(table, date, advancing_V, declining_V, total_V, close, advances, dec
     if not isinstance(advances, (int, float)) or not isinstance(declines, (int, float)) or not isinstance(new_highs, (int, float)) or not isinstance(new_lows, (int, float)):
         raise TypeError('Advances, declines, new highs, or new lows has a non-float or integer type.')
     
-    if date:
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
-        except:
-            ValueError('Date is not in the correct formate of yyyy-mm-dd.')
+    validateDate(date)
             
     if declines == 0: # Prevents future errors
         raise ZeroDivisionError('Declines value is 0. Cannot add new row to table table.')
     
-    delta_V = compute_volume_delta(table, date, total_V)
-    upside_day = compute_upside_day(advancing_V, declining_V)
-    downside_day = compute_downside_day(advancing_V, declining_V)
-    net_ad = compute_net_advance_decline(advances, declines)
-    td_breakaway = compute_td_breakaway_momentum(table, date, advances, declines)
-    Td_breakaway = compute_Td_breakaway_momentum(table, date, advances, declines)
-    ad_ratio = compute_advance_decline_ratio(advances, declines)
-    ad_thrust = compute_advance_decline_thrust(advances, declines)
-    fd_ad_thrust = compute_fd_advance_decline_thrust(table, date, advances, declines)
-    fd_ud_volume = compute_fd_up_down_volume(table, date, advancing_V, declining_V)
     net_hl = compute_net_highs_lows(new_highs, new_lows)
-    tod_avg_hl = compute_tod_avg_highs_lows(table, date, net_hl)
-    std_avg_hl = compute_std_avg_highs_lows(table, date, net_hl)
+    if history is None:
+        history = load_history(table, date) # One query serves every lookback
+    
+    return {
+        'date': date,
+        'advancing_V': advancing_V,
+        'declining_V': declining_V,
+        'total_V': total_V,
+        'delta_V': compute_volume_delta(table, date, total_V, history),
+        'close': close,
+        'upside_day': compute_upside_day(advancing_V, declining_V),
+        'downside_day': compute_downside_day(advancing_V, declining_V),
+        'advances': advances,
+        'declines': declines,
+        'net_ad': compute_net_advance_decline(advances, declines),
+        'td_breakaway': compute_td_breakaway_momentum(table, date, advances, declines, history),
+        'Td_breakaway': compute_Td_breakaway_momentum(table, date, advances, declines, history),
+        'ad_ratio': compute_advance_decline_ratio(advances, declines),
+        'ad_thrust': compute_advance_decline_thrust(advances, declines),
+        'fd_ad_thrust': compute_fd_advance_decline_thrust(table, date, advances, declines, history),
+        'fd_ud_V_thrust': compute_fd_up_down_volume(table, date, advancing_V, declining_V, history),
+        'new_highs': new_highs,
+        'new_lows': new_lows,
+        'net_hl': net_hl,
+        'tod_avg': compute_tod_avg_highs_lows(table, date, net_hl, history),
+        'std_avg': compute_std_avg_highs_lows(table, date, net_hl, history)
+    }
+
+
+def add_row(table, date, advancing_V, declining_V, total_V, close, advances, declines, new_highs, new_lows):
+    """
+    Adds a new row to the given table with the provided market data. It also calculates market performance metrics 
+    (see `compute_row`) and the registered breadth indicators, and stores them in the database in one transaction.\n
+    Args:\n
+        table (Table object): The table object where the data will be written.\n
+        date (str): The date in the format yyyy-mm-dd.\n
+        advancing_V (int, float): The advancing volume for the day.\n
+        declining_V (int, float): The declining volume for the day.\n
+        close (int, float): The closing price for the day.\n
+        advances (int, float): Advancing issues for the day.\n
+        declines (int, float): Declining issues for the day.\n
+        new_highs (int, float): New highs for the day.\n
+        new_lows (int, float): New lows for the day.\n
+    Raises:\n
+        TypeError: If the date is not a string, or if any of the other input values are not float or integer.\n
+        ValueError: If the date is not in the correct format.\n
+        ZeroDivisionError: If the declines value is 0.
+    """
+    add_rows(date, {table: {'advancing_V': advancing_V, 'declining_V': declining_V, 'total_V': total_V, 'close': close, 
+                            'advances': advances, 'declines': declines, 'new_highs': new_highs, 'new_lows': new_lows}})
+
+
+def add_rows(date, data):
+    """
+    Adds one session to several composite tables (e.g. the NASDAQ and NYSE of a market diary) in one transaction. 
+    See `add_row` for validation, and `compute_row` and `compute_indicator_rows` for what is computed.\n
+    Args:\n
+        date (str): The date in the format yyyy-mm-dd.\n
+        data (dict): {table: {'advancing_V', 'declining_V', 'total_V', 'close', 'advances', 'declines', 'new_highs', 'new_lows'}}.\n
+    Raises:\n
+        TypeError: If the date is not a string, or if any of the other input values are not float or integer.\n
+        ValueError: If the date is not in the correct format.\n
+        ZeroDivisionError: If a declines value is 0.
+    """
+    computed = []
+    for table, values in data.items():
+        history = load_history(table, date) # One query serves the metrics and the breadth indicators
+        row = compute_row(table, date, history=history, **values)
+        computed.append((table, row, *compute_indicator_rows(table, row, history)))
+    
+    with createSession() as session:
+        for table, row, indicator_rows, states in computed:
+            table.writeMany([row], session=session)
+            BreadthIndicators.writeMany(indicator_rows, on_conflict='update', session=session) # A backlog rewrites the later sessions
+            IndicatorState.writeMany(states, session=session)
+        session.commit()
+
+
+# -------------------------------------------------------------------------------------------------
+# Breadth indicator registry
+
+
+# Indicators are stored one value per (exchange, date, name) in the "Breadth Indicators" table and shown on the NASDAQ/NYSE
+# pages under their label, so adding one is a single registered function (no new column, compute_row, or page edits).
+# Recursive indicators (EMAs, running totals) also register a `step` that advances their last value by one session. Their
+# last value, its date, and a session counter are kept per exchange in the "Indicator State" table, so a new row costs O(1)
+# instead of a scan of the whole history.
+Indicator = namedtuple('Indicator', ['label', 'inputs', 'window', 'function', 'step'])
+INDICATORS = {} # {name: Indicator}, in registration order
+
+
+def indicator(name, label, inputs, window=0, step=None):
+    """
+    Decorator that registers a breadth indicator. The function receives the shared window (a dict of float64 arrays with 'day',
+    the inputs, and the indicators registered before it, one entry per trading session and the new row last) and returns an
+    array with a value for every session.\n
+    Args:\n
+        name (str): Key stored in the database. Never rename it once values are stored.\n
+        label (str or None): Name shown on the NASDAQ/NYSE pages. None keeps it off the pages (e.g. an intermediate EMA).\n
+        inputs (tuple(str)): Composite columns (see `RAW_COLUMNS`, `HISTORY_COLUMNS`) or earlier indicators it reads.\n
+        window (int, optional): Calendar days of history it needs before a row, None for the whole history. Defaults to 0.\n
+        step (function, optional): step(previous, row) -> value. Advances the indicator from its value on the previous session
+        (None before the first) with the new row's inputs (a dict of floats). Must give exactly what the function gives. Defaults to None.\n
+    Raises:\n
+        ValueError: If the name is taken, or a windowed indicator reads a stepped one (at ingest only its newest value exists).
+    """
+    def register(function):
+        if name in INDICATORS:
+            raise ValueError(f'Indicator {name} is already registered.')
+        if step is None and window != 0 and any(_newestOnly(column) for column in inputs):
+            raise ValueError(f'Indicator {name} looks back over a recursive indicator, which only has its newest value at ingest.')
+        
+        INDICATORS[name] = Indicator(label, inputs, window, function, step)
+        return function
+    return register
+
+
+def _newestOnly(name):
+    """True if an indicator is recursive or reads one with no window, so only its newest value is computed at ingest."""
+    registered = INDICATORS.get(name)
+    return registered is not None and (registered.step is not None or any(_newestOnly(column) for column in registered.inputs))
+
+
+def stepped_indicators():
+    """Names of the registered recursive indicators, the ones with persisted state."""
+    return [name for name, registered in INDICATORS.items() if registered.step is not None]
+
+
+def compute_indicators(window, state=None):
+    """
+    Runs every registered indicator over one shared window in a single pass.\n
+    Args:\n
+        window (dict): Arrays like `load_history` returns, sorted by day.\n
+        state (dict, optional): {name: value} of every recursive indicator on the session before the window's last row. When given,
+        they advance from it with their `step` and only their last value is computed. Defaults to None (computed from the window,
+        which then has to start at the first stored session).\n
+    Returns:\n
+        dict: {name: float64 array} aligned with window['day']. NaN where a value cannot be computed.
+    """
+    window = dict(window)
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, registered in INDICATORS.items():
+            if state is not None and registered.step is not None:
+                values = np.full(len(window['day']), np.nan)
+                values[-1] = registered.step(state.get(name), {key: float(array[-1]) for key, array in window.items()})
+            else:
+                values = np.array(registered.function(window), dtype=np.float64)
+            values[~np.isfinite(values)] = np.nan
+            results[name] = window[name] = values # Later indicators can build on earlier ones
+    return results
+
+
+def compute_indicator_rows(table, row, history=None):
+    """
+    Computes every registered indicator of a new composite row. Recursive indicators advance from the persisted state when it
+    is as of the newest stored session before the row. Otherwise (first run, out-of-order or repeated date) they are rebuilt
+    from the whole stored history once, and the values of every later session and the state are rebuilt with them.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        row (dict): New row from `compute_row`.\n
+        history (dict, optional): Result of `load_history` for the table and date. Defaults to None (fetched).\n
+    Returns:\n
+        tuple: (`BreadthIndicators.writeMany` rows from the row's date on, `IndicatorState.writeMany` rows), to be written together
+        with the row, overwriting stored values.
+    """
+    history = history if history is not None else load_history(table, row['date'])
+    day = toDayNumber(row['date'])
+    stepped = stepped_indicators()
+    stored = readIndicatorState(table) if stepped else {}
+    
+    previous_day = int(history['day'][-1]) if len(history['day']) else None
+    current = previous_day is not None and all(name in stored and stored[name].day == previous_day for name in stepped)
+    
+    if current:
+        window = {key: np.append(values, day if key == 'day' else row[key]) for key, values in history.items()}
+        results = compute_indicators(window, state={name: stored[name].value for name in stepped})
+        first = len(window['day']) - 1
+        states = [{'exchange': table.__tablename__, 'date': row['date'], 'name': name, 
+                   'sessions': stored[name].sessions + 1, 'value': _stateValue(results[name][-1])} for name in stepped]
+    else:
+        history = load_sessions(table) # Later sessions included, their recursive values depend on this row
+        first = int(np.searchsorted(history['day'], day, side='left'))
+        if first < len(history['day']) and history['day'][first] == day: # Repeated date, the stored row is kept
+            window = history
+        else:
+            window = {key: np.insert(values, first, day if key == 'day' else row[key]) for key, values in history.items()}
+        results = compute_indicators(window)
+        states = expected_state(table, window, results)
+    
+    dates = [fromDayNumber(later) for later in window['day'][first:].tolist()]
+    rows = [{'exchange': table.__tablename__, 'date': date, 'name': name, 'value': value} 
+            for name in INDICATORS for date, value in zip(dates, round_values(results[name][first:]))]
+    return rows, states
+
+
+def _stateValue(value):
+    """Persisted state keeps full precision, only NaN becomes None."""
+    return float(value) if value == value else None
+
+
+def ema_step(average, value, alpha):
+    """One exponential moving average update. The first value seeds it and a missing value carries it forward."""
+    if value != value: # NaN
+        return average
+    if average is None or average != average:
+        return value
+    return average + alpha * (value - average)
+
+
+def ema(values, alpha):
+    """Exponential moving average of a whole array with `ema_step`, so the incremental path gives identical floats."""
+    averages = np.empty(len(values))
+    average = None
+    for i, value in enumerate(values.tolist()):
+        average = ema_step(average, value, alpha)
+        averages[i] = np.nan if average is None else average
+    return averages
+
+
+@indicator('trin', 'TRIN (Arms Index)', ('advances', 'declines', 'advancing_V', 'declining_V'))
+def compute_trin(window):
+    """(advances / declines) / (advancing_V / declining_V)"""
+    return (window['advances'] / window['declines']) / (window['advancing_V'] / window['declining_V'])
+
+
+@indicator('rana', 'Ratio-Adjusted Net Advances', ('advances', 'declines'))
+def compute_rana(window):
+    """[(advances - declines) / (advances + declines)] * 1000"""
+    return ((window['advances'] - window['declines']) / (window['advances'] + window['declines'])) * 1000
+
+
+@indicator('mcclellan_fast_ema', None, ('advances', 'declines'), window=None, 
+           step=lambda previous, row: ema_step(previous, row['advances'] - row['declines'], 0.10))
+def compute_mcclellan_fast_ema(window):
+    """19-day EMA of net advances (smoothing constant 0.10)"""
+    return ema(window['advances'] - window['declines'], 0.10)
+
+
+@indicator('mcclellan_slow_ema', None, ('advances', 'declines'), window=None, 
+           step=lambda previous, row: ema_step(previous, row['advances'] - row['declines'], 0.05))
+def compute_mcclellan_slow_ema(window):
+    """39-day EMA of net advances (smoothing constant 0.05)"""
+    return ema(window['advances'] - window['declines'], 0.05)
+
+
+@indicator('mcclellan_oscillator', 'McClellan Oscillator', ('mcclellan_fast_ema', 'mcclellan_slow_ema'))
+def compute_mcclellan_oscillator(window):
+    """(19-day EMA of net advances) - (39-day EMA of net advances)"""
+    return window['mcclellan_fast_ema'] - window['mcclellan_slow_ema']
+
+
+@indicator('mcclellan_summation', 'McClellan Summation Index', ('mcclellan_oscillator',), window=None, 
+           step=lambda previous, row: (previous or 0.0) + (row['mcclellan_oscillator'] if row['mcclellan_oscillator'] == row['mcclellan_oscillator'] else 0.0))
+def compute_mcclellan_summation(window):
+    """Running total of the McClellan Oscillator"""
+    return np.cumsum(np.nan_to_num(window['mcclellan_oscillator']))
+
+
+# -------------------------------------------------------------------------------------------------
+# Vectorized recompute over stored history
+
+
+def rolling_sums(days, values, targets, span, count):
+    """`window_sums` of a raw column, NaN for any window that contains a missing value (instead of every later window)."""
+    missing = np.isnan(values)
+    sums = window_sums(days, prefix_sums(np.where(missing, 0, values)), targets, span, count)
+    gaps = window_sums(days, prefix_sums(missing), targets, span, count)
+    return np.where(gaps > 0, np.nan, sums)
+
+
+def compute_derived(arrays):
+    """
+    Computes every derived composite column for many rows with the same formulas and lookbacks as `compute_row`.\n
+    Args:\n
+        arrays (dict): `readCompositeArrays` result with day and every column in RAW_COLUMNS, sorted by day.\n
+    Returns:\n
+        dict: {column: float64 array} for each of DERIVED_COLUMNS, unrounded. NaN where the value cannot be computed.
+    """
+    days = arrays['day']
+    advancing_V, declining_V, total_V = arrays['advancing_V'], arrays['declining_V'], arrays['total_V']
+    advances, declines = arrays['advances'], arrays['declines']
+    net_hl = np.round(arrays['new_highs'] - arrays['new_lows'], 2)
+    
+    session = np.isin(days, trading_calendar.sessions) # Holidays are never looked back to
+    session_days = days[session]
+    
+    def rolling(values, metric):
+        return rolling_sums(session_days, values[session], days, *WINDOWS[metric])
+    
+    derived = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        i = np.searchsorted(session_days, days, side='left') - 1 # Newest session before each row
+        safe = np.maximum(i, 0)
+        found = (i >= 0) & (session_days[safe] >= days - VOLUME_DELTA_DAYS)
+        old_total_V = np.full(len(days), np.nan)
+        old_total_V[found] = total_V[session][i[found]]
+        derived['delta_V'] = ((total_V - old_total_V) / old_total_V) * 100
+        
+        derived['upside_day'] = (advancing_V / (advancing_V + declining_V)) * 100
+        derived['downside_day'] = (declining_V / (advancing_V + declining_V)) * 100
+        derived['net_ad'] = advances - declines
+        
+        for metric in ['td_breakaway', 'Td_breakaway']:
+            derived[metric] = (advances + rolling(advances, metric)) / (declines + rolling(declines, metric))
+        
+        derived['ad_ratio'] = advances / declines
+        derived['ad_thrust'] = (advances / (advances + declines)) * 100
+        
+        A, D = advances + rolling(advances, 'fd_ad_thrust'), declines + rolling(declines, 'fd_ad_thrust')
+        derived['fd_ad_thrust'] = (A / (A + D)) * 100
+        A, D = advancing_V + rolling(advancing_V, 'fd_ud_V_thrust'), declining_V + rolling(declining_V, 'fd_ud_V_thrust')
+        derived['fd_ud_V_thrust'] = (A / (A + D)) * 100
+        
+        derived['net_hl'] = net_hl
+        derived['tod_avg'] = (net_hl + rolling(net_hl, 'tod_avg')) / 21
+        derived['std_avg'] = (net_hl + rolling(net_hl, 'std_avg')) / 63
+    
+    for values in derived.values():
+        values[~np.isfinite(values)] = np.nan # Zero denominators have no meaningful value
+    return derived
+
+
+def recompute(table, start=None, end=None):
+    """
+    Recomputes the derived columns of a composite table from its raw volumes, advances/declines, and highs/lows, and writes back
+    only the rows whose values changed, in one transaction. Run it after a formula or schema change, or to fill in rows left
+    without breakaway momentum or averages because the history was thin when they were added.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        start (str, optional): First date to rewrite, 'yyyy-mm-dd'. Older rows are still read for the lookbacks. Defaults to None (no lower bound).\n
+        end (str, optional): Last date to rewrite, 'yyyy-mm-dd'. Defaults to None (no upper bound).\n
+    Returns:\n
+        int: Number of rows updated.
+    """
+    first = toDayNumber(start) if start else None
+    last = toDayNumber(end) if end else None
+    
+    arrays = readCompositeArrays(table, RAW_COLUMNS + DERIVED_COLUMNS, start=first - HISTORY_DAYS if first is not None else None, end=last)
+    derived = compute_derived(arrays)
+    rewrite = arrays['day'] >= first if first is not None else np.ones(len(arrays['day']), dtype=bool)
+    
+    # Cheap vectorized comparison first, then the exact (Python round) comparison only where something may have changed
+    changed = np.zeros(len(rewrite), dtype=bool)
+    for column in DERIVED_COLUMNS:
+        new, stored = np.round(derived[column], 2), arrays[column]
+        changed |= ~((new == stored) | (np.isnan(new) & np.isnan(stored)))
+    
+    rows = np.flatnonzero(rewrite & changed)
+    new = {column: round_values(derived[column][rows]) for column in DERIVED_COLUMNS}
+    stored = {column: [value if value == value else None for value in arrays[column][rows].tolist()] for column in DERIVED_COLUMNS}
+    
+    updates = []
+    for n, i in enumerate(rows.tolist()):
+        values = {column: new[column][n] for column in DERIVED_COLUMNS}
+        if any(values[column] != stored[column][n] for column in DERIVED_COLUMNS):
+            updates.append({'date': fromDayNumber(arrays['day'][i]), **values})
+    
+    table.updateMany(updates)
+    return len(updates)
+
+
+def recompute_indicators(table, start=None, end=None):
+    """
+    Recomputes every registered indicator of a composite table from its stored rows and writes the values that changed or were
+    never stored (e.g. rows from before an indicator was registered), in one transaction. Without an end date the persisted
+    state of the recursive indicators is rebuilt as well.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        start (str, optional): First date to rewrite, 'yyyy-mm-dd'. Defaults to None (no lower bound).\n
+        end (str, optional): Last date to rewrite, 'yyyy-mm-dd'. Defaults to None (no upper bound).\n
+    Returns:\n
+        int: Number of indicator values written.
+    """
+    first = toDayNumber(start) if start else None
+    last = toDayNumber(end) if end else None
+    
+    days = lookback_days() if not stepped_indicators() else None # Recursive indicators start from the first session
+    window = load_sessions(table, first - days if first is not None and days is not None else None, last)
+    results = compute_indicators(window)
+    stored = readIndicatorHistory(table, start=first, end=last)
+    rewrite = window['day'] >= first if first is not None else np.ones(len(window['day']), dtype=bool)
+    
+    rows = []
+    session_days = window['day'][rewrite].tolist()
+    for name in INDICATORS:
+        for day, value in zip(session_days, round_values(results[name][rewrite])):
+            if (day, name) not in stored or stored[(day, name)] != value:
+                rows.append({'exchange': table.__tablename__, 'date': fromDayNumber(day), 'name': name, 'value': value})
+    
+    with createSession() as session:
+        BreadthIndicators.writeMany(rows, on_conflict='update', session=session)
+        if last is None and len(window['day']):
+            IndicatorState.writeMany(expected_state(table, window, results), session=session)
+        session.commit()
+    return len(rows)
+
+
+def expected_state(table, window, results):
+    """`IndicatorState.writeMany` rows of the recursive indicators after the last session of a from-scratch `compute_indicators` run."""
+    date = fromDayNumber(window['day'][-1])
+    return [{'exchange': table.__tablename__, 'date': date, 'name': name, 'sessions': len(window['day']), 'value': _stateValue(results[name][-1])} 
+            for name in stepped_indicators()]
+
+
+def verify_state(table, tolerance=1e-9):
+    """
+    Checks the persisted state of the recursive indicators against a from-scratch vectorized recompute of the whole history.
+    Nothing is written, run `recompute_indicators` to repair what this reports.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        tolerance (float, optional): Largest relative difference accepted between the values. Defaults to 1e-9.\n
+    Returns:\n
+        list(str): One message per problem. Empty when the state is consistent.
+    """
+    window = load_sessions(table)
+    stored = readIndicatorState(table)
+    if not len(window['day']):
+        return [f'{table.__tablename__}: {name} has state but the table is empty.' for name in stored]
     
-    table.writeData(date, advancing_V, declining_V, total_V, delta_V, close, upside_day, 
-                    downside_day, advances, declines, net_ad, td_breakaway, Td_breakaway,
-                    ad_ratio, ad_thrust, fd_ad_thrust, fd_ud_volume, new_highs, new_lows, 
-                    net_hl, tod_avg_hl, std_avg_hl)
\ No newline at end of file
+    problems = []
+    for expected in expected_state(table, window, compute_indicators(window)):
+        name = expected['name']
+        state = stored.get(name)
+        if state is None:
+            problems.append(f'{table.__tablename__}: {name} has no stored state.')
+        elif fromDayNumber(state.day) != expected['date'] or state.sessions != expected['sessions']:
+            problems.append(f'{table.__tablename__}: {name} is as of {fromDayNumber(state.day)} after {state.sessions} sessions, '
+                            f'expected {expected["date"]} after {expected["sessions"]}.')
+        elif (state.value is None) != (expected['value'] is None) or \
+             (state.value is not None and not np.isclose(state.value, expected['value'], rtol=tolerance, atol=0)):
+            problems.append(f'{table.__tablename__}: {name} is {state.value}, expected {expected["value"]}.')
+    return problems
@@ -0,0 +1,80 @@
+from bisect import bisect_left, bisect_right, insort
+from threading import Lock
+
+
+class DateIndex:
+    """
+    Sorted in-memory index of the distinct dates in one table. It is loaded once and then kept up to date by writes,
+    so "latest date", "all dates", and "previous/next date" never rescan the table.
+    Until the full list is needed, the latest date is answered with a single MAX(Date) lookup.
+    """
+    def __init__(self, load_dates, load_latest):
+        """
+        Args:\n
+            load_dates (function): Returns every distinct date of the table in ascending order.\n
+            load_latest (function): Returns the newest date of the table, or None if it is empty.
+        """
+        self._load_dates = load_dates
+        self._load_latest = load_latest
+        self._dates = None # Sorted list of 'yyyy-mm-dd' strings once loaded
+        self._latest = None
+        self._lock = Lock()
+
+
+    def _ensureLoaded(self):
+        """Loads the full date list on first use. Must be called with the lock held."""
+        if self._dates is None:
+            self._dates = list(self._load_dates())
+            self._latest = self._dates[-1] if self._dates else None
+
+
+    def latest(self):
+        """Returns the newest date, or None if the table is empty. O(1) once known."""
+        with self._lock:
+            if self._dates is None and self._latest is None:
+                self._latest = self._load_latest()
+            return self._latest
+
+
+    def all(self):
+        """Returns a copy of every date in ascending order."""
+        with self._lock:
+            self._ensureLoaded()
+            return list(self._dates)
+
+
+    def previous(self, date):
+        """Returns the newest date strictly before `date`, or None. O(log n)."""
+        with self._lock:
+            self._ensureLoaded()
+            i = bisect_left(self._dates, date)
+            return self._dates[i - 1] if i > 0 else None
+
+
+    def next(self, date):
+        """Returns the oldest date strictly after `date`, or None. O(log n)."""
+        with self._lock:
+            self._ensureLoaded()
+            i = bisect_right(self._dates, date)
+            return self._dates[i] if i < len(self._dates) else None
+
+
+    def add(self, dates):
+        """Records dates that were just committed to the table."""
+        with self._lock:
+            known = self._dates is not None or self._latest is not None
+            for date in dates:
+                if known and (self._latest is None or date > self._latest):
+                    self._latest = date
+
+                if self._dates is not None:
+                    i = bisect_left(self._dates, date)
+                    if i == len(self._dates) or self._dates[i] != date:
+                        insort(self._dates, date)
+
+
+    def reset(self):
+        """Forgets everything so the next lookup reloads from the database (e.g. after rows are deleted)."""
+        with self._lock:
+            self._dates = None
+            self._latest = None
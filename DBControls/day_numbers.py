@@ -0,0 +1,70 @@
+from datetime import date as Date, datetime, timedelta
+import numpy as np
+
+# Every table stores its date twice: "Date" as TEXT 'yyyy-mm-dd' (what the app and older databases use) and
+# "Day Number" as an INTEGER count of days since 1970-01-01. The integer column is indexed, so range filters,
+# "N days back" lookups, and gap detection are plain integer arithmetic in SQL and NumPy.
+# All conversions between the two live here.
+
+EPOCH = Date(1970, 1, 1)
+DATE_FORMAT = '%Y-%m-%d'
+
+# SQLite expression that turns a 'yyyy-mm-dd' column into its day number (julianday of the epoch is 2440587.5)
+SQL_DAY_NUMBER = 'CAST(julianday({}) - 2440587.5 AS INTEGER)'
+
+
+def validateDate(date):
+    """
+    Checks that a date string is in the format the database stores.\n
+    Args:\n
+        date (str): Date in the format 'yyyy-mm-dd'.\n
+    Returns:\n
+        datetime.date: The parsed date.\n
+    Raises:\n
+        ValueError: If the date is not in the format yyyy-mm-dd.
+    """
+    try:
+        return datetime.strptime(date, DATE_FORMAT).date()
+    except (ValueError, TypeError):
+        raise ValueError(f'Date ({date}) needs to be in the format yyyy-mm-dd.')
+
+
+def toDayNumber(date):
+    """
+    Args:\n
+        date (str or datetime.date): 'yyyy-mm-dd' or a date object.\n
+    Returns:\n
+        int: Days since 1970-01-01.\n
+    Raises:\n
+        ValueError: If a string date is not in the format yyyy-mm-dd.
+    """
+    if isinstance(date, str):
+        date = validateDate(date)
+    elif isinstance(date, datetime):
+        date = date.date()
+    return (date - EPOCH).days
+
+
+def fromDayNumber(day_number):
+    """
+    Args:\n
+        day_number (int): Days since 1970-01-01.\n
+    Returns:\n
+        str: Date in the format 'yyyy-mm-dd'.
+    """
+    return (EPOCH + timedelta(days=int(day_number))).strftime(DATE_FORMAT)
+
+
+def isWeekday(day_number):
+    """Returns True if the day number falls on Monday through Friday (1970-01-01 was a Thursday). Works on NumPy arrays too."""
+    return (day_number + 3) % 7 < 5
+
+
+def toDatetime64(day_numbers):
+    """Converts an array of day numbers to a datetime64[D] array without going through strings."""
+    return np.asarray(day_numbers, dtype=np.int64).astype('datetime64[D]')
+
+
+def fromDatetime64(dates):
+    """Converts a datetime64 array to an int64 array of day numbers."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
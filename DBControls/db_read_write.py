@@ -1,22 +1,167 @@
 import sqlalchemy as sqla
-from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, declarative_base, column_property
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from DBControls.migrations import migrate
+from DBControls.query_cache import query_cache, cachedQuery
+from DBControls.date_index import DateIndex
+from DBControls.day_numbers import validateDate, toDayNumber, toDatetime64
+from datetime import datetime, timezone
 from contextlib import contextmanager
+from functools import partial
+from threading import Lock
+import numpy as np
+import os
 
 
 Base = declarative_base()
-db_filename = 'DBControls/market_data.db'
+db_filename = os.environ.get('FIG_DB_FILENAME', 'DBControls/market_data.db') # Set FIG_DB_FILENAME=DBControls/example_data.db to use the example database
+
+# Connection pool settings shared by every engine in the registry
+pool_settings = {
+    'pool_size': 5, # Connections kept open (GUI thread + scraper threads)
+    'max_overflow': 5, # Extra connections allowed when all pooled ones are checked out
+    'pool_timeout': 30 # Seconds to wait for a free connection before giving up
+}
+
+# PRAGMAs applied to every new SQLite connection. WAL lets the GUI read while the scraper threads write.
+sqlite_pragmas = {
+    'journal_mode': 'WAL', # Readers never block on the writer (and vice versa)
+    'synchronous': 'NORMAL', # Safe with WAL, skips an fsync per commit
+    'cache_size': -65536, # Negative means KiB, so 64 MiB of page cache per connection
+    'mmap_size': 268435456, # Map up to 256 MiB of the file instead of read() calls
+    'temp_store': 'MEMORY', # Sorts and temporary indexes stay off disk
+    'busy_timeout': 5000 # Milliseconds to wait on a lock before raising "database is locked"
+}
+
+_engines = {} # {database filename: (engine, sessionmaker)}
+_engines_lock = Lock()
+
+_ticker_ids = {} # {symbol: Tickers.ID} of committed tickers, IDs never change once assigned
+_ticker_ids_lock = Lock()
+
+
+def getEngine(filename=None):
+    """
+    Returns the process-wide engine for the given database file, creating it (and its connection pool) on first use.
+    Connections are handed to one thread at a time by the pool, so the GUI and scraper threads can share the engine.\n
+    Args:\n
+        filename (str, optional): Path to the SQLite database. Defaults to the current `db_filename`.\n
+    Returns:\n
+        sqlalchemy.engine.Engine: Pooled engine bound to the database file.
+    """
+    return _getRegistryEntry(filename)[0]
+
+
+def _getRegistryEntry(filename=None):
+    """Returns the (engine, sessionmaker) pair for the database file, building it lazily and only once."""
+    filename = filename or db_filename
+    
+    entry = _engines.get(filename)
+    if entry is None:
+        with _engines_lock:
+            entry = _engines.get(filename)
+            if entry is None: # Another thread may have built it while we waited on the lock
+                engine = sqla.create_engine(f'sqlite:///{filename}', 
+                                            poolclass=QueuePool, 
+                                            connect_args={'check_same_thread': False}, # The pool guarantees one thread per connection at a time
+                                            **pool_settings)
+                sqla.event.listen(engine, 'connect', _applyPragmas)
+                migrate(engine) # Create or upgrade the schema once per engine
+                Session = sessionmaker(bind=engine)
+                sqla.event.listen(Session, 'after_commit', _afterCommit)
+                sqla.event.listen(Session, 'after_rollback', _afterRollback)
+                entry = (engine, Session)
+                _engines[filename] = entry
+    return entry
+
+
+def _applyPragmas(dbapi_connection, connection_record):
+    """Connection-setup hook that applies `sqlite_pragmas` to a freshly opened SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in sqlite_pragmas.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}') # Pragmas cannot take bound parameters
+    finally:
+        cursor.close()
+
+
+def _afterCommit(session):
+    """Session hook: once a write is committed, drop the cached reads it made stale and record its dates in the date index."""
+    for table, dates, tickers in session.info.pop('pending_invalidations', []):
+        query_cache.invalidate(table, dates=dates, tickers=tickers)
+        if dates is not None and table in date_indexes:
+            date_indexes[table].add(dates)
+
+
+def _afterRollback(session):
+    """Session hook: a rolled back write changed nothing, so nothing needs invalidating."""
+    session.info.pop('pending_invalidations', None)
+
+
+def _loadDates(model):
+    """Returns every distinct date of the model's table in ascending order (an index-only scan)."""
+    with getEngine().connect() as connection:
+        return connection.execute(sqla.select(model.date).distinct().order_by(model.date)).scalars().all()
+
+
+def _loadLatestDate(model):
+    """Returns the newest date of the model's table (one index lookup), or None if it is empty."""
+    with getEngine().connect() as connection:
+        return connection.execute(sqla.select(sqla.func.max(model.date))).scalar()
+
+
+def configureDatabase(filename=None, **settings):
+    """
+    Points the models at a different database file and/or changes the pool settings and SQLite pragmas used for new connections.
+    Engines whose settings are now stale are disposed so the next query rebuilds them.\n
+    Args:\n
+        filename (str, optional): Path to the SQLite database (e.g. 'DBControls/example_data.db'). Defaults to None (unchanged).\n
+        **settings: Any of pool_size, max_overflow, pool_timeout, or a key of `sqlite_pragmas` 
+        (journal_mode, synchronous, cache_size, mmap_size, temp_store, busy_timeout).\n
+    Raises:\n
+        ValueError: If an unknown setting is given.
+    """
+    global db_filename
+    
+    unknown = set(settings) - set(pool_settings) - set(sqlite_pragmas)
+    if unknown:
+        raise ValueError(f'Unknown database setting(s): {", ".join(sorted(unknown))}.')
+
+    if settings:
+        for key, value in settings.items():
+            if key in pool_settings:
+                pool_settings[key] = value
+            else:
+                sqlite_pragmas[key] = value
+        disposeEngines() # Existing connections were opened with the old settings
+        
+    if filename:
+        db_filename = filename
+        query_cache.clear() # Cached reads belong to the old file
+        for index in date_indexes.values():
+            index.reset()
+        with _ticker_ids_lock:
+            _ticker_ids.clear()
+
+
+def disposeEngines():
+    """Closes every pooled connection and empties the engine registry."""
+    with _engines_lock:
+        for engine, _ in _engines.values():
+            engine.dispose()
+        _engines.clear()
 
 
 @contextmanager
 def createSession():
     """
-    A context manager that creates a new session for interacting with the database. \n
+    A context manager that creates a new session for interacting with the database. 
+    Sessions borrow a connection from the process-wide pool instead of building a new engine.\n
     Returns:\n
         A context manager yielding a new session instance.
     """
-    engine = sqla.create_engine(f'sqlite:///{db_filename}', )
-    Session = sessionmaker(bind=engine)
+    Session = _getRegistryEntry()[1]
     session = Session()
     try:
         yield session
@@ -24,12 +169,181 @@ def createSession():
         session.close()
 
 
+def _writeMany(model, rows, key_columns, on_conflict='ignore', session=None, tickers=None):
+    """
+    Inserts a batch of rows into the model's table with one executemany `INSERT ... ON CONFLICT` statement.
+    Conflicts are resolved by SQLite against the table's unique key, so concurrent writers cannot create duplicates.\n
+    Args:\n
+        model (Base): Model class of the target table.\n
+        rows (list(dict)): Rows keyed by the model's attribute names. The day number is filled in from the date.\n
+        key_columns (tuple(str)): Attribute names of the table's unique key (e.g. ('date', 'ticker_id')).\n
+        on_conflict (str, optional): 'ignore' keeps the stored row, 'update' overwrites it with the new values. Defaults to 'ignore'.\n
+        session (Session, optional): Session to write with. If given, the caller is responsible for committing. Defaults to None.\n
+        tickers (set(str), optional): Ticker symbols the rows belong to, so cached reads of other tickers survive. Defaults to None (every ticker).\n
+    Raises:\n
+        ValueError: If on_conflict is not 'ignore' or 'update'.
+    """
+    if on_conflict not in ('ignore', 'update'):
+        raise ValueError(f"on_conflict must be 'ignore' or 'update', not {on_conflict}.")
+    
+    if not rows:
+        return
+    
+    if session is None:
+        with createSession() as new_session:
+            _writeMany(model, rows, key_columns, on_conflict=on_conflict, session=new_session, tickers=tickers)
+            new_session.commit()
+        return
+    
+    rows = [{**row, 'day': toDayNumber(row['date'])} for row in rows] # Keep the integer date in step with the text one
+    index_elements = [getattr(model, column) for column in key_columns]
+    statement = sqlite_insert(model)
+    
+    if on_conflict == 'ignore':
+        statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        # Only overwrite the columns that were actually given
+        columns = sqla.inspect(model).columns # Attribute name -> table column
+        updates = {columns[attr].name: statement.excluded[columns[attr].name] for attr in rows[0] if attr not in key_columns}
+        statement = statement.on_conflict_do_update(index_elements=index_elements, set_=updates)
+    
+    session.execute(statement, rows) # executemany
+    
+    # Cached reads are invalidated and the date index updated when the session commits
+    dates = {row['date'] for row in rows}
+    session.info.setdefault('pending_invalidations', []).append((model.__tablename__, dates, tickers))
+
+
+def _updateMany(model, rows, session=None, tickers=None):
+    """
+    Overwrites columns of existing rows, matched by primary key, with one executemany `UPDATE`.
+    Used by the recompute paths, which only write back values that changed.\n
+    Args:\n
+        model (Base): Model class of the target table.\n
+        rows (list(dict)): Rows keyed by attribute name, all with the same keys. Each needs the primary key, 'date' (for cache invalidation), and the columns to set.\n
+        session (Session, optional): Session to write with. If given, the caller is responsible for committing. Defaults to None.\n
+        tickers (set(str), optional): Ticker symbols the rows belong to, so cached reads of other tickers survive. Defaults to None (every ticker).
+    """
+    if not rows:
+        return
+    
+    if session is None:
+        with createSession() as new_session:
+            _updateMany(model, rows, session=new_session, tickers=tickers)
+            new_session.commit()
+        return
+    
+    mapper = sqla.inspect(model)
+    keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key] # Attribute names of the primary key
+    columns = mapper.columns # Attribute name -> table column
+    dates = {row['date'] for row in rows}
+    
+    # Raw executemany of plain tuples, building SQLAlchemy parameter dicts per row would cost more than the UPDATE itself
+    attrs = [attr for attr in rows[0] if attr not in keys and attr != 'date']
+    set_clause = ', '.join(f'"{columns[attr].name}" = ?' for attr in attrs)
+    where_clause = ' AND '.join(f'"{columns[key].name}" = ?' for key in keys)
+    sql = f'UPDATE "{model.__tablename__}" SET {set_clause} WHERE {where_clause}'
+    session.connection().exec_driver_sql(sql, [tuple(row[attr] for attr in attrs + keys) for row in rows])
+    session.info.setdefault('pending_invalidations', []).append((model.__tablename__, dates, tickers))
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+class Tickers(Base):
+    __tablename__ = 'Tickers'
+    ID = sqla.Column('ID', sqla.Integer, primary_key=True)
+    symbol = sqla.Column('Symbol', sqla.Text, unique=True, nullable=False)
+    description = sqla.Column('Description', sqla.Text)
+    first_seen = sqla.Column('First Seen', sqla.Text)
+    last_seen = sqla.Column('Last Seen', sqla.Text)
+    
+    
+    @staticmethod
+    def getId(symbol):
+        """
+        Looks up the integer key of a ticker symbol. Known symbols are answered from memory.\n
+        Args:\n
+            symbol (str): Ticker symbol.\n
+        Returns:\n
+            int: The ticker's ID, or None if the symbol has never been written.
+        """
+        ticker_id = _ticker_ids.get(symbol)
+        if ticker_id is None:
+            with getEngine().connect() as connection:
+                ticker_id = connection.execute(sqla.select(Tickers.ID).where(Tickers.symbol == symbol)).scalar()
+            if ticker_id is not None: # Unknown symbols are not remembered, they may be written later
+                with _ticker_ids_lock:
+                    _ticker_ids[symbol] = ticker_id
+        return ticker_id
+    
+    
+    @staticmethod
+    def getSymbols():
+        """
+        Returns:\n
+            dict: {ID: symbol} for every ticker.
+        """
+        with getEngine().connect() as connection:
+            return dict(connection.execute(sqla.select(Tickers.ID, Tickers.symbol)).all())
+    
+    
+    @staticmethod
+    def writeMany(rows, session):
+        """
+        Adds the tickers of a batch of Hedgeye rows to the dimension table, or widens their first/last seen dates.
+        A description is only replaced by one from a date at least as new as the stored last seen date.\n
+        Args:\n
+            rows (list(dict)): Hedgeye rows with date, ticker, and optionally description.\n
+            session (Session): Session to write with. The caller commits.\n
+        Returns:\n
+            tuple: ({symbol: ID} for every ticker in the rows, set of symbols whose description changed).
+        """
+        tickers = {} # {symbol: {'symbol', 'description', 'first_seen', 'last_seen'}}
+        for row in sorted(rows, key=lambda row: row['date']):
+            ticker = tickers.setdefault(row['ticker'], {'symbol': row['ticker'], 'description': None, 'first_seen': row['date'], 'last_seen': row['date']})
+            ticker['last_seen'] = row['date']
+            if row.get('description') is not None:
+                ticker['description'] = row['description']
+        
+        stored = dict(session.execute(sqla.select(Tickers.symbol, Tickers.description).where(Tickers.symbol.in_(tickers))).all())
+        
+        statement = sqlite_insert(Tickers)
+        newer = statement.excluded['Last Seen'] >= Tickers.last_seen
+        statement = statement.on_conflict_do_update(index_elements=[Tickers.symbol], set_={
+            'Description': sqla.case((newer, sqla.func.coalesce(statement.excluded['Description'], Tickers.description)), 
+                                     else_=sqla.func.coalesce(Tickers.description, statement.excluded['Description'])),
+            'First Seen': sqla.func.min(Tickers.first_seen, statement.excluded['First Seen']),
+            'Last Seen': sqla.func.max(Tickers.last_seen, statement.excluded['Last Seen'])
+        })
+        session.execute(statement, list(tickers.values()))
+        
+        ids, changed = {}, set()
+        for symbol, ticker_id, description in session.execute(sqla.select(Tickers.symbol, Tickers.ID, Tickers.description).where(Tickers.symbol.in_(tickers))):
+            ids[symbol] = ticker_id
+            if symbol in stored and stored[symbol] != description:
+                changed.add(symbol)
+        return ids, changed
+
+
+# ---------------------------------------------------------------------------------------------
+
+
 class Hedgeye(Base):
     __tablename__ = 'Hedgeye'
+    __table_args__ = (
+        sqla.Index('ix_hedgeye_date_ticker', 'Date', 'Ticker ID', unique=True),
+        sqla.Index('ix_hedgeye_ticker_date', 'Ticker ID', 'Date'),
+        sqla.Index('ix_hedgeye_ticker_day', 'Ticker ID', 'Day Number'),
+        sqla.Index('ix_hedgeye_day', 'Day Number')
+    )
     ID = sqla.Column('ID', sqla.Integer, primary_key=True)
     date = sqla.Column('Date', sqla.Text)
-    ticker = sqla.Column('Ticker', sqla.Text)
-    description = sqla.Column('Description', sqla.Text)
+    day = sqla.Column('Day Number', sqla.Integer) # Same date as an integer, see day_numbers.py
+    ticker_id = sqla.Column('Ticker ID', sqla.Integer, sqla.ForeignKey('Tickers.ID'))
+    # Read only, resolved through the Tickers dimension table
+    ticker = column_property(sqla.select(Tickers.symbol).where(Tickers.ID == ticker_id).correlate_except(Tickers).scalar_subquery())
+    description = column_property(sqla.select(Tickers.description).where(Tickers.ID == ticker_id).correlate_except(Tickers).scalar_subquery())
     buy = sqla.Column('Buy', sqla.Float)
     sell = sqla.Column('Sell', sqla.Float)
     close = sqla.Column('Close', sqla.Float)
@@ -45,6 +359,7 @@ class Hedgeye(Base):
 
  
     @staticmethod
+    @cachedQuery('Hedgeye')
     def getData(date=None, ticker=None):
         """
         Retrieves data from the database based on the given date and/or ticker.\n
@@ -60,14 +375,13 @@ class Hedgeye(Base):
             query = session.query(Hedgeye)
 
             if date:
-                try:
-                    datetime.strptime(date, '%Y-%m-%d')
-                    query = query.filter(Hedgeye.date == date)
-                except ValueError:
-                    raise ValueError(f'Date ({date}) needs to be in the format yyyy-mm-dd.')
+                query = query.filter(Hedgeye.day == toDayNumber(date)) # Raises ValueError on a malformed date
 
             if ticker:
-                query = query.filter(Hedgeye.ticker == ticker)
+                ticker_id = Tickers.getId(ticker)
+                if ticker_id is None: # Comparing with None would match the rows without a ticker
+                    return []
+                query = query.filter(Hedgeye.ticker_id == ticker_id) # Integer comparison on the (Ticker ID, Date) index
 
             if not date and not ticker: # Gets most recent data by date in table
                 most_recent_date = session.query(sqla.func.max(Hedgeye.date)).scalar()
@@ -81,13 +395,91 @@ class Hedgeye(Base):
     @staticmethod
     def getAllDates():
         """
-        etrieves a list of all unique dates in the database in ascending order.\n        
+        Retrieves a list of all unique dates in the database in ascending order. Served from the in-memory date index.\n        
         Returns:\n
             List[str]: A list of unique dates in the format 'yyyy-mm-dd'.
         """
-        with createSession() as session:
-            result = session.query(Hedgeye.date).distinct().order_by(sqla.asc(Hedgeye.date)).all()
-            return [r[0] for r in result]
+        return date_indexes['Hedgeye'].all()
+    
+    
+    @staticmethod
+    def getLatestDate():
+        """
+        Retrieves the most recent date in the Hedgeye table without scanning it.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if the table is empty.
+        """
+        return date_indexes['Hedgeye'].latest()
+    
+    
+    @staticmethod
+    def getPreviousDate(date):
+        """
+        Retrieves the newest date in the Hedgeye table that is before the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['Hedgeye'].previous(date)
+    
+    
+    @staticmethod
+    def getNextDate(date):
+        """
+        Retrieves the oldest date in the Hedgeye table that is after the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['Hedgeye'].next(date)
+        
+        
+    @staticmethod
+    def getSeries(ticker, start=None, end=None, columns=('buy', 'sell', 'close'), days=None):
+        """
+        Retrieves one ticker's history as NumPy arrays. The date range and column projection are done in SQL 
+        (an index range scan on (Ticker ID, Day Number)) and no ORM objects are built.\n
+        Args:\n
+            ticker (str): Ticker symbol.\n
+            start (str, optional): First date to include, 'yyyy-mm-dd'. Defaults to None (no lower bound).\n
+            end (str, optional): Last date to include, 'yyyy-mm-dd'. Defaults to None (no upper bound).\n
+            columns (tuple(str), optional): Numeric attributes to return (e.g. 'buy', 'close', 'od_delta'). Defaults to ('buy', 'sell', 'close').\n
+            days (int, optional): Only keep the last `days` calendar days ending at the ticker's most recent date. Defaults to None (all).\n
+        Returns:\n
+            dict: {'date': datetime64[D] array, column: float64 array, ...} sorted by date. Missing values are NaN.\n
+        Raises:\n
+            ValueError: If a date is not in the format yyyy-mm-dd or a column is not a numeric Hedgeye attribute.
+        """
+        table_columns = sqla.inspect(Hedgeye).columns
+        for column in columns:
+            if column not in table_columns or not isinstance(table_columns[column].type, sqla.Float):
+                raise ValueError(f'{column} is not a numeric Hedgeye column.')
+            
+        start_day = toDayNumber(start) if start else None # Raises ValueError on a malformed date
+        end_day = toDayNumber(end) if end else None
+        
+        ticker_id = Tickers.getId(ticker)
+        rows = []
+        if ticker_id is not None: # Comparing with None would match the rows without a ticker
+            query = sqla.select(Hedgeye.day, *[getattr(Hedgeye, column) for column in columns]).where(Hedgeye.ticker_id == ticker_id)
+            if start_day is not None:
+                query = query.where(Hedgeye.day >= start_day)
+            if end_day is not None:
+                query = query.where(Hedgeye.day <= end_day)
+            if days:
+                latest = sqla.select(sqla.func.max(Hedgeye.day)).where(Hedgeye.ticker_id == ticker_id).scalar_subquery()
+                query = query.where(Hedgeye.day >= latest - int(days))
+            
+            with getEngine().connect() as connection:
+                rows = connection.execute(query.order_by(Hedgeye.day)).all()
+        
+        values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+        series = {'date': toDatetime64(values[0])}
+        for column, value in zip(columns, values[1:]):
+            series[column] = np.array(value, dtype=np.float64) # None becomes NaN
+        return series
         
         
     @staticmethod
@@ -111,14 +503,54 @@ class Hedgeye(Base):
             ra_buy (float): Range asymmetry buy (%).\n
             ra_sell (float): Range asymmetry sell (%).
         """
-        with createSession() as session:
-            if not Hedgeye.getData(date=date, ticker=ticker): # If new incoming data does not exist, add it to table
-                new_row = Hedgeye(date=date, ticker=ticker, description=description, 
-                                  buy=buy, sell=sell, close=close, delta_ww=delta_ww, 
-                                  od_delta=od_delta, ow_delta=ow_delta, om_delta=om_delta, tm_delta=tm_delta, sm_delta=sm_delta, oy_delta=oy_delta, 
-                                  ra_buy=ra_buy, ra_sell=ra_sell)
-                session.add(new_row)
-                session.commit()
+        Hedgeye.writeMany([{'date': date, 'ticker': ticker, 'description': description, 
+                            'buy': buy, 'sell': sell, 'close': close, 'delta_ww': delta_ww, 
+                            'od_delta': od_delta, 'ow_delta': ow_delta, 'om_delta': om_delta, 'tm_delta': tm_delta, 'sm_delta': sm_delta, 'oy_delta': oy_delta, 
+                            'ra_buy': ra_buy, 'ra_sell': ra_sell}])
+        
+        
+    @staticmethod
+    def writeMany(rows, on_conflict='ignore', session=None):
+        """
+        Writes a batch of rows to the database in one transaction using `INSERT ... ON CONFLICT (Date, Ticker ID)`.
+        Tickers and descriptions go to the Tickers dimension table, the Hedgeye rows only keep its integer key.\n
+        Args:\n
+            rows (list(dict)): Rows keyed like the arguments of `writeData` (date, ticker, description, buy, ...).\n
+            on_conflict (str, optional): 'ignore' skips rows whose (date, ticker) already exist, 'update' overwrites them. Defaults to 'ignore'.\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.\n
+        Raises:\n
+            ValueError: If on_conflict is not 'ignore' or 'update'.
+        """
+        if on_conflict not in ('ignore', 'update'):
+            raise ValueError(f"on_conflict must be 'ignore' or 'update', not {on_conflict}.")
+        
+        if not rows:
+            return
+        
+        if session is None:
+            with createSession() as new_session:
+                Hedgeye.writeMany(rows, on_conflict=on_conflict, session=new_session)
+                new_session.commit()
+            return
+        
+        ids, changed = Tickers.writeMany(rows, session)
+        facts = [{'ticker_id': ids[row['ticker']], **{key: value for key, value in row.items() if key not in ('ticker', 'description')}} for row in rows]
+        _writeMany(Hedgeye, facts, ('date', 'ticker_id'), on_conflict=on_conflict, session=session, tickers={row['ticker'] for row in rows})
+        
+        if changed: # Every cached row of these tickers shows the old description
+            session.info.setdefault('pending_invalidations', []).append(('Hedgeye', None, changed))
+            
+            
+    @staticmethod
+    def updateMany(rows, session=None):
+        """
+        Overwrites columns of existing rows in one transaction (e.g. recomputed deltas).\n
+        Args:\n
+            rows (list(dict)): Rows with 'ID', 'date', 'ticker', and the attributes to set (delta_ww, od_delta, ...).\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.
+        """
+        tickers = {row['ticker'] for row in rows}
+        _updateMany(Hedgeye, [{key: value for key, value in row.items() if key != 'ticker'} for row in rows], session=session, tickers=tickers)
             
 
 # ---------------------------------------------------------------------------------------------
@@ -126,7 +558,9 @@ class Hedgeye(Base):
 
 class NASDAQ(Base):
     __tablename__ = 'NASDAQ'
+    __table_args__ = (sqla.Index('ix_nasdaq_day', 'Day Number', unique=True),)
     date = sqla.Column('Date', sqla.Text, primary_key=True)
+    day = sqla.Column('Day Number', sqla.Integer) # Same date as an integer, see day_numbers.py
     advancing_V = sqla.Column('Advancing Volume', sqla.Float)
     declining_V = sqla.Column('Declining Volume', sqla.Float)
     total_V = sqla.Column('Total Volume', sqla.Float)
@@ -151,6 +585,7 @@ class NASDAQ(Base):
       
         
     @staticmethod
+    @cachedQuery('NASDAQ')
     def getData(date=None):
         """
         Retrieve data from the NASDAQ table in the database.\n
@@ -161,15 +596,13 @@ class NASDAQ(Base):
         Raises:\n
             ValueError: If the date argument is not in the correct format 'yyyy-mm-dd'.
         """
+        if date:
+            validateDate(date)
+            
         with createSession() as session:
             if not date: # Gets most recent data by date in table
                 date = session.query(sqla.func.max(NASDAQ.date)).scalar()
 
-            try:
-                datetime.strptime(date, '%Y-%m-%d')
-            except ValueError:
-                raise ValueError('Date needs to be in the format yyyy-mm-dd.')
-
             result = session.query(NASDAQ).filter(NASDAQ.date == date).first()
             return result
    
@@ -177,21 +610,46 @@ class NASDAQ(Base):
     @staticmethod
     def getAllDates():
         """
-        Retrieve all the distinct dates from the NASDAQ table in the database, ordered in ascending order.\n
+        Retrieve all the distinct dates from the NASDAQ table in the database, ordered in ascending order. Served from the in-memory date index.\n
         Returns:\n
             A list of strings representing the dates in the format 'yyyy-mm-dd'.
         """
-        with createSession() as session:
-            result = (
-                session.query(NASDAQ.date)
-                .distinct()
-                .order_by(sqla.asc(NASDAQ.date))
-                .all()
-            )
-
-        dates = [r[0] for r in result]
-        return dates
-  
+        return date_indexes['NASDAQ'].all()
+    
+    
+    @staticmethod
+    def getLatestDate():
+        """
+        Retrieves the most recent date in the NASDAQ table without scanning it.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if the table is empty.
+        """
+        return date_indexes['NASDAQ'].latest()
+    
+    
+    @staticmethod
+    def getPreviousDate(date):
+        """
+        Retrieves the newest date in the NASDAQ table that is before the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['NASDAQ'].previous(date)
+    
+    
+    @staticmethod
+    def getNextDate(date):
+        """
+        Retrieves the oldest date in the NASDAQ table that is after the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['NASDAQ'].next(date)
+        
         
     @staticmethod
     def writeData(date, advancing_V, declining_V, total_V, delta_V, close, upside_day, downside_day, 
@@ -225,15 +683,36 @@ class NASDAQ(Base):
         Returns:\n
             None
         """
-        with createSession() as session:
-            if not NASDAQ.getData(date=date): # If new incoming data does not exist, add it to table
-                new_row = NASDAQ(date=date, advancing_V=advancing_V, declining_V=declining_V, total_V=total_V, delta_V=delta_V, 
-                                 close=close, upside_day=upside_day, downside_day=downside_day, advances=advances, 
-                                 declines=declines, net_ad=net_ad, td_breakaway=td_breakaway, Td_breakaway=Td_breakaway, 
-                                 ad_ratio=ad_ratio, ad_thrust=ad_thrust, fd_ad_thrust=fd_ad_thrust, fd_ud_V_thrust=fd_ud_V_thrust, 
-                                 new_highs=new_highs, new_lows=new_lows, net_hl=net_hl, tod_avg=tod_avg, std_avg=std_avg)
-                session.add(new_row)
-                session.commit()
+        NASDAQ.writeMany([{'date': date, 'advancing_V': advancing_V, 'declining_V': declining_V, 'total_V': total_V, 'delta_V': delta_V, 
+                          'close': close, 'upside_day': upside_day, 'downside_day': downside_day, 'advances': advances, 
+                          'declines': declines, 'net_ad': net_ad, 'td_breakaway': td_breakaway, 'Td_breakaway': Td_breakaway, 
+                          'ad_ratio': ad_ratio, 'ad_thrust': ad_thrust, 'fd_ad_thrust': fd_ad_thrust, 'fd_ud_V_thrust': fd_ud_V_thrust, 
+                          'new_highs': new_highs, 'new_lows': new_lows, 'net_hl': net_hl, 'tod_avg': tod_avg, 'std_avg': std_avg}])
+                
+                
+    @staticmethod
+    def writeMany(rows, on_conflict='ignore', session=None):
+        """
+        Write a batch of rows to the NASDAQ table in one transaction using `INSERT ... ON CONFLICT (Date)`.\n
+        Args:\n
+            rows (list(dict)): Rows keyed like the arguments of `writeData` (date, advancing_V, declining_V, ...).\n
+            on_conflict (str, optional): 'ignore' skips rows whose date already exists, 'update' overwrites them. Defaults to 'ignore'.\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.\n
+        Raises:\n
+            ValueError: If on_conflict is not 'ignore' or 'update'.
+        """
+        _writeMany(NASDAQ, rows, ('date',), on_conflict=on_conflict, session=session)
+
+    
+    @staticmethod
+    def updateMany(rows, session=None):
+        """
+        Overwrites columns of existing rows in one transaction (e.g. recomputed metrics).\n
+        Args:\n
+            rows (list(dict)): Rows with 'date' and the attributes to set (delta_V, td_breakaway, ...).\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.
+        """
+        _updateMany(NASDAQ, rows, session=session)
 
 
 # ---------------------------------------------------------------------------------------------
@@ -241,7 +720,9 @@ class NASDAQ(Base):
 
 class NYSE(Base):
     __tablename__ = 'NYSE'
+    __table_args__ = (sqla.Index('ix_nyse_day', 'Day Number', unique=True),)
     date = sqla.Column('Date', sqla.Text, primary_key=True)
+    day = sqla.Column('Day Number', sqla.Integer) # Same date as an integer, see day_numbers.py
     advancing_V = sqla.Column('Advancing Volume', sqla.Float)
     declining_V = sqla.Column('Declining Volume', sqla.Float)
     total_V = sqla.Column('Total Volume', sqla.Float)
@@ -266,6 +747,7 @@ class NYSE(Base):
         
 
     @staticmethod
+    @cachedQuery('NYSE')
     def getData(date=None):
         """
         Retrieve data from the NYSE table in the database.\n
@@ -276,15 +758,13 @@ class NYSE(Base):
         Raises:\n
             ValueError: If the date argument is not in the correct format 'yyyy-mm-dd'.
         """
+        if date:
+            validateDate(date)
+            
         with createSession() as session:
             if not date: # Gets most recent data by date in table
                 date = session.query(sqla.func.max(NYSE.date)).scalar()
 
-            try:
-                datetime.strptime(date, '%Y-%m-%d')
-            except ValueError:
-                raise ValueError('Date needs to be in the format yyyy-mm-dd.')
-
             result = session.query(NYSE).filter(NYSE.date == date).first()
             return result
    
@@ -292,21 +772,46 @@ class NYSE(Base):
     @staticmethod
     def getAllDates():
         """
-        Retrieve all the distinct dates from the NYSE table in the database, ordered in ascending order.\n
+        Retrieve all the distinct dates from the NYSE table in the database, ordered in ascending order. Served from the in-memory date index.\n
         Returns:\n
             A list of strings representing the dates in the format 'yyyy-mm-dd'.
         """
-        with createSession() as session:
-            result = (
-                session.query(NYSE.date)
-                .distinct()
-                .order_by(sqla.asc(NYSE.date))
-                .all()
-            )
-
-        dates = [r[0] for r in result]
-        return dates
-  
+        return date_indexes['NYSE'].all()
+    
+    
+    @staticmethod
+    def getLatestDate():
+        """
+        Retrieves the most recent date in the NYSE table without scanning it.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if the table is empty.
+        """
+        return date_indexes['NYSE'].latest()
+    
+    
+    @staticmethod
+    def getPreviousDate(date):
+        """
+        Retrieves the newest date in the NYSE table that is before the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['NYSE'].previous(date)
+    
+    
+    @staticmethod
+    def getNextDate(date):
+        """
+        Retrieves the oldest date in the NYSE table that is after the given date.\n
+        Args:\n
+            date (str): Date in the format 'yyyy-mm-dd'.\n
+        Returns:\n
+            str: Date in the format 'yyyy-mm-dd', or None if there is none.
+        """
+        return date_indexes['NYSE'].next(date)
+        
         
     @staticmethod
     def writeData(date, advancing_V, declining_V, total_V, delta_V, close, upside_day, downside_day, 
@@ -340,12 +845,143 @@ class NYSE(Base):
         Returns:\n
             None
         """
+        NYSE.writeMany([{'date': date, 'advancing_V': advancing_V, 'declining_V': declining_V, 'total_V': total_V, 'delta_V': delta_V, 
+                        'close': close, 'upside_day': upside_day, 'downside_day': downside_day, 'advances': advances, 
+                        'declines': declines, 'net_ad': net_ad, 'td_breakaway': td_breakaway, 'Td_breakaway': Td_breakaway, 
+                        'ad_ratio': ad_ratio, 'ad_thrust': ad_thrust, 'fd_ad_thrust': fd_ad_thrust, 'fd_ud_V_thrust': fd_ud_V_thrust, 
+                        'new_highs': new_highs, 'new_lows': new_lows, 'net_hl': net_hl, 'tod_avg': tod_avg, 'std_avg': std_avg}])
+                
+                
+    @staticmethod
+    def writeMany(rows, on_conflict='ignore', session=None):
+        """
+        Write a batch of rows to the NYSE table in one transaction using `INSERT ... ON CONFLICT (Date)`.\n
+        Args:\n
+            rows (list(dict)): Rows keyed like the arguments of `writeData` (date, advancing_V, declining_V, ...).\n
+            on_conflict (str, optional): 'ignore' skips rows whose date already exists, 'update' overwrites them. Defaults to 'ignore'.\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.\n
+        Raises:\n
+            ValueError: If on_conflict is not 'ignore' or 'update'.
+        """
+        _writeMany(NYSE, rows, ('date',), on_conflict=on_conflict, session=session)
+
+    
+    @staticmethod
+    def updateMany(rows, session=None):
+        """
+        Overwrites columns of existing rows in one transaction (e.g. recomputed metrics).\n
+        Args:\n
+            rows (list(dict)): Rows with 'date' and the attributes to set (delta_V, td_breakaway, ...).\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.
+        """
+        _updateMany(NYSE, rows, session=session)
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+class BreadthIndicators(Base):
+    __tablename__ = 'Breadth Indicators'
+    __table_args__ = (sqla.Index('ix_breadth_exchange_indicator_day', 'Exchange', 'Indicator', 'Day Number'),)
+    exchange = sqla.Column('Exchange', sqla.Text, primary_key=True) # 'NASDAQ' or 'NYSE'
+    date = sqla.Column('Date', sqla.Text, primary_key=True)
+    name = sqla.Column('Indicator', sqla.Text, primary_key=True) # Key of composite_metrics.INDICATORS
+    day = sqla.Column('Day Number', sqla.Integer) # Same date as an integer, see day_numbers.py
+    value = sqla.Column('Value', sqla.Float)
+    
+    
+    @staticmethod
+    def writeMany(rows, on_conflict='ignore', session=None):
+        """
+        Write a batch of indicator values in one transaction using `INSERT ... ON CONFLICT (Exchange, Date, Indicator)`.\n
+        Args:\n
+            rows (list(dict)): Rows with 'exchange', 'date', 'name', and 'value'.\n
+            on_conflict (str, optional): 'ignore' keeps stored values, 'update' overwrites them. Defaults to 'ignore'.\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.\n
+        Raises:\n
+            ValueError: If on_conflict is not 'ignore' or 'update'.
+        """
+        _writeMany(BreadthIndicators, rows, ('exchange', 'date', 'name'), on_conflict=on_conflict, session=session)
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+class IndicatorState(Base):
+    __tablename__ = 'Indicator State'
+    exchange = sqla.Column('Exchange', sqla.Text, primary_key=True) # 'NASDAQ' or 'NYSE'
+    name = sqla.Column('Indicator', sqla.Text, primary_key=True) # Key of a recursive indicator in composite_metrics.INDICATORS
+    date = sqla.Column('Date', sqla.Text, nullable=False) # Newest session folded into the value
+    day = sqla.Column('Day Number', sqla.Integer) # Same date as an integer, see day_numbers.py
+    sessions = sqla.Column('Sessions', sqla.Integer, nullable=False) # How many sessions were folded in
+    value = sqla.Column('Value', sqla.Float) # Unrounded, the next step continues from it
+    
+    
+    @staticmethod
+    def writeMany(rows, session=None):
+        """
+        Replaces the running state of recursive indicators in one transaction.\n
+        Args:\n
+            rows (list(dict)): Rows with 'exchange', 'name', 'date', 'sessions', and 'value'.\n
+            session (Session, optional): Session to write with. If given, the caller commits. Defaults to None.
+        """
+        _writeMany(IndicatorState, rows, ('exchange', 'name'), on_conflict='update', session=session)
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+class IngestLog(Base):
+    __tablename__ = 'Ingest Log'
+    __table_args__ = (sqla.Index('ix_ingest_log_source_fetched', 'Source', 'Fetched At'),)
+    ID = sqla.Column('ID', sqla.Integer, primary_key=True)
+    source = sqla.Column('Source', sqla.Text, nullable=False)
+    url = sqla.Column('URL', sqla.Text)
+    fetched_at = sqla.Column('Fetched At', sqla.Text, nullable=False) # UTC, ISO 8601
+    data_date = sqla.Column('Data Date', sqla.Text)
+    outcome = sqla.Column('Outcome', sqla.Text, nullable=False) # 'new data', 'no new data', or 'error'
+    message = sqla.Column('Message', sqla.Text)
+    
+    
+    @staticmethod
+    def record(source, url, outcome, data_date=None, message=None):
+        """
+        Records one fetch attempt.\n
+        Args:\n
+            source (str): What was fetched ('Hedgeye' or 'Composites').\n
+            url (str): Page that was scraped.\n
+            outcome (str): 'new data', 'no new data', or 'error'.\n
+            data_date (str, optional): Date of the data the page returned, 'yyyy-mm-dd'. Defaults to None.\n
+            message (str, optional): Error message. Defaults to None.
+        """
         with createSession() as session:
-            if not NYSE.getData(date=date): # If new incoming data does not exist, add it to table
-                new_row = NYSE(date=date, advancing_V=advancing_V, declining_V=declining_V, total_V=total_V, delta_V=delta_V, 
-                                 close=close, upside_day=upside_day, downside_day=downside_day, advances=advances, 
-                                 declines=declines, net_ad=net_ad, td_breakaway=td_breakaway, Td_breakaway=Td_breakaway, 
-                                 ad_ratio=ad_ratio, ad_thrust=ad_thrust, fd_ad_thrust=fd_ad_thrust, fd_ud_V_thrust=fd_ud_V_thrust, 
-                                 new_highs=new_highs, new_lows=new_lows, net_hl=net_hl, tod_avg=tod_avg, std_avg=std_avg)
-                session.add(new_row)
-                session.commit()
\ No newline at end of file
+            session.add(IngestLog(source=source, url=url, fetched_at=datetime.now(timezone.utc).isoformat(timespec='seconds'), 
+                                  data_date=data_date, outcome=outcome, message=message))
+            session.commit()
+            
+            
+    @staticmethod
+    def getLastFetch(source, url=None, successful=True):
+        """
+        Retrieves the most recent fetch attempt for a source.\n
+        Args:\n
+            source (str): 'Hedgeye' or 'Composites'.\n
+            url (str, optional): Only consider fetches of this URL. Defaults to None (any URL).\n
+            successful (bool, optional): Only consider fetches that did not error. Defaults to True.\n
+        Returns:\n
+            IngestLog: The newest matching attempt, or None.
+        """
+        with createSession() as session:
+            query = session.query(IngestLog).filter(IngestLog.source == source)
+            if url:
+                query = query.filter(IngestLog.url == url)
+            if successful:
+                query = query.filter(IngestLog.outcome != 'error')
+            return query.order_by(sqla.desc(IngestLog.fetched_at)).first()
+
+
+# ---------------------------------------------------------------------------------------------
+
+
+# One maintained date index per table, filled lazily and updated by committed writes
+date_indexes = {model.__tablename__: DateIndex(partial(_loadDates, model), partial(_loadLatestDate, model)) for model in (Hedgeye, NASDAQ, NYSE)}
@@ -0,0 +1,283 @@
+from DBControls.db_read_write import Hedgeye, Tickers, getEngine
+from DBControls.query_cache import cachedQuery
+from DBControls.day_numbers import validateDate, toDayNumber
+from functools import lru_cache
+import sqlalchemy as sqla
+import numpy as np
+
+# Read layer for the hot GUI and metric queries. It returns SQLAlchemy Core rows (tuples that also allow
+# attribute access by the model's attribute names, e.g. row.close) instead of identity-mapped ORM objects.
+# The ORM models in db_read_write.py are still used for writes and the schema.
+
+
+@lru_cache(maxsize=None)
+def _selectList(model):
+    """Builds '"Column Name" AS attribute, ...' so raw rows expose the same attribute names as the ORM model."""
+    return ', '.join(f'"{column.name}" AS {attribute}' for attribute, column in sqla.inspect(model).columns.items())
+
+
+# Ticker and description come from the Tickers dimension table, every other column from Hedgeye
+_HEDGEYE_SELECT = (f'SELECT h."ID" AS ID, h."Date" AS date, h."Day Number" AS day, h."Ticker ID" AS ticker_id, t."Symbol" AS ticker, t."Description" AS description, '
+                   + ', '.join(f'h."{column.name}" AS {attribute}' for attribute, column in sqla.inspect(Hedgeye).columns.items() 
+                               if isinstance(column.type, sqla.Float))
+                   + ' FROM "Hedgeye" h LEFT JOIN "Tickers" t ON t."ID" = h."Ticker ID"')
+
+
+@cachedQuery('Hedgeye')
+def readHedgeye(date=None, ticker=None):
+    """
+    Same lookup as `Hedgeye.getData` without building ORM objects.\n
+    Args:\n
+        date (str, optional): Date in the format 'yyyy-mm-dd'. Defaults to None.\n
+        ticker (str, optional): Ticker symbol. Defaults to None.\n
+    Returns:\n
+        list(sqlalchemy.engine.Row): Rows ordered by date. If neither argument is given, the rows of the most recent date.\n
+    Raises:\n
+        ValueError: If the date is not in the correct format.
+    """
+    conditions, params = [], []
+
+    if date:
+        conditions.append('h."Day Number" = ?')
+        params.append(toDayNumber(date)) # Raises ValueError on a malformed date
+
+    if ticker:
+        ticker_id = Tickers.getId(ticker)
+        if ticker_id is None:
+            return []
+        conditions.append('h."Ticker ID" = ?') # Integer comparison on the (Ticker ID, Day Number) index
+        params.append(ticker_id)
+
+    if not date and not ticker: # Gets most recent data by date in table
+        conditions.append('h."Date" = (SELECT MAX("Date") FROM "Hedgeye")')
+
+    sql = f'{_HEDGEYE_SELECT} WHERE {" AND ".join(conditions)} ORDER BY h."Date"'
+    with getEngine().connect() as connection:
+        return connection.exec_driver_sql(sql, tuple(params)).all()
+
+
+
+def readHedgeyeHistory(ticker, start, end):
+    """
+    One ticker's buy, sell, and close between two day numbers in a single index range scan. Used by the metric lookbacks.\n
+    Args:\n
+        ticker (str): Ticker symbol.\n
+        start (int): First day number to include (see day_numbers.py).\n
+        end (int): Last day number to include.\n
+    Returns:\n
+        list(sqlalchemy.engine.Row): Rows with day, buy, sell, and close ordered by day.
+    """
+    ticker_id = Tickers.getId(ticker)
+    if ticker_id is None:
+        return []
+
+    sql = '''SELECT "Day Number" AS day, "Buy" AS buy, "Sell" AS sell, "Close" AS close FROM "Hedgeye" 
+             WHERE "Ticker ID" = ? AND "Day Number" BETWEEN ? AND ? ORDER BY "Day Number"'''
+    with getEngine().connect() as connection:
+        return connection.exec_driver_sql(sql, (ticker_id, start, end)).all()
+
+
+def readHedgeyeArrays(columns, tickers=None, start=None, end=None, session=None):
+    """
+    Loads Hedgeye columns for many tickers at once as NumPy arrays, for the vectorized recomputes.\n
+    Args:\n
+        columns (tuple(str)): Numeric attributes to load (e.g. 'buy', 'close', 'od_delta').\n
+        tickers (iterable(str), optional): Ticker symbols to load. Defaults to None (every ticker).\n
+        start (int, optional): First day number to include. Defaults to None (no lower bound).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+        session (Session, optional): Session to read with, so rows it wrote but has not committed are included. Defaults to None.\n
+    Returns:\n
+        dict: {'ID': int64, 'ticker_id': int64, 'day': int64, column: float64, ...} arrays sorted by (ticker_id, day). Missing values are NaN.
+    """
+    table_columns = sqla.inspect(Hedgeye).columns
+    conditions, params = ['"Ticker ID" IS NOT NULL', '"Day Number" IS NOT NULL'], []
+
+    if tickers is not None:
+        tickers = list(tickers)
+        conditions.append(f'"Ticker ID" IN (SELECT "ID" FROM "Tickers" WHERE "Symbol" IN ({", ".join("?" * len(tickers)) or "NULL"}))')
+        params.extend(tickers)
+    if start is not None:
+        conditions.append('"Day Number" >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('"Day Number" <= ?')
+        params.append(end)
+
+    select = ', '.join(f'"{table_columns[column].name}"' for column in columns)
+    sql = f'SELECT "ID", "Ticker ID", "Day Number", {select} FROM "Hedgeye" WHERE {" AND ".join(conditions)} ORDER BY "Ticker ID", "Day Number"'
+    if session is not None:
+        rows = session.connection().exec_driver_sql(sql, tuple(params)).all()
+    else:
+        with getEngine().connect() as connection:
+            rows = connection.exec_driver_sql(sql, tuple(params)).all()
+
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 3)
+    arrays = {key: np.array(value, dtype=np.int64) for key, value in zip(('ID', 'ticker_id', 'day'), values)}
+    for column, value in zip(columns, values[3:]):
+        arrays[column] = np.array(value, dtype=np.float64) # None becomes NaN
+    return arrays
+
+
+def readHedgeyeMatrix(columns, tickers=None, start=None, end=None):
+    """
+    Loads Hedgeye columns as date x ticker matrices, for the cross-ticker backtests and statistics.\n
+    Args:\n
+        columns (tuple(str)): Numeric attributes to load (e.g. 'buy', 'close').\n
+        tickers (iterable(str), optional): Ticker symbols to load. Defaults to None (every ticker).\n
+        start (int, optional): First day number to include. Defaults to None (no lower bound).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+    Returns:\n
+        dict: {'day': int64 array of every day with data, 'tickers': tuple of symbols, column: float64 array of shape (days, tickers), ...}.
+        Tickers are in ID order. NaN where a ticker has no row on a day (before it entered or after it left the universe).
+    """
+    arrays = readHedgeyeArrays(columns, tickers=tickers, start=start, end=end)
+    days, rows = np.unique(arrays['day'], return_inverse=True)
+    ids, cols = np.unique(arrays['ticker_id'], return_inverse=True)
+    symbols = Tickers.getSymbols()
+    
+    matrix = {'day': days, 'tickers': tuple(symbols[i] for i in ids.tolist())}
+    for column in columns:
+        matrix[column] = np.full((len(days), len(ids)), np.nan)
+        matrix[column][rows, cols] = arrays[column]
+    return matrix
+
+
+def readHedgeyeDays(tickers=None, end=None, count=None):
+    """
+    Day numbers with Hedgeye data, so a rolling window can load just the days it covers.\n
+    Args:\n
+        tickers (iterable(str), optional): Only days some of these tickers have a row on. Defaults to None (every ticker).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+        count (int, optional): How many of the newest days to keep. Defaults to None (every day).\n
+    Returns:\n
+        numpy.ndarray: int64 day numbers, ascending.
+    """
+    conditions, params = ['"Ticker ID" IS NOT NULL', '"Day Number" IS NOT NULL'], []
+
+    if tickers is not None:
+        tickers = list(tickers)
+        conditions.append(f'"Ticker ID" IN (SELECT "ID" FROM "Tickers" WHERE "Symbol" IN ({", ".join("?" * len(tickers)) or "NULL"}))')
+        params.extend(tickers)
+    if end is not None:
+        conditions.append('"Day Number" <= ?')
+        params.append(end)
+
+    sql = f'SELECT DISTINCT "Day Number" FROM "Hedgeye" WHERE {" AND ".join(conditions)} ORDER BY "Day Number" DESC'
+    if count is not None:
+        sql += ' LIMIT ?'
+        params.append(count)
+    with getEngine().connect() as connection:
+        days = [day for day, in connection.exec_driver_sql(sql, tuple(params)).all()]
+    return np.array(days[::-1], dtype=np.int64)
+
+
+def readCompositeArrays(table, columns, start=None, end=None):
+    """
+    Loads NASDAQ or NYSE columns as NumPy arrays in one query, for the rolling-window metrics.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        columns (tuple(str)): Numeric attributes to load (e.g. 'advances', 'net_hl').\n
+        start (int, optional): First day number to include. Defaults to None (no lower bound).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+    Returns:\n
+        dict: {'day': int64, column: float64, ...} arrays sorted by day. Missing values are NaN.
+    """
+    table_columns = sqla.inspect(table).columns
+    conditions, params = ['"Day Number" IS NOT NULL'], []
+
+    if start is not None:
+        conditions.append('"Day Number" >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('"Day Number" <= ?')
+        params.append(end)
+
+    select = ', '.join(f'"{table_columns[column].name}"' for column in columns)
+    sql = f'SELECT "Day Number", {select} FROM "{table.__tablename__}" WHERE {" AND ".join(conditions)} ORDER BY "Day Number"'
+    with getEngine().connect() as connection:
+        rows = connection.exec_driver_sql(sql, tuple(params)).all()
+
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    arrays = {'day': np.array(values[0], dtype=np.int64)}
+    for column, value in zip(columns, values[1:]):
+        arrays[column] = np.array(value, dtype=np.float64) # None becomes NaN
+    return arrays
+
+
+@cachedQuery()
+def readComposite(table, date=None):
+    """
+    Same lookup as `NASDAQ.getData`/`NYSE.getData` without building an ORM object.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        date (str, optional): Date in the format 'yyyy-mm-dd'. If not provided, the most recent row is retrieved.\n
+    Returns:\n
+        sqlalchemy.engine.Row: The row for that date, or None if there is none.\n
+    Raises:\n
+        ValueError: If the date argument is not in the correct format 'yyyy-mm-dd'.
+    """
+    name = table.__tablename__
+
+    if date:
+        validateDate(date)
+        sql = f'SELECT {_selectList(table)} FROM "{name}" WHERE "Date" = ?'
+        params = (date,)
+    else: # Gets most recent data by date in table
+        sql = f'SELECT {_selectList(table)} FROM "{name}" ORDER BY "Date" DESC LIMIT 1'
+        params = ()
+
+    with getEngine().connect() as connection:
+        return connection.exec_driver_sql(sql, params).first()
+
+
+@cachedQuery('Breadth Indicators')
+def readIndicators(table, date):
+    """
+    Registered breadth indicators of one composite row.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        date (str): Date in the format 'yyyy-mm-dd'.\n
+    Returns:\n
+        dict: {indicator name: value}. Indicators without a stored value are left out.\n
+    Raises:\n
+        ValueError: If the date argument is not in the correct format 'yyyy-mm-dd'.
+    """
+    sql = 'SELECT "Indicator", "Value" FROM "Breadth Indicators" WHERE "Exchange" = ? AND "Day Number" = ?'
+    with getEngine().connect() as connection:
+        return dict(connection.exec_driver_sql(sql, (table.__tablename__, toDayNumber(date))).all())
+
+
+def readIndicatorHistory(table, start=None, end=None):
+    """
+    Every stored indicator value of an exchange, for the recompute to compare against.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+        start (int, optional): First day number to include. Defaults to None (no lower bound).\n
+        end (int, optional): Last day number to include. Defaults to None (no upper bound).\n
+    Returns:\n
+        dict: {(day number, indicator name): value}.
+    """
+    conditions, params = ['"Exchange" = ?'], [table.__tablename__]
+    if start is not None:
+        conditions.append('"Day Number" >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('"Day Number" <= ?')
+        params.append(end)
+
+    sql = f'SELECT "Day Number", "Indicator", "Value" FROM "Breadth Indicators" WHERE {" AND ".join(conditions)}'
+    with getEngine().connect() as connection:
+        return {(day, name): value for day, name, value in connection.exec_driver_sql(sql, tuple(params)).all()}
+
+
+def readIndicatorState(table):
+    """
+    Persisted running state of the recursive breadth indicators of an exchange. Never cached, every ingest advances it.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE model class.\n
+    Returns:\n
+        dict: {indicator name: row with day, sessions, and value}.
+    """
+    sql = 'SELECT "Indicator" AS name, "Day Number" AS day, "Sessions" AS sessions, "Value" AS value FROM "Indicator State" WHERE "Exchange" = ?'
+    with getEngine().connect() as connection:
+        return {row.name: row for row in connection.exec_driver_sql(sql, (table.__tablename__,)).all()}
@@ -0,0 +1,158 @@
+from DBControls.db_read_write import Tickers
+from DBControls.fast_read import readHedgeyeArrays
+from DBControls.query_cache import cachedQuery
+from DBControls.day_numbers import validateDate, toDayNumber
+from DBControls.hedgeye_metrics import round_values
+import numpy as np
+
+# Cross-sectional statistics of one day of risk ranges, computed over the whole universe at once.
+# The per-date part is cached under the date and the per-ticker history statistics under the whole table,
+# so a write only drops what it could change and the z-scores (which need both) are combined on every call.
+
+METRICS = ('asymmetry', 'range_width', 'close_position') # Also z-scored against each ticker's own history
+INPUT_COLUMNS = ('buy', 'sell', 'close')
+
+
+def compute_metrics(buy, sell, close):
+    """
+    Args:\n
+        buy, sell, close (numpy.ndarray): Aligned float arrays.\n
+    Returns:\n
+        dict: {metric: float64 array} for every name in METRICS. Zero closes and empty ranges give NaN.\n
+        asymmetry: Range asymmetry, ra_buy + ra_sell (% of close the middle of the range sits above the close).\n
+        range_width: Width of the range as % of close.\n
+        close_position: Where the close sits in the range, 0 at the low end and 1 at the high end (outside [0, 1] when it broke out).
+    """
+    low, high = np.minimum(buy, sell), np.maximum(buy, sell)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        close = np.where(close == 0, np.nan, close)
+        width = np.where(high == low, np.nan, high - low)
+        return {
+            'asymmetry': ((buy - close) + (sell - close)) / close * 100,
+            'range_width': (high - low) / close * 100,
+            'close_position': (close - low) / width
+        }
+
+
+def percentile_ranks(values):
+    """
+    Args:\n
+        values (numpy.ndarray): One value per ticker, NaN where missing.\n
+    Returns:\n
+        numpy.ndarray: Percentage of the other values below each value, ties counting half (0 to 100). NaN stays NaN.
+    """
+    present = np.sort(values[~np.isnan(values)])
+    ranks = np.full(len(values), np.nan)
+    if len(present) > 1:
+        mask = ~np.isnan(values)
+        below = np.searchsorted(present, values[mask], side='left')
+        ties = np.searchsorted(present, values[mask], side='right') - below - 1 # Not counting the value itself
+        ranks[mask] = (below + ties / 2) / (len(present) - 1) * 100
+    return ranks
+
+
+def group_moments(ticker_ids, values, size):
+    """
+    Args:\n
+        ticker_ids (numpy.ndarray): Ticker ID of each value.\n
+        values (numpy.ndarray): Values to group, NaN ignored.\n
+        size (int): Length of the output arrays (largest ticker ID + 1).\n
+    Returns:\n
+        tuple(numpy.ndarray): (mean, population standard deviation) indexed by ticker ID. NaN for tickers with no values.
+    """
+    mask = ~np.isnan(values)
+    counts = np.bincount(ticker_ids[mask], minlength=size).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(ticker_ids[mask], weights=values[mask], minlength=size) / counts
+        centered = values[mask] - mean[ticker_ids[mask]] # Two passes, so large values do not lose the variance
+        std = np.sqrt(np.bincount(ticker_ids[mask], weights=centered * centered, minlength=size) / counts)
+    return mean, std
+
+
+def _readOnly(arrays):
+    """Cached arrays are shared between callers, so writing to one is made an error."""
+    for array in arrays.values():
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    return arrays
+
+
+@cachedQuery('Hedgeye')
+def history_stats():
+    """
+    Every ticker's mean and standard deviation of each metric over all of its stored rows, from one query.\n
+    Returns:\n
+        dict: {metric: {'mean': array, 'std': array}} of float64 arrays indexed by ticker ID. Read-only, it is shared through the cache.
+    """
+    arrays = readHedgeyeArrays(INPUT_COLUMNS)
+    size = int(arrays['ticker_id'].max()) + 1 if len(arrays['ticker_id']) else 0
+    metrics = compute_metrics(arrays['buy'], arrays['sell'], arrays['close'])
+    stats = {}
+    for name in METRICS:
+        stats[name] = _readOnly(dict(zip(('mean', 'std'), group_moments(arrays['ticker_id'], metrics[name], size))))
+    return stats
+
+
+@cachedQuery('Hedgeye')
+def load_cross_section(date):
+    """
+    Loads one day of the universe and computes everything that only depends on that day.\n
+    Args:\n
+        date (str): 'yyyy-mm-dd'.\n
+    Returns:\n
+        dict: {'ticker_id': int64, 'ticker': tuple(str), 'buy', 'sell', 'close', metric, metric + '_percentile': float64} arrays sorted by ticker ID.
+        Read-only, it is shared through the cache.
+    """
+    validateDate(date)
+    day = toDayNumber(date)
+    arrays = readHedgeyeArrays(INPUT_COLUMNS, start=day, end=day)
+    symbols = Tickers.getSymbols()
+
+    section = {'ticker_id': arrays['ticker_id'], 'ticker': tuple(symbols[i] for i in arrays['ticker_id'].tolist())}
+    section.update({column: arrays[column] for column in INPUT_COLUMNS})
+    for name, values in compute_metrics(arrays['buy'], arrays['sell'], arrays['close']).items():
+        section[name] = values
+        section[f'{name}_percentile'] = percentile_ranks(values)
+    return _readOnly(section)
+
+
+def cross_section(date):
+    """
+    Cross-sectional statistics of every ticker on a date: the METRICS, their percentile ranks among the day's tickers,
+    and their z-scores against each ticker's own stored history.\n
+    Args:\n
+        date (str): 'yyyy-mm-dd'.\n
+    Returns:\n
+        dict: `load_cross_section` arrays plus metric + '_z' arrays. NaN where a value or a ticker's spread is missing or zero.
+    """
+    section = dict(load_cross_section(date))
+    stats = history_stats()
+    ids = section['ticker_id']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name in METRICS:
+            mean, std = stats[name]['mean'], stats[name]['std']
+            known = ids < len(mean) # A ticker written after the stats were read is not in them
+            z = np.full(len(ids), np.nan)
+            z[known] = (section[name][known] - mean[ids[known]]) / np.where(std[ids[known]] == 0, np.nan, std[ids[known]])
+            section[f'{name}_z'] = z
+    return section
+
+
+def ranking(date, by='asymmetry_percentile', descending=True):
+    """
+    Args:\n
+        date (str): 'yyyy-mm-dd'.\n
+        by (str, optional): `cross_section` key to sort by. Defaults to 'asymmetry_percentile'.\n
+        descending (bool, optional): Largest first. Defaults to True. Missing values always sort last.\n
+    Returns:\n
+        list(dict): One dict per ticker with the ticker and every statistic, rounded to 2 places (None where missing).
+    """
+    section = cross_section(date)
+    keys = [key for key in section if key not in ('ticker_id', 'ticker')]
+    if by not in keys:
+        raise ValueError(f'Cannot rank by {by!r}. Choose one of {keys}.')
+
+    values = section[by]
+    order = np.lexsort((-values if descending else values, np.isnan(values))) # Last key is primary: NaN last
+    columns = {key: round_values(section[key][order]) for key in keys}
+    return [dict(ticker=section['ticker'][i], **{key: columns[key][n] for key in keys}) for n, i in enumerate(order.tolist())]
@@ -0,0 +1,220 @@
+"""
+Backtests rule-based strategies on the Hedgeye risk ranges over every ticker at once.
+Usage: python -m DBControls.hedgeye_backtest [path/to/database.db] [--processes N]
+Sweeps the entry/exit levels of `range_rule` and prints the best parameter sets and the per-ticker results of the best one.
+"""
+
+from DBControls.fast_read import readHedgeyeMatrix
+from DBControls.day_numbers import toDayNumber
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+import os
+
+# A rule looks at each day's close and range and sets a target exposure per ticker (NaN keeps the previous one).
+# The exposure is held from that close to the next day with data, so a rule never trades on a price it has not seen.
+# Everything is a (days, tickers) matrix: a whole backtest is a handful of array operations, whatever the number of tickers.
+
+DEFAULT_GRID = {
+    'entry': [0.0, 0.1, 0.2, 0.3, 0.4],
+    'exit': [0.6, 0.7, 0.8, 0.9, 1.0],
+    'trim': [0.0, 0.5]
+}
+
+
+def forward_fill(matrix):
+    """Fills NaN with the last value above it in the same column. Leading NaN stays NaN."""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def close_returns(close):
+    """
+    Args:\n
+        close (numpy.ndarray): (days, tickers) closes, NaN where a ticker has no row.\n
+    Returns:\n
+        numpy.ndarray: (days - 1, tickers) return from each day's close to the next, 0 across days without data.
+    """
+    filled = forward_fill(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = filled[1:] / filled[:-1] - 1
+    returns[~np.isfinite(returns)] = 0 # Before a ticker entered the universe
+    return returns
+
+
+def load_matrix(start=None, end=None, tickers=None):
+    """
+    Args:\n
+        start (str, optional): First date, 'yyyy-mm-dd'. Defaults to None (no lower bound).\n
+        end (str, optional): Last date, 'yyyy-mm-dd'. Defaults to None (no upper bound).\n
+        tickers (iterable(str), optional): Ticker symbols to load. Defaults to None (every ticker).\n
+    Returns:\n
+        dict: `readHedgeyeMatrix` of buy, sell, and close, run through `prepare`.\n
+    Raises:\n
+        ValueError: If there is no Hedgeye data in the range.
+    """
+    return prepare(readHedgeyeMatrix(('buy', 'sell', 'close'), tickers=tickers,
+                                     start=toDayNumber(start) if start else None, end=toDayNumber(end) if end else None))
+
+
+def prepare(matrix):
+    """
+    Adds what every backtest needs but no parameter changes, so a sweep computes it once.\n
+    Args:\n
+        matrix (dict): {'buy', 'sell', 'close'} (days, tickers) arrays.\n
+    Returns:\n
+        dict: The same dict with 'returns' (`close_returns`), 'position' (`range_position`), 'has_data' (a close on each day but the last),
+        and 'buy_and_hold' (return from each ticker's first close to its last).\n
+    Raises:\n
+        ValueError: If the matrix has no days or no tickers.
+    """
+    close = matrix['close']
+    if not close.size:
+        raise ValueError(f'No Hedgeye data to backtest ({close.shape[0]} days, {close.shape[1]} tickers).')
+    matrix['returns'] = close_returns(close)
+    matrix['position'] = range_position(matrix)
+    matrix['has_data'] = ~np.isnan(close[:-1])
+    matrix['buy_and_hold'] = forward_fill(close)[-1] / forward_fill(close[::-1])[-1] - 1 # Last close over first close
+    return matrix
+
+
+def range_position(matrix):
+    """Where each close sits in its range: 0 at the buy level, 1 at the sell level. NaN for a missing or empty range."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        width = matrix['sell'] - matrix['buy']
+        return (matrix['close'] - matrix['buy']) / np.where(width == 0, np.nan, width)
+
+
+def range_rule(matrix, entry=0.2, exit=0.8, trim=0.0):
+    """
+    Buys near the buy level and trims near the sell level.\n
+    Args:\n
+        matrix (dict): Result of `load_matrix` or `prepare`.\n
+        entry (float, optional): Fully invested when the close is at most this far into the range. Defaults to 0.2.\n
+        exit (float, optional): Cut to `trim` when the close is at least this far into the range. Defaults to 0.8.\n
+        trim (float, optional): Exposure kept after trimming, 0 to sell everything. Defaults to 0.0.\n
+    Returns:\n
+        numpy.ndarray: (days, tickers) target exposure, NaN to hold.\n
+    Raises:\n
+        ValueError: If entry is not below exit.
+    """
+    if entry >= exit:
+        raise ValueError(f'entry ({entry}) must be below exit ({exit}).')
+
+    position = matrix['position']
+    target = np.full(position.shape, np.nan)
+    target[position <= entry] = 1.0
+    target[position >= exit] = trim
+    return target
+
+
+def backtest(matrix, rule=range_rule, **params):
+    """
+    Runs a rule over every ticker.\n
+    Args:\n
+        matrix (dict): Result of `load_matrix` or `prepare`.\n
+        rule (function, optional): rule(matrix, **params) -> (days, tickers) target exposure, NaN to hold. Defaults to `range_rule`.\n
+        **params: Passed on to the rule.\n
+    Returns:\n
+        dict: Arrays indexed like matrix['tickers']:\n
+        trades: Number of trades (a run of days with exposure, the last one may still be open).\n
+        hit_rate: Fraction of trades that made money. NaN without trades.\n
+        mean_trade: Average trade return. NaN without trades.\n
+        total_return: Compounded return of the strategy.\n
+        buy_and_hold: Return of holding the ticker from its first close to its last.\n
+        exposure: Average exposure over the days the ticker has data.
+    """
+    returns = matrix['returns']
+    days, tickers = returns.shape
+    exposure = np.nan_to_num(forward_fill(rule(matrix, **params)))[:-1] # The last close has nothing to be held into
+    growth = np.log1p(exposure * returns)
+
+    invested = exposure > 0
+    starts = invested & ~np.vstack([np.zeros((1, tickers), dtype=bool), invested[:-1]])
+    flat_invested, flat_starts = invested.T.ravel(), starts.T.ravel() # Ticker-major, so trades never span tickers
+    trade_ids = np.cumsum(flat_starts) - 1
+    trade_returns = np.expm1(np.bincount(trade_ids[flat_invested], weights=growth.T.ravel()[flat_invested], minlength=flat_starts.sum()))
+    trade_tickers = np.flatnonzero(flat_starts) // days
+
+    trades = np.bincount(trade_tickers, minlength=tickers)
+    has_data = matrix['has_data']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'trades': trades,
+            'hit_rate': np.bincount(trade_tickers, weights=(trade_returns > 0).astype(np.float64), minlength=tickers) / np.where(trades, trades, np.nan),
+            'mean_trade': np.bincount(trade_tickers, weights=trade_returns, minlength=tickers) / np.where(trades, trades, np.nan),
+            'total_return': np.expm1(growth.sum(axis=0)),
+            'buy_and_hold': matrix['buy_and_hold'],
+            'exposure': (exposure * has_data).sum(axis=0) / has_data.sum(axis=0)
+        }
+
+
+_shared_matrix = None # Set once per worker process, so the matrix is not pickled with every task
+
+
+def _share(matrix):
+    global _shared_matrix
+    _shared_matrix = matrix
+
+
+def _run(task):
+    rule, params = task
+    return backtest(_shared_matrix, rule, **params)
+
+
+def sweep(matrix, grid=DEFAULT_GRID, rule=range_rule, processes=None):
+    """
+    Backtests every combination of parameters, spread over a process pool.\n
+    Args:\n
+        matrix (dict): Result of `load_matrix` or `prepare`.\n
+        grid (dict, optional): {parameter: list of values}. Defaults to DEFAULT_GRID.\n
+        rule (function, optional): Module-level rule function (it is pickled to the workers). Defaults to `range_rule`.\n
+        processes (int, optional): Worker processes, 1 to run in this process. Defaults to None (one per CPU).\n
+    Returns:\n
+        list(tuple): (params dict, `backtest` result) for every combination, in `itertools.product` order.
+        Combinations the rule rejects with a ValueError (e.g. entry above exit) are left out.
+    """
+    combinations = [dict(zip(grid, values)) for values in product(*grid.values())]
+    tasks = []
+    for params in combinations:
+        try:
+            rule(matrix, **params)
+        except ValueError:
+            continue
+        tasks.append((rule, params))
+
+    if processes == 1:
+        results = [backtest(matrix, rule, **params) for rule, params in tasks]
+    else:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers, initializer=_share, initargs=(matrix,)) as pool:
+            results = list(pool.map(_run, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    return [(params, result) for (_, params), result in zip(tasks, results)]
+
+
+if __name__ == '__main__':
+    from DBControls.db_read_write import configureDatabase, disposeEngines
+    from time import perf_counter
+    import sys
+
+    arguments = sys.argv[1:]
+    if arguments and arguments[0].endswith('.db'):
+        configureDatabase(arguments.pop(0))
+    processes = int(arguments[arguments.index('--processes') + 1]) if '--processes' in arguments else None
+
+    start = perf_counter()
+    matrix = load_matrix()
+    disposeEngines()
+    results = sweep(matrix, processes=processes)
+    print(f'{len(results)} parameter sets over {len(matrix["tickers"])} tickers and {len(matrix["day"])} days in {perf_counter() - start:.2f} s.')
+
+    results.sort(key=lambda result: np.nanmedian(result[1]['total_return']), reverse=True)
+    for params, result in results[:5]:
+        print(f'{params}: median return {np.nanmedian(result["total_return"]) * 100:.2f}%, hit rate {np.nanmean(result["hit_rate"]) * 100:.1f}%')
+
+    params, result = results[0]
+    print(f'\nBest {params}')
+    print(f'{"Ticker":<10}{"Trades":>8}{"Hit rate":>10}{"Return":>10}{"Hold":>10}')
+    for i, ticker in enumerate(matrix['tickers']):
+        print(f'{ticker:<10}{result["trades"][i]:>8}{result["hit_rate"][i] * 100:>9.1f}%{result["total_return"][i] * 100:>9.2f}%{result["buy_and_hold"][i] * 100:>9.2f}%')
@@ -0,0 +1,151 @@
+import DBControls.db_read_write as db
+from DBControls.fast_read import readHedgeyeMatrix, readHedgeyeDays
+from DBControls.day_numbers import toDayNumber
+from hashlib import sha1
+import numpy as np
+import tempfile
+import os
+
+# Rolling covariance and correlation between every pair of Hedgeye tickers, from daily log returns of the closes.
+# Each pair only uses the days both tickers have a return on, so tickers entering and leaving the universe (or missing
+# a day) never pull zeros or stale prices into a window. Windows are windowed differences of prefix sums of outer products,
+# computed for many end days at once, and only the days the requested windows cover are read. The matrix of one day is
+# kept in <database>.cache/ together with a digest of the closes it came from, so a repeated view is read back.
+
+CACHE_SUFFIX = '.cache' # Next to the database file, git-ignored
+
+
+def log_returns(close):
+    """
+    Args:\n
+        close (numpy.ndarray): (days, tickers) closes, NaN where a ticker has no row.\n
+    Returns:\n
+        numpy.ndarray: (days, tickers) log return from the previous day's close. NaN on the first day, around gaps, and for non-positive closes.
+    """
+    returns = np.full(close.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = np.log(close[1:] / close[:-1])
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def rolling_moments(returns, window, rows, min_periods=None):
+    """
+    Pairwise-complete rolling covariance and correlation, for the windows ending on some rows.\n
+    Args:\n
+        returns (numpy.ndarray): (days, tickers) returns, NaN where missing.\n
+        window (int): Rows per window, the end row included.\n
+        rows (numpy.ndarray): Ascending indices of the rows windows end on.\n
+        min_periods (int, optional): Fewest shared returns a pair needs. Defaults to None (half the window, at least 2).\n
+    Returns:\n
+        tuple(numpy.ndarray): (covariance, correlation), each (len(rows), tickers, tickers). NaN where a pair has too few shared returns.
+    """
+    min_periods = max(2, window // 2) if min_periods is None else max(2, min_periods)
+    rows = np.asarray(rows, dtype=np.int64)
+    tickers = returns.shape[1]
+    if not len(rows):
+        return np.empty((0, tickers, tickers)), np.empty((0, tickers, tickers))
+
+    first = max(0, int(rows[0]) - window + 1) # Only the rows some window reaches are summed
+    span = returns[first:int(rows[-1]) + 1]
+    valid = (~np.isnan(span)).astype(np.float64)
+    values = np.nan_to_num(span)
+
+    def windowed(products):
+        sums = np.concatenate([np.zeros((1, tickers, tickers)), np.cumsum(products, axis=0)])
+        ends = rows - first + 1
+        return sums[ends] - sums[np.maximum(ends - window, 0)]
+
+    count = windowed(valid[:, :, None] * valid[:, None, :])
+    sum_x = windowed(values[:, :, None] * valid[:, None, :]) # [i, j]: sum of i over the days j also has a return
+    sum_xx = windowed((values * values)[:, :, None] * valid[:, None, :])
+    sum_xy = windowed(values[:, :, None] * values[:, None, :])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = np.where(count >= min_periods, count, np.nan)
+        covariance = (sum_xy - sum_x * sum_x.swapaxes(1, 2) / count) / (count - 1)
+        variance = np.maximum((sum_xx - sum_x * sum_x / count) / (count - 1), 0) # Variance of i over the days shared with j
+        correlation = covariance / np.sqrt(variance * variance.swapaxes(1, 2))
+    return covariance, np.clip(correlation, -1, 1)
+
+
+def cache_path(window, min_periods, tickers, day):
+    """Cache file of one view (window size, min_periods, and ticker selection) on one day, next to the current database."""
+    selection = 'all' if tickers is None else sha1(','.join(sorted(tickers)).encode()).hexdigest()[:12]
+    return os.path.join(db.db_filename + CACHE_SUFFIX, f'correlation-{window}-{min_periods}-{selection}-{day}.npz')
+
+
+def _digest(matrix):
+    """Fingerprint of the days, tickers, and closes a window was computed from."""
+    digest = sha1(np.ascontiguousarray(matrix['day']).tobytes())
+    digest.update(','.join(matrix['tickers']).encode())
+    digest.update(np.ascontiguousarray(matrix['close']).tobytes())
+    return digest.hexdigest()
+
+
+def _save(path, **arrays):
+    """Writes an .npz through a uniquely named temporary file, so readers and concurrent writers never see a half-written one."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as temporary:
+        try:
+            np.savez(temporary, **arrays)
+        except BaseException:
+            temporary.close()
+            os.remove(temporary.name)
+            raise
+    os.replace(temporary.name, path)
+
+
+def rolling_correlation(window=60, min_periods=None, tickers=None, start=None, end=None):
+    """
+    Rolling covariance and correlation of every pair of tickers, for the days with data between two dates.
+    Only those days and the window before the first are read.\n
+    Args:\n
+        window (int, optional): Days with data per window. Defaults to 60.\n
+        min_periods (int, optional): Fewest shared returns a pair needs. Defaults to None (half the window).\n
+        tickers (iterable(str), optional): Ticker symbols to include. Defaults to None (every ticker).\n
+        start (str, optional): First date to compute, 'yyyy-mm-dd'. Defaults to None (the first day with data).\n
+        end (str, optional): Last date to compute, 'yyyy-mm-dd'. Defaults to None (the latest day with data).\n
+    Returns:\n
+        dict: {'day': int64 array, 'tickers': tuple of symbols with data in the windows, 'covariance', 'correlation': 
+        (days, tickers, tickers) float64 arrays}.
+    """
+    tickers = None if tickers is None else sorted(tickers)
+    first = None
+    if start is not None:
+        before = readHedgeyeDays(tickers, end=toDayNumber(start) - 1, count=window) # The first window's returns reach this far back
+        first = int(before[0]) if len(before) else toDayNumber(start)
+    
+    matrix = readHedgeyeMatrix(('close',), tickers=tickers, start=first, end=toDayNumber(end) if end is not None else None)
+    rows = np.flatnonzero(matrix['day'] >= toDayNumber(start)) if start is not None else np.arange(len(matrix['day']))
+    covariance, correlation = rolling_moments(log_returns(matrix['close']), window, rows, min_periods)
+    return {'day': matrix['day'][rows], 'tickers': matrix['tickers'], 'covariance': covariance, 'correlation': correlation}
+
+
+def correlation_on(date, window=60, min_periods=None, tickers=None, cache=True):
+    """
+    Correlation matrix of the window ending on one day. Only that window's closes are read and only its matrix is computed.\n
+    Args:\n
+        date (str): 'yyyy-mm-dd'. The newest day with data on or before it is used.\n
+        window, min_periods, tickers: See `rolling_correlation`.\n
+        cache (bool, optional): Read the matrix back from disk when the window's closes have not changed, and save it otherwise. Defaults to True.\n
+    Returns:\n
+        tuple: (tickers with data in the window, correlation matrix), or ((), None) if there is no data on or before the date.
+    """
+    tickers = None if tickers is None else sorted(tickers)
+    days = readHedgeyeDays(tickers, end=toDayNumber(date), count=window + 1) # One more day for the first return
+    if not len(days):
+        return (), None
+    
+    matrix = readHedgeyeMatrix(('close',), tickers=tickers, start=int(days[0]), end=int(days[-1]))
+    path = cache_path(window, min_periods, tickers, int(days[-1]))
+    digest = _digest(matrix)
+    if cache and os.path.exists(path):
+        with np.load(path) as cached:
+            if str(cached['digest']) == digest:
+                return tuple(cached['tickers'].tolist()), cached['correlation']
+    
+    correlation = rolling_moments(log_returns(matrix['close']), window, [len(matrix['day']) - 1], min_periods)[1][0]
+    if cache:
+        _save(path, digest=np.array(digest), tickers=np.array(matrix['tickers'], dtype=str), correlation=correlation)
+    return matrix['tickers'], correlation
@@ -1,150 +1,124 @@
-from DBControls.db_read_write import Hedgeye
-from datetime import datetime, timedelta
+from DBControls.db_read_write import Hedgeye, Tickers, createSession
+from DBControls.fast_read import readHedgeyeHistory, readHedgeyeArrays
+from DBControls.day_numbers import validateDate, toDayNumber, fromDayNumber, isWeekday
+from bisect import bisect_right
+import numpy as np
 
+# Each delta compares today with the first weekday that has data while walking back i days, for i in [start, stop)
+LOOKBACK_WINDOWS = {
+    'delta_ww': (7, 30),
+    'od_delta': (1, 30),
+    'ow_delta': (7, 30),
+    'om_delta': (30, 50),
+    'tm_delta': (90, 120),
+    'sm_delta': (180, 210),
+    'oy_delta': (365, 400)
+}
+HISTORY_DAYS = max(stop for _, stop in LOOKBACK_WINDOWS.values()) # Every window fits in this many days before the date
+DERIVED_COLUMNS = tuple(LOOKBACK_WINDOWS) + ('ra_buy', 'ra_sell')
+KEY_STRIDE = 1 << 20 # Day numbers stay below this until the year 4840, so (ticker, day) packs into one sortable integer
 
-def compute_delta_ww(date, ticker, today_buy, today_sell):
+
+def load_history(date, ticker):
     """
-    (today_buy - today_sell) - (past_week_buy - past_week_sell)
+    Fetches everything the lookbacks of one row can reference with a single query.\n
+    Args:\n
+        date (str): Date of the row being computed, 'yyyy-mm-dd'.\n
+        ticker (str): The stock ticker symbol.\n
+    Returns:\n
+        tuple: (sorted list of day numbers, list of rows with buy, sell, and close), weekdays only.
+    """
+    day = toDayNumber(date)
+    rows = [row for row in readHedgeyeHistory(ticker, day - HISTORY_DAYS, day - 1) if isWeekday(row.day)] # Weekends are never looked back to
+    return [row.day for row in rows], rows
+
+
+def find_lookback(date, ticker, start, stop, history=None):
+    """
+    Finds the row the walk back over [start, stop) days would stop at, with a binary search instead of a query per day.\n
+    Args:\n
+        date (str): Date of the row being computed, 'yyyy-mm-dd'.\n
+        ticker (str): The stock ticker symbol.\n
+        start (int): Fewest days back to look.\n
+        stop (int): Days back where the search gives up (exclusive).\n
+        history (tuple, optional): Result of `load_history` for the date and ticker. Defaults to None (fetched).\n
+    Returns:\n
+        Row with buy, sell, and close, or None if no weekday in the window has data.
     """
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    days, rows = history if history is not None else load_history(date, ticker)
+    day = toDayNumber(date)
     
-    for i in range(7, 30):
-        new_date_obj = date_obj - timedelta(days=i) # Go back i days
-        
-        if new_date_obj.weekday() < 5: # Only make calculation on weekday
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-        
-            if old_data:
-                return round((today_buy - today_sell) - (old_data[0].buy - old_data[0].sell), 2)
+    i = bisect_right(days, day - start) - 1 # Newest day at least `start` days back
+    if i >= 0 and days[i] > day - stop:
+        return rows[i]
+    return None
+
+
+def percent_delta(close, old_data):
+    """
+    [(close - old_close) / old_close] * 100 (%)\n
+    Args:\n
+        close (float): Today's close.\n
+        old_data: Row found by `find_lookback`, or None.\n
+    Returns:\n
+        float: The delta rounded to 2 places, or None without a row to compare against or when its close is 0 (as in `compute_derived`).
+    """
+    if old_data is None or old_data.close == 0:
+        return None
+    return round(((close - old_data.close) / old_data.close) * 100, 2)
+
+
+def compute_delta_ww(date, ticker, today_buy, today_sell, history=None):
+    """
+    (today_buy - today_sell) - (past_week_buy - past_week_sell)
+    """
+    old_data = find_lookback(date, ticker, *LOOKBACK_WINDOWS['delta_ww'], history=history)
+    if old_data:
+        return round((today_buy - today_sell) - (old_data.buy - old_data.sell), 2)
     return None # Cannot find data to make calculation
     
         
-def compute_od_delta(date, ticker, close):
+def compute_od_delta(date, ticker, close, history=None):
     """
     [(today_close - yesterday_close) / yesterday_close] * 100 (%)
     """
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['od_delta'], history=history))
     
-    for i in range(1, 30):
-        new_date_obj = date_obj - timedelta(days=i)
-        
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
         
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous day close value is 0. Cannot complete 1-Day Delta calculation.')     
-    return None
-       
-        
-def compute_ow_delta(date, ticker, close):
+def compute_ow_delta(date, ticker, close, history=None):
     """
     [(today_close - 7_days_ago_close) / 7_days_ago_close] * 100 (%)
     """
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['ow_delta'], history=history))
     
-    for i in range(7, 30):
-        new_date_obj = date_obj - timedelta(days=i)
-        
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-        
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous week close value is 0. Cannot complete 1-Week Delta calculation.')
-    return None        
-        
         
-def compute_om_delta(date, ticker, close):
+def compute_om_delta(date, ticker, close, history=None):
     """
     [(today_close - 1_month_ago_close) / 1_month_ago_close] * 100 (%)
     """
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['om_delta'], history=history))
     
-    for i in range(30, 50):
-        new_date_obj = date_obj - timedelta(days=i)
         
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-        
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous month close value is 0. Cannot complete 1-Month Delta calculation.')
-    return None
-        
-
-def compute_tm_delta(date, ticker, close):
+def compute_tm_delta(date, ticker, close, history=None):
     """
     [(today_close - 3_month_ago_close) / 3_month_ago_close] * 100 (%)
-    """   
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    """
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['tm_delta'], history=history))
     
-    for i in range(90, 120):
-        new_date_obj = date_obj - timedelta(days=i)
-        
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-            
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous third month close value is 0. Cannot complete 3-Month Delta calculation.')
-    return None
-        
         
-def compute_sm_delta(date, ticker, close):
+def compute_sm_delta(date, ticker, close, history=None):
     """
     [(today_close - 6_month_ago_close) / 6_month_ago_close] * 100 (%)
-    """   
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    """
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['sm_delta'], history=history))
     
-    for i in range(180, 210):
-        new_date_obj = date_obj - timedelta(days=i)
         
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-            
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous sixth month close value is 0. Cannot complete 6-Month Delta calculation.')
-    return None
-        
-
-def compute_oy_delta(date, ticker, close):
+def compute_oy_delta(date, ticker, close, history=None):
     """
     [(today_close - 1_year_ago_close) / 1_year_ago_close] * 100 (%)
-    """   
-    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    """
+    return percent_delta(close, find_lookback(date, ticker, *LOOKBACK_WINDOWS['oy_delta'], history=history))
     
-    for i in range(365, 400):
-        new_date_obj = date_obj - timedelta(days=i)
-        
-        if new_date_obj.weekday() < 5:
-            new_date = new_date_obj.strftime('%Y-%m-%d')
-            old_data = Hedgeye.getData(date=new_date, ticker=ticker)
-
-            if old_data:
-                try:
-                    return round(((close - old_data[0].close) / old_data[0].close) * 100, 2)
-                except ZeroDivisionError:
-                    raise ZeroDivisionError('Previous year close value is 0. Cannot complete 1-Year Delta calculation.')
-    return None
-        
 
 def compute_ra_buy(buy, close):
     """
@@ -166,11 +140,72 @@ def compute_ra_sell(sell, close):
     return round(((sell - close) / close) * 100, 2)
         
 
+def validate_row(date, ticker, description, buy, sell, close):
+    """
+    Checks the inputs of a new Hedgeye row.\n
+    Raises:\n
+        TypeError: If date, ticker, or description is not a string, or if buy, sell, or close is not an int or float.\n
+        ValueError: If the date is not in the correct format yyyy-mm-dd.\n
+        ZeroDivisionError: If the close value is 0, which would cause future errors.
+    """
+    if type(date) != str or type(ticker) != str or type(description) != str:
+        raise TypeError('Date, ticker, or description has a non-string type.')
+    
+    if not isinstance(buy, (int, float)) or not isinstance(sell, (int, float)) or not isinstance(close, (int, float)):
+        raise TypeError('Buy, sell, or close has a non-float or non-integer type.')
+    
+    validateDate(date)
+            
+    if close == 0: # Prevents future errors
+        raise ZeroDivisionError('Close value is 0. Cannot add new row to Hedgeye table.\n')
+
+
+def compute_row(date, ticker, description, buy, sell, close):
+    """
+    Validates the input parameters and computes the performance metrics for a new Hedgeye row without writing it.
+    This function validates input types, checks date format, and computes various performance deltas and relative
+    advantages for buy and sell prices.\n
+    Args:\n
+        date (str): The date of the entry in the format yyyy-mm-dd.\n
+        ticker (str): The stock ticker symbol.\n
+        description (str): A brief description of the stock.\n
+        buy (int or float): The buy price of the stock.\n
+        sell (int or float): The sell price of the stock.\n
+        close (int or float): The closing price of the stock.\n
+    Returns:\n
+        dict: Row keyed like the arguments of `Hedgeye.writeData`.\n
+    Raises:\n
+        TypeError: If date, ticker, or description is not a string, or if buy, sell, or close is not an int or float.\n
+        ValueError: If the date is not in the correct format yyyy-mm-dd.\n
+        ZeroDivisionError: If the close value is 0, which would cause future errors.
+    """
+    validate_row(date, ticker, description, buy, sell, close)
+    
+    history = load_history(date, ticker) # One query serves all seven lookbacks
+    return {
+        'date': date,
+        'ticker': ticker,
+        'description': description,
+        'buy': buy,
+        'sell': sell,
+        'close': close,
+        'delta_ww': compute_delta_ww(date, ticker, buy, sell, history),
+        'od_delta': compute_od_delta(date, ticker, close, history),
+        'ow_delta': compute_ow_delta(date, ticker, close, history),
+        'om_delta': compute_om_delta(date, ticker, close, history),
+        'tm_delta': compute_tm_delta(date, ticker, close, history),
+        'sm_delta': compute_sm_delta(date, ticker, close, history),
+        'oy_delta': compute_oy_delta(date, ticker, close, history),
+        'ra_buy': compute_ra_buy(buy, close),
+        'ra_sell': compute_ra_sell(sell, close)
+    }
+        
+
 def add_row(date, ticker, description, buy, sell, close):
     """
     Add a new row to the Hedgeye table with the given input parameters and calculated performance metrics.
-    This function validates input types, checks date format, and computes various performance deltas and relative
-    advantages for buy and sell prices. Finally, it writes the data to the Hedgeye table.\n
+    See `compute_row` for validation and the metrics computed. Finally, it writes the data to the Hedgeye table
+    and, if the date is in the past, updates the later rows whose deltas look back to it in the same transaction.\n
     Args:\n
         date (str): The date of the entry in the format yyyy-mm-dd.\n
         ticker (str): The stock ticker symbol.\n
@@ -183,29 +218,254 @@ def add_row(date, ticker, description, buy, sell, close):
         ValueError: If the date is not in the correct format yyyy-mm-dd.\n
         ZeroDivisionError: If the close value is 0, which would cause future errors.
     """
-    if type(date) != str or type(ticker) != str or type(description) != str:
-        raise TypeError('Date, ticker, or description has a non-string type.')
+    row = compute_row(date, ticker, description, buy, sell, close)
+    with createSession() as session:
+        Hedgeye.writeMany([row], session=session)
+        recompute_dependents([row], session=session)
+        session.commit()
+
+
+def compute_rows(date, stocks):
+    """
+    Computes the rows of a whole risk range at once, with the same validation and metrics as `compute_row`.
+    The lookback history of every ticker is fetched with one query and the metrics are computed as arrays.\n
+    Args:\n
+        date (str): The date of the risk range in the format yyyy-mm-dd.\n
+        stocks (list(dict)): {'Ticker', 'Description', 'Buy', 'Sell', 'Close'} per ticker, as returned by `reformatData`.\n
+    Returns:\n
+        list(dict): Rows keyed like the arguments of `Hedgeye.writeData`, in the order of stocks.\n
+    Raises:\n
+        TypeError: If date, a ticker, or a description is not a string, or if a buy, sell, or close is not an int or float.\n
+        ValueError: If the date is not in the correct format yyyy-mm-dd.\n
+        ZeroDivisionError: If a close value is 0, which would cause future errors.
+    """
+    for stock in stocks:
+        validate_row(date, stock['Ticker'], stock['Description'], stock['Buy'], stock['Sell'], stock['Close'])
+    if not stocks:
+        return []
     
-    if not isinstance(buy, (int, float)) or not isinstance(sell, (int, float)) or not isinstance(close, (int, float)):
-        raise TypeError('Buy, sell, or close has a non-float or non-integer type.')
+    day = toDayNumber(date)
+    history = readHedgeyeArrays(('buy', 'sell', 'close'), tickers={stock['Ticker'] for stock in stocks}, start=day - HISTORY_DAYS, end=day - 1)
+    ids = {symbol: ticker_id for ticker_id, symbol in Tickers.getSymbols().items()}
+    
+    # Today's rows join the history, tickers seen for the first time get placeholder IDs that match no history
+    new_ids = np.array([ids.get(stock['Ticker'], -1 - n) for n, stock in enumerate(stocks)], dtype=np.int64)
+    ticker_ids = np.concatenate([history['ticker_id'], new_ids])
+    days = np.concatenate([history['day'], np.full(len(stocks), day, dtype=np.int64)])
+    prices = {column: np.concatenate([history[column], np.array([stock[column.capitalize()] for stock in stocks], dtype=np.float64)]) 
+              for column in ('buy', 'sell', 'close')}
+    
+    order = np.lexsort((days, ticker_ids)) # Sorted by (ticker, day)
+    derived = compute_derived(ticker_ids[order], days[order], prices['buy'][order], prices['sell'][order], prices['close'][order])
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    today = position[len(history['day']):] # Where each of today's rows ended up after sorting
+    values = {column: round_values(derived[column][today]) for column in DERIVED_COLUMNS}
     
-    if date:
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
-        except:
-            ValueError('Date is not in the correct formate of yyyy-mm-dd.\n')
+    return [{'date': date, 
+             'ticker': stock['Ticker'], 
+             'description': stock['Description'], 
+             'buy': stock['Buy'], 
+             'sell': stock['Sell'], 
+             'close': stock['Close'], 
+             **{column: values[column][n] for column in DERIVED_COLUMNS}} 
+            for n, stock in enumerate(stocks)]
+
+
+def add_rows(date, stocks):
+    """
+    Adds a whole risk range to the Hedgeye table in one transaction. See `compute_rows` for validation and the metrics computed.
+    Costs a constant number of queries no matter how many tickers there are. If the date is in the past, 
+    the later rows whose deltas look back to it are updated in the same transaction.\n
+    Args:\n
+        date (str): The date of the risk range in the format yyyy-mm-dd.\n
+        stocks (list(dict)): {'Ticker', 'Description', 'Buy', 'Sell', 'Close'} per ticker, as returned by `reformatData`.\n
+    Returns:\n
+        list(dict): The rows written.\n
+    Raises:\n
+        TypeError: If date, a ticker, or a description is not a string, or if a buy, sell, or close is not an int or float.\n
+        ValueError: If the date is not in the correct format yyyy-mm-dd.\n
+        ZeroDivisionError: If a close value is 0, which would cause future errors.
+    """
+    rows = compute_rows(date, stocks)
+    with createSession() as session: # The rows and the later rows they change are committed together
+        Hedgeye.writeMany(rows, session=session)
+        recompute_dependents(rows, session=session)
+        session.commit()
+    return rows
+
+
+# -------------------------------------------------------------------------------------------------
+# Vectorized recompute over stored history
+
+
+def lookback_indices(ticker_ids, days, start, stop):
+    """
+    Vectorized `find_lookback` for many rows at once.\n
+    Args:\n
+        ticker_ids (numpy.ndarray): Ticker ID of each row, sorted together with days by (ticker, day).\n
+        days (numpy.ndarray): Day number of each row.\n
+        start (int): Fewest days back to look.\n
+        stop (int): Days back where the search gives up (exclusive).\n
+    Returns:\n
+        numpy.ndarray: Index of the row each row's walk back stops at, or -1 if no weekday in its window has data.
+    """
+    keys = ticker_ids * KEY_STRIDE + days
+    weekday = np.flatnonzero(isWeekday(days)) # Weekends are never looked back to
+    weekday_keys = keys[weekday]
+    
+    i = np.searchsorted(weekday_keys, keys - start, side='right') - 1 # Newest weekday at least `start` days back
+    safe = np.maximum(i, 0)
+    found = (i >= 0) & (weekday_keys[safe] > keys - stop) # Also rules out other tickers, their keys are KEY_STRIDE apart
+    return np.where(found, weekday[safe], -1)
+
+
+def compute_derived(ticker_ids, days, buy, sell, close):
+    """
+    Computes every derived Hedgeye column for many rows with the same formulas and lookbacks as `compute_row`.\n
+    Args:\n
+        ticker_ids (numpy.ndarray): Ticker ID of each row, sorted together with days by (ticker, day).\n
+        days (numpy.ndarray): Day number of each row.\n
+        buy (numpy.ndarray): Buy prices.\n
+        sell (numpy.ndarray): Sell prices.\n
+        close (numpy.ndarray): Close prices.\n
+    Returns:\n
+        dict: {column: float64 array} for each of DERIVED_COLUMNS, unrounded. NaN where the value cannot be computed, 
+        including deltas against a zero close (None in `percent_delta` too).
+    """
+    derived = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for column, (start, stop) in LOOKBACK_WINDOWS.items():
+            index = lookback_indices(ticker_ids, days, start, stop)
+            found = index >= 0
+            old = index[found]
+            values = np.full(len(days), np.nan)
             
-    if close == 0: # Prevents future errors
-        raise ZeroDivisionError('Close value is 0. Cannot add new row to Hedgeye table.\n')
+            if column == 'delta_ww':
+                values[found] = (buy[found] - sell[found]) - (buy[old] - sell[old])
+            else:
+                values[found] = ((close[found] - close[old]) / close[old]) * 100
+            derived[column] = values
+            
+        derived['ra_buy'] = ((buy - close) / close) * 100
+        derived['ra_sell'] = ((sell - close) / close) * 100
+    
+    for values in derived.values():
+        values[~np.isfinite(values)] = np.nan # A zero close has no meaningful delta
+    return derived
+
+
+def round_values(values):
+    """Rounds an array like `compute_row` (Python's round to 2 places) and turns NaN into None for the database."""
+    return [round(value, 2) if value == value else None for value in values.tolist()] # NaN != NaN
+
+
+def recompute(tickers=None, start=None, end=None):
+    """
+    Recomputes the derived columns (Delta W/W, the 1D-1Y deltas, and the range asymmetries) of stored rows from their buy, sell, and close,
+    and writes back only the rows whose values changed, in one transaction. Run it after a formula changes or data arrives out of order.\n
+    Args:\n
+        tickers (iterable(str), optional): Only recompute these tickers. Defaults to None (every ticker).\n
+        start (str, optional): First date to rewrite, 'yyyy-mm-dd'. Older rows are still read for the lookbacks. Defaults to None (no lower bound).\n
+        end (str, optional): Last date to rewrite, 'yyyy-mm-dd'. Defaults to None (no upper bound).\n
+    Returns:\n
+        int: Number of rows updated.
+    """
+    first = toDayNumber(start) if start else None
+    last = toDayNumber(end) if end else None
+    
+    arrays = readHedgeyeArrays(('buy', 'sell', 'close') + DERIVED_COLUMNS, tickers=tickers, 
+                               start=first - HISTORY_DAYS if first is not None else None, end=last)
+    rewrite = arrays['day'] >= first if first is not None else np.ones(len(arrays['day']), dtype=bool)
+    return _write_changes(arrays, rewrite)
+
+
+def dependent_ranges(day):
+    """
+    Args:\n
+        day (int): Day number of a row.\n
+    Returns:\n
+        list(tuple): Inclusive (first, last) day number ranges of the later rows whose lookback windows contain the day.
+    """
+    return [(day + start, day + stop - 1) for start, stop in LOOKBACK_WINDOWS.values()]
+
+
+def recompute_dependents(rows, session=None):
+    """
+    Keeps the history consistent after rows are inserted for past dates (e.g. a backlogged risk range).
+    Only the later rows of the same tickers whose lookback windows contain an inserted date are recomputed, in one batched pass.
+    Later rows are found per ticker in the stored rows, so rows written by another process count too.
+    The lookback history is only loaded when there are such rows, so the usual daily ingest costs one narrow query.\n
+    Args:\n
+        rows (list(dict)): The inserted rows, each with 'date' and 'ticker'.\n
+        session (Session, optional): Session the rows were written with. It is read from and written to, the caller commits. Defaults to None.\n
+    Returns:\n
+        int: Number of rows updated.
+    """
+    inserted = {} # {ticker: [day numbers]}
+    for row in rows:
+        inserted.setdefault(row['ticker'], []).append(toDayNumber(row['date']))
+    if not inserted:
+        return 0
+    
+    first = min(min(days) for days in inserted.values()) + 1
+    last = max(max(days) for days in inserted.values()) + HISTORY_DAYS - 1
+    later = readHedgeyeArrays(('close',), tickers=inserted, start=first, end=last, session=session) # Only the rows that could depend on them
+    if not _dependent_rows(later, inserted).any(): # No ticker has a row after its inserted date, as in the usual daily ingest
+        return 0
+    
+    arrays = readHedgeyeArrays(('buy', 'sell', 'close') + DERIVED_COLUMNS, tickers=inserted, start=first - HISTORY_DAYS, end=last, session=session)
+    return _write_changes(arrays, _dependent_rows(arrays, inserted), session)
+
+
+def _dependent_rows(arrays, inserted):
+    """
+    Args:\n
+        arrays (dict): Result of `readHedgeyeArrays`.\n
+        inserted (dict): {ticker: [day numbers]} of the inserted rows.\n
+    Returns:\n
+        numpy.ndarray: Boolean mask of the loaded rows whose lookback windows contain an inserted day of their ticker.
+    """
+    rewrite = np.zeros(len(arrays['day']), dtype=bool)
+    for ticker, days in inserted.items():
+        ticker_id = Tickers.getId(ticker)
+        if ticker_id is None: # A new ticker has no later rows
+            continue
+        ticker_rows = arrays['ticker_id'] == ticker_id
+        for day in days:
+            for low, high in dependent_ranges(day):
+                rewrite |= ticker_rows & (arrays['day'] >= low) & (arrays['day'] <= high)
+    return rewrite
+
+
+def _write_changes(arrays, rewrite, session=None):
+    """
+    Recomputes the derived columns of loaded rows and writes back the ones in `rewrite` whose values changed.\n
+    Args:\n
+        arrays (dict): Result of `readHedgeyeArrays` with buy, sell, close, and every derived column, including the lookback history.\n
+        rewrite (numpy.ndarray): Boolean mask of the rows that may be rewritten.\n
+        session (Session, optional): Session to write with, the caller commits. Defaults to None (a transaction of its own).\n
+    Returns:\n
+        int: Number of rows updated.
+    """
+    derived = compute_derived(arrays['ticker_id'], arrays['day'], arrays['buy'], arrays['sell'], arrays['close'])
+    
+    # Cheap vectorized comparison first, then the exact (Python round) comparison only where something may have changed
+    changed = np.zeros(len(rewrite), dtype=bool)
+    for column in DERIVED_COLUMNS:
+        new, stored = np.round(derived[column], 2), arrays[column]
+        changed |= ~((new == stored) | (np.isnan(new) & np.isnan(stored)))
+    
+    rows = np.flatnonzero(rewrite & changed)
+    new = {column: round_values(derived[column][rows]) for column in DERIVED_COLUMNS}
+    stored = {column: [value if value == value else None for value in arrays[column][rows].tolist()] for column in DERIVED_COLUMNS} # Already rounded
+    
+    symbols = Tickers.getSymbols()
+    updates = []
+    for n, i in enumerate(rows.tolist()):
+        values = {column: new[column][n] for column in DERIVED_COLUMNS}
+        if any(values[column] != stored[column][n] for column in DERIVED_COLUMNS):
+            updates.append({'ID': int(arrays['ID'][i]), 'date': fromDayNumber(arrays['day'][i]), 'ticker': symbols[int(arrays['ticker_id'][i])], **values})
     
-    weekweek = compute_delta_ww(date, ticker, buy, sell)
-    oneday = compute_od_delta(date, ticker, close)
-    oneweek = compute_ow_delta(date, ticker, close)
-    onemonth = compute_om_delta(date, ticker, close)
-    threemonth = compute_tm_delta(date, ticker, close)
-    sixmonth = compute_sm_delta(date, ticker, close)
-    oneyear = compute_oy_delta(date, ticker, close)
-    rab = compute_ra_buy(buy, close)
-    ras = compute_ra_sell(sell, close)
-    
-    Hedgeye.writeData(date, ticker, description, buy, sell, close, weekweek, oneday, oneweek, onemonth, threemonth, sixmonth, oneyear, rab, ras)
\ No newline at end of file
+    Hedgeye.updateMany(updates, session=session)
+    return len(updates)
@@ -0,0 +1,269 @@
+from DBControls.day_numbers import SQL_DAY_NUMBER
+import sqlalchemy as sqla
+import sys
+
+
+# Ordered list of (version, description, function). Append new migrations to the end, never edit old ones.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+    Decorator that registers a schema migration. The function receives an open connection inside a transaction.\n
+    Args:\n
+        version (int): Schema version the database is at after the migration runs. Must be one more than the previous migration.\n
+        description (str): Short summary shown when the migration is applied.
+    """
+    def register(function):
+        if MIGRATIONS and version != MIGRATIONS[-1][0] + 1:
+            raise ValueError(f'Migration {version} is out of order. Expected version {MIGRATIONS[-1][0] + 1}.')
+
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+
+def _emitBegin(connection):
+    """Begin hook of the migrating connection: starts the transaction pysqlite no longer starts, so DDL rolls back too."""
+    connection.exec_driver_sql('BEGIN')
+
+
+def _columns(connection, table):
+    """Column names of a table, empty if it does not exist."""
+    return {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+
+
+def getVersion(connection):
+    """Returns the schema version recorded in the database (0 for a database no migration has touched)."""
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate(engine):
+    """
+    Creates or upgrades the database to the newest schema version. Safe to run on every start.
+    Each pending migration runs in its own transaction together with the version bump, so a failure leaves the database at the last good version.
+    Migrations are also written to be rerun over a partial one.\n
+    Args:\n
+        engine (sqlalchemy.engine.Engine): Engine bound to the SQLite database.\n
+    Returns:\n
+        int: Schema version of the database after migrating.\n
+    Raises:\n
+        RuntimeError: If the database was written by a newer version of the app.
+    """
+    latest = MIGRATIONS[-1][0]
+
+    with engine.connect() as connection:
+        # SQLAlchemy's pysqlite recipe, only on this connection: left alone, pysqlite commits before every CREATE, ALTER, and DROP
+        dbapi_connection = connection.connection.dbapi_connection
+        isolation_level = dbapi_connection.isolation_level
+        dbapi_connection.isolation_level = None
+        sqla.event.listen(connection, 'begin', _emitBegin)
+        
+        try:
+            with connection.begin():
+                current = getVersion(connection)
+
+            if current > latest:
+                raise RuntimeError(f'Database schema version {current} is newer than this app supports ({latest}). Update the app.')
+
+            for version, _, function in MIGRATIONS:
+                if version <= current:
+                    continue
+
+                with connection.begin():
+                    function(connection)
+                    connection.exec_driver_sql(f'PRAGMA user_version = {version}') # Pragmas cannot take bound parameters
+                current = version
+        finally:
+            dbapi_connection.isolation_level = isolation_level # The connection goes back to the pool
+
+    return current
+
+
+# -------------------------------------------------------------------------------------------------
+# Migrations
+
+
+@migration(1, 'Create the Hedgeye, NASDAQ, and NYSE tables')
+def createTables(connection):
+    connection.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS "Hedgeye" (
+            "ID" INTEGER,
+            "Date" TEXT,
+            "Ticker" TEXT,
+            "Description" TEXT,
+            "Buy" REAL,
+            "Sell" REAL,
+            "Close" REAL,
+            "Delta W/W" REAL,
+            "1D Delta (%)" REAL,
+            "1W Delta (%)" REAL,
+            "1M Delta (%)" REAL,
+            "3M Delta (%)" REAL,
+            "6M Delta (%)" REAL,
+            "1Y Delta (%)" REAL,
+            "Range Asymmetry Buy (%)" REAL,
+            "Range Asymmetry Sell (%)" REAL,
+            PRIMARY KEY("ID" AUTOINCREMENT)
+        )''')
+
+    for table in ['NASDAQ', 'NYSE']: # Both composites share a schema
+        connection.exec_driver_sql(f'''
+            CREATE TABLE IF NOT EXISTS "{table}" (
+                "Date" TEXT,
+                "Advancing Volume" REAL,
+                "Declining Volume" REAL,
+                "Total Volume" REAL,
+                "Change in Volume (%)" REAL,
+                "Close (%)" REAL,
+                "Upside Day (%)" REAL,
+                "Downside Day (%)" REAL,
+                "Advances" REAL,
+                "Declines" REAL,
+                "Net (Advances/Declines)" REAL,
+                "10-Day Breakaway Momentum" REAL,
+                "20-Day Breakaway Momentum" REAL,
+                "Advance/Decline Ratio" REAL,
+                "Advance/Decline Thrust (%)" REAL,
+                "5-Day Advance/Decline Thrust (%)" REAL,
+                "5-Day Up/Down Volume Thrust (%)" REAL,
+                "New Highs" REAL,
+                "New Lows" REAL,
+                "Net (Highs/Lows)" REAL,
+                "21-Day Average (Highs/Lows)" REAL,
+                "63-Day Average (Highs/Lows)" REAL,
+                PRIMARY KEY("Date")
+            )''')
+
+
+@migration(2, 'Unique (Date, Ticker) and (Ticker, Date) indexes on Hedgeye')
+def indexHedgeye(connection):
+    # Duplicates would make the unique index fail, keep the oldest copy of each row
+    connection.exec_driver_sql('DELETE FROM "Hedgeye" WHERE "ID" NOT IN (SELECT MIN("ID") FROM "Hedgeye" GROUP BY "Date", "Ticker")')
+    connection.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS "ix_hedgeye_date_ticker" ON "Hedgeye" ("Date", "Ticker")')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_hedgeye_ticker_date" ON "Hedgeye" ("Ticker", "Date")')
+
+
+@migration(3, 'Ingest log of every fetch attempt per source')
+def createIngestLog(connection):
+    connection.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS "Ingest Log" (
+            "ID" INTEGER,
+            "Source" TEXT NOT NULL,
+            "URL" TEXT,
+            "Fetched At" TEXT NOT NULL,
+            "Data Date" TEXT,
+            "Outcome" TEXT NOT NULL,
+            "Message" TEXT,
+            PRIMARY KEY("ID" AUTOINCREMENT)
+        )''')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_ingest_log_source_fetched" ON "Ingest Log" ("Source", "Fetched At")')
+
+
+@migration(4, 'Move Hedgeye tickers and descriptions into a Tickers dimension table')
+def createTickers(connection):
+    connection.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS "Tickers" (
+            "ID" INTEGER,
+            "Symbol" TEXT NOT NULL UNIQUE,
+            "Description" TEXT,
+            "First Seen" TEXT,
+            "Last Seen" TEXT,
+            PRIMARY KEY("ID" AUTOINCREMENT)
+        )''')
+    
+    existing = _columns(connection, 'Hedgeye')
+    
+    if 'Ticker' in existing: # Not rebuilt yet
+        # The newest description of each ticker wins
+        description = 'SELECT d."Description" FROM "Hedgeye" d WHERE d."Ticker" = h."Ticker" ORDER BY d."Date" DESC LIMIT 1' if 'Description' in existing else 'NULL'
+        connection.exec_driver_sql(f'''
+            INSERT OR IGNORE INTO "Tickers" ("Symbol", "Description", "First Seen", "Last Seen")
+            SELECT h."Ticker", ({description}), MIN(h."Date"), MAX(h."Date")
+            FROM "Hedgeye" h WHERE h."Ticker" IS NOT NULL GROUP BY h."Ticker" ORDER BY h."Ticker"''')
+        
+        # SQLite cannot swap a column in place, so the fact table is rebuilt with an integer key
+        connection.exec_driver_sql('''
+            CREATE TABLE IF NOT EXISTS "Hedgeye New" (
+                "ID" INTEGER,
+                "Date" TEXT,
+                "Ticker ID" INTEGER REFERENCES "Tickers" ("ID"),
+                "Buy" REAL,
+                "Sell" REAL,
+                "Close" REAL,
+                "Delta W/W" REAL,
+                "1D Delta (%)" REAL,
+                "1W Delta (%)" REAL,
+                "1M Delta (%)" REAL,
+                "3M Delta (%)" REAL,
+                "6M Delta (%)" REAL,
+                "1Y Delta (%)" REAL,
+                "Range Asymmetry Buy (%)" REAL,
+                "Range Asymmetry Sell (%)" REAL,
+                PRIMARY KEY("ID" AUTOINCREMENT)
+            )''')
+        
+        values = [column for column in ['Buy', 'Sell', 'Close', 'Delta W/W', '1D Delta (%)', '1W Delta (%)', '1M Delta (%)', '3M Delta (%)', 
+                                        '6M Delta (%)', '1Y Delta (%)', 'Range Asymmetry Buy (%)', 'Range Asymmetry Sell (%)'] if column in existing]
+        connection.exec_driver_sql(f'''
+            INSERT OR IGNORE INTO "Hedgeye New" ("ID", "Date", "Ticker ID"{''.join(f', "{value}"' for value in values)})
+            SELECT h."ID", h."Date", t."ID"{''.join(f', h."{value}"' for value in values)}
+            FROM "Hedgeye" h LEFT JOIN "Tickers" t ON t."Symbol" = h."Ticker"''')
+        
+        connection.exec_driver_sql('DROP TABLE "Hedgeye"')
+    
+    if _columns(connection, 'Hedgeye New'): # Rebuilt but not renamed yet
+        connection.exec_driver_sql('ALTER TABLE "Hedgeye New" RENAME TO "Hedgeye"')
+    connection.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS "ix_hedgeye_date_ticker" ON "Hedgeye" ("Date", "Ticker ID")')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_hedgeye_ticker_date" ON "Hedgeye" ("Ticker ID", "Date")')
+
+
+@migration(5, 'Indexed integer "Day Number" column on every table')
+def addDayNumbers(connection):
+    day_number = SQL_DAY_NUMBER.format('"Date"')
+    for table in ['Hedgeye', 'NASDAQ', 'NYSE']:
+        if 'Day Number' not in _columns(connection, table):
+            connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN "Day Number" INTEGER')
+        connection.exec_driver_sql(f'UPDATE "{table}" SET "Day Number" = {day_number}')
+    
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_hedgeye_ticker_day" ON "Hedgeye" ("Ticker ID", "Day Number")')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_hedgeye_day" ON "Hedgeye" ("Day Number")')
+    connection.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS "ix_nasdaq_day" ON "NASDAQ" ("Day Number")')
+    connection.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS "ix_nyse_day" ON "NYSE" ("Day Number")')
+
+
+
+@migration(6, 'Breadth Indicators table for the registered NASDAQ/NYSE indicators')
+def createBreadthIndicators(connection):
+    # One row per (exchange, date, indicator), so registering a new indicator needs no schema change
+    connection.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS "Breadth Indicators" (
+            "Exchange" TEXT NOT NULL,
+            "Date" TEXT NOT NULL,
+            "Indicator" TEXT NOT NULL,
+            "Day Number" INTEGER,
+            "Value" REAL,
+            PRIMARY KEY("Exchange", "Date", "Indicator")
+        )''')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_breadth_exchange_indicator_day" ON "Breadth Indicators" ("Exchange", "Indicator", "Day Number")')
+
+
+@migration(7, 'Indicator State table with the running values of the recursive breadth indicators')
+def createIndicatorState(connection):
+    # Filled on the first ingest (or `python -m DBControls.recompute`) from the whole history, then advanced one row at a time
+    connection.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS "Indicator State" (
+            "Exchange" TEXT NOT NULL,
+            "Indicator" TEXT NOT NULL,
+            "Date" TEXT NOT NULL,
+            "Day Number" INTEGER,
+            "Sessions" INTEGER NOT NULL,
+            "Value" REAL,
+            PRIMARY KEY("Exchange", "Indicator")
+        )''')
+
+
+if __name__ == '__main__':
+    # Usage: python -m DBControls.migrations [path/to/database.db]
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'DBControls/market_data.db'
+    print(f'{filename} is at schema version {migrate(sqla.create_engine(f"sqlite:///{filename}"))}.')
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import inspect
+
+
+class QueryCache:
+    """
+    Bounded LRU cache for database reads, keyed by table, query, date, and ticker.
+    Writes invalidate only the entries that could contain the written (date, ticker) pairs.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict() # {(table, query, date, ticker, other args): value}
+        self._generations = {} # {table: int}, bumped on every invalidation of that table
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+
+    def get(self, key):
+        """
+        Looks up a cached value and marks it as most recently used.\n
+        Returns:\n
+            tuple: (True, value) on a hit, (False, None) on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+
+            self.misses += 1
+            return False, None
+
+
+    def generation(self, table):
+        """Returns the table's invalidation counter. Pass it to `put` so results read before a write are not cached after it."""
+        with self._lock:
+            return self._generations.get(table, 0)
+
+
+    def put(self, key, value, generation):
+        """
+        Stores a value unless the table was invalidated since `generation` was read. Evicts the least recently used entry when full.
+        """
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return # A write landed while this value was being read, it may be stale
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def invalidate(self, table, dates=None, tickers=None):
+        """
+        Drops every entry of the table that could include a row with one of the given dates and tickers.\n
+        Args:\n
+            table (str): Table name ('Hedgeye', 'NASDAQ', 'NYSE').\n
+            dates (set(str), optional): Dates that were written. Defaults to None (every date).\n
+            tickers (set(str), optional): Tickers that were written. Defaults to None (every ticker).
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            self.invalidations += 1
+
+            for key in list(self._entries):
+                key_table, _, date, ticker, _ = key
+                if key_table != table:
+                    continue
+
+                date_hit = dates is None or date is None or date in dates # date=None entries hold the latest date or a whole history
+                ticker_hit = tickers is None or ticker is None or ticker in tickers
+                if date_hit and ticker_hit:
+                    del self._entries[key]
+
+
+    def clear(self):
+        """Drops every entry (e.g. when switching database files) and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            for table in self._generations:
+                self._generations[table] += 1
+            self.hits = self.misses = self.invalidations = 0
+
+
+    def stats(self):
+        """
+        Returns:\n
+            dict: Hits, misses, hit rate, invalidations, current size, and max size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+
+query_cache = QueryCache() # Shared by every cached query in the process
+
+
+def cachedQuery(table_name=None):
+    """
+    Decorator that serves a read function from `query_cache`. The wrapped function's `date` and `ticker`
+    arguments (when it has them) become part of the key so writes can invalidate precisely.
+    Cached lists are copied on the way out so callers can sort or reverse them safely.\n
+    Args:\n
+        table_name (str, optional): Table the query reads. If None, it is taken from the function's `table` argument (a model class).
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+
+            table = table_name or arguments.pop('table').__tablename__
+            date = arguments.pop('date', None)
+            ticker = arguments.pop('ticker', None)
+            key = (table, function.__qualname__, date, ticker, tuple(sorted(arguments.items())))
+
+            hit, value = query_cache.get(key)
+            if not hit:
+                generation = query_cache.generation(table)
+                value = function(*args, **kwargs)
+                query_cache.put(key, value, generation)
+
+            return list(value) if isinstance(value, list) else value
+        return wrapper
+    return decorator
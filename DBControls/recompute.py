@@ -0,0 +1,42 @@
+"""
+Recomputes the derived (calculated) columns of stored rows and writes back only the values that changed.
+Run it after a formula or schema change, or after data was added out of order.
+Usage: python -m DBControls.recompute [path/to/database.db] [--verify] [ticker ...]
+Given tickers, only those Hedgeye rows are recomputed. Otherwise all of Hedgeye, NASDAQ, NYSE, and the breadth indicators are.
+With --verify nothing is written. The persisted state of the recursive breadth indicators is checked against a from-scratch
+recompute, and the exit code is 1 if it is off.
+"""
+
+from DBControls.db_read_write import NASDAQ, NYSE, configureDatabase, disposeEngines
+from DBControls.hedgeye_metrics import recompute as recomputeHedgeye
+from DBControls.composite_metrics import recompute as recomputeComposite, recompute_indicators as recomputeIndicators, verify_state as verifyState
+from time import perf_counter
+import sys
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if arguments and arguments[0].endswith('.db'):
+        configureDatabase(arguments.pop(0))
+    
+    if '--verify' in arguments:
+        problems = verifyState(NASDAQ) + verifyState(NYSE)
+        print('\n'.join(problems) or 'Indicator state matches a full recompute.')
+        disposeEngines()
+        sys.exit(1 if problems else 0)
+    tickers = arguments or None
+
+    start = perf_counter()
+    updated = recomputeHedgeye(tickers=tickers)
+    print(f'Hedgeye: {updated} rows updated in {perf_counter() - start:.2f} s.')
+
+    if tickers is None:
+        for table in [NASDAQ, NYSE]:
+            start = perf_counter()
+            updated = recomputeComposite(table)
+            print(f'{table.__tablename__}: {updated} rows updated in {perf_counter() - start:.2f} s.')
+            
+            start = perf_counter()
+            updated = recomputeIndicators(table)
+            print(f'{table.__tablename__} breadth indicators: {updated} values written in {perf_counter() - start:.2f} s.')
+    disposeEngines()
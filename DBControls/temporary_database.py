@@ -0,0 +1,21 @@
+import DBControls.db_read_write as db
+import tempfile
+import unittest
+import os
+
+
+class TemporaryDatabaseTestCase(unittest.TestCase):
+    """
+    Points the models at a fresh database file for every test and back at the previous one afterwards.
+    Subclasses that override setUp or tearDown call the parent's.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_filename = db.db_filename
+        self.db_filename = os.path.join(self.directory.name, 'test.db')
+        db.configureDatabase(self.db_filename)
+
+    def tearDown(self):
+        db.disposeEngines()
+        db.configureDatabase(self.old_filename)
+        self.directory.cleanup()
@@ -0,0 +1,131 @@
+from DBControls.composite_metrics import window_sums, window_sum, rolling_sums, prefix_sums, compute_td_breakaway_momentum, WINDOWS, add_row, compute_row, recompute
+from DBControls.composite_metrics import indicator, compute_indicators, recompute_indicators, verify_state, ema, INDICATORS
+from DBControls.trading_calendar import trading_calendar
+from DBControls.fast_read import readComposite, readIndicators
+from DBControls.day_numbers import fromDayNumber
+import DBControls.db_read_write as db
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+import numpy as np
+import unittest
+
+
+def walkBack(days, values, target, span, count):
+    """The original day-by-day walk: newest rows first, stop once count rows are found within span days."""
+    found = [value for day, value in sorted(zip(days, values), reverse=True) if target - span <= day < target][:count]
+    return sum(found) if len(found) == count else None
+
+
+class TestWindowSums(unittest.TestCase):
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.days = np.sort(random.choice(np.arange(19000, 19400), 250, replace=False))
+        self.values = random.integers(0, 4000, len(self.days)).astype(np.float64)
+
+    def test_matches_walk_back(self):
+        """Prefix sums give the same windows as walking back one day at a time, for every target and window."""
+        targets = np.arange(18990, 19410)
+        for span, count in WINDOWS.values():
+            sums = window_sums(self.days, prefix_sums(self.values), targets, span, count)
+            for target, total in zip(targets, sums):
+                expected = walkBack(self.days, self.values, target, span, count)
+                self.assertEqual(None if np.isnan(total) else total, expected)
+
+    def test_short_history(self):
+        """Too few rows within the span gives None instead of a partial sum."""
+        history = {'day': np.array([19000, 19001]), 'advances': np.array([1.0, 2.0]), 'declines': np.array([1.0, 1.0])}
+        self.assertEqual(window_sum(history, '2022-01-10', 'advances', 30, 2), 3.0) # 2022-01-10 is day 19002
+        self.assertIsNone(window_sum(history, '2022-01-10', 'advances', 30, 4))
+        self.assertIsNone(compute_td_breakaway_momentum(None, '2022-01-10', 5, 5, history))
+
+    def test_missing_value(self):
+        """A missing value only empties the windows that contain it, the same on ingest as in a recompute."""
+        history = {'day': np.arange(19000, 19005), 'advances': np.array([np.nan, 1.0, 2.0, 3.0, 4.0])}
+        self.assertEqual(window_sum(history, '2022-01-13', 'advances', 30, 2), 7.0) # 2022-01-13 is day 19005
+        self.assertIsNone(window_sum(history, '2022-01-13', 'advances', 30, 5))
+        self.assertEqual(rolling_sums(history['day'], history['advances'], np.array([19005]), 30, 2)[0], 7.0)
+
+
+class TestRecompute(TemporaryDatabaseTestCase):
+    def test_fills_rows_added_out_of_order(self):
+        """Rows computed before their history arrived are rebuilt to what compute_row gives with the full history."""
+        random = np.random.default_rng(1)
+        sessions = [fromDayNumber(day) for day in trading_calendar.sessionDays('2023-01-01', '2023-05-31')]
+        raw = {date: [float(value) for value in random.integers(1, 3000, 8)] for date in sessions}
+        for date in reversed(sessions): # Newest first, so every lookback finds nothing
+            add_row(db.NASDAQ, date, *raw[date])
+        self.assertIsNone(readComposite(db.NASDAQ, date=sessions[-1]).std_avg)
+
+        self.assertGreater(recompute(db.NASDAQ), 0)
+        for date in sessions:
+            stored = readComposite(db.NASDAQ, date=date)
+            expected = compute_row(db.NASDAQ, date, *raw[date])
+            self.assertEqual({key: getattr(stored, key) for key in expected}, expected)
+        self.assertEqual(recompute(db.NASDAQ), 0) # Nothing left to change
+
+    def test_indicators_stored_on_ingest(self):
+        """Adding rows in order advances the persisted state to exactly what a full rebuild computes."""
+        random = np.random.default_rng(2)
+        for day in trading_calendar.sessionDays('2023-01-01', '2023-03-31'):
+            add_row(db.NYSE, fromDayNumber(day), *[float(value) for value in random.integers(1, 3000, 8)])
+        
+        self.assertEqual(set(readIndicators(db.NYSE, date='2023-03-31')), set(INDICATORS))
+        self.assertEqual(verify_state(db.NYSE, tolerance=0), [])
+        self.assertEqual(recompute_indicators(db.NYSE), 0)
+
+    def test_backlog_rewrites_later_indicators(self):
+        """A row added out of order rewrites the indicators of the later sessions and the state in the same transaction."""
+        random = np.random.default_rng(3)
+        sessions = [fromDayNumber(day) for day in trading_calendar.sessionDays('2023-02-01', '2023-03-31')]
+        raw = {date: [float(value) for value in random.integers(1, 3000, 8)] for date in sessions}
+        for date in sessions[:-1]:
+            if date != sessions[10]:
+                add_row(db.NASDAQ, date, *raw[date])
+        
+        before = readIndicators(db.NASDAQ, date=sessions[-2])['mcclellan_summation']
+        
+        add_row(db.NASDAQ, sessions[10], *raw[sessions[10]]) # Backlog
+        self.assertNotEqual(readIndicators(db.NASDAQ, date=sessions[-2])['mcclellan_summation'], before)
+        self.assertEqual(verify_state(db.NASDAQ, tolerance=0), [])
+        self.assertEqual(recompute_indicators(db.NASDAQ, start=sessions[10]), 0) # Stored values match a full rebuild
+        
+        add_row(db.NASDAQ, sessions[-1], *raw[sessions[-1]]) # Steps from the rebuilt state
+        self.assertEqual(verify_state(db.NASDAQ, tolerance=0), [])
+        self.assertEqual(recompute_indicators(db.NASDAQ), 0)
+
+
+class TestIndicators(unittest.TestCase):
+    def test_formulas(self):
+        """TRIN, RANA, and the McClellan pair follow their textbook definitions over a shared window."""
+        window = {'day': np.arange(3), 'advances': np.array([300.0, 200.0, 100.0]), 'declines': np.array([100.0, 200.0, 0.0]),
+                  'advancing_V': np.array([10.0, 20.0, 30.0]), 'declining_V': np.array([20.0, 20.0, 10.0])}
+        results = compute_indicators(window)
+        
+        self.assertEqual(results['trin'][0], 6.0) # (300 / 100) / (10 / 20)
+        self.assertEqual(results['rana'][0], 500.0)
+        self.assertTrue(np.isnan(results['trin'][2])) # No declines
+        
+        oscillator = ema(np.array([200.0, 0.0, 100.0]), 0.10) - ema(np.array([200.0, 0.0, 100.0]), 0.05)
+        np.testing.assert_allclose(results['mcclellan_oscillator'], oscillator)
+        np.testing.assert_allclose(results['mcclellan_summation'], np.cumsum(oscillator))
+
+    def test_step_matches_window(self):
+        """Advancing the recursive indicators one row from the previous values gives the same floats as the whole window."""
+        random = np.random.default_rng(4)
+        window = {'day': np.arange(50), **{column: random.integers(1, 3000, 50).astype(np.float64) 
+                                           for column in ['advances', 'declines', 'advancing_V', 'declining_V']}}
+        full = compute_indicators(window)
+        state = {name: full[name][-2] for name, registered in INDICATORS.items() if registered.step is not None}
+        stepped = compute_indicators(window, state=state)
+        for name in INDICATORS:
+            self.assertEqual(stepped[name][-1], full[name][-1])
+
+    def test_duplicate_name(self):
+        """Registering a name twice is a mistake, not an override."""
+        with self.assertRaises(ValueError):
+            indicator('trin', 'TRIN', ('advances',))(lambda window: window['advances'])
+        with self.assertRaises(ValueError):
+            indicator('summation_average', 'Average', ('mcclellan_summation',), window=30)(lambda window: window['mcclellan_summation'])
+
+
+if __name__ == '__main__':
+    unittest.main()
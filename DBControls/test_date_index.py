@@ -0,0 +1,44 @@
+from DBControls.date_index import DateIndex
+import unittest
+
+
+class TestDateIndex(unittest.TestCase):
+    def setUp(self):
+        self.loads = 0
+        self.index = DateIndex(self.loadDates, lambda: '2023-01-05')
+
+    def loadDates(self):
+        self.loads += 1
+        return ['2023-01-03', '2023-01-04', '2023-01-05']
+
+    def test_latest_without_loading(self):
+        """The latest date does not need the full date list."""
+        self.assertEqual(self.index.latest(), '2023-01-05')
+        self.assertEqual(self.loads, 0)
+
+    def test_previous_and_next(self):
+        """Neighbouring dates are found with and without an exact match."""
+        self.assertEqual(self.index.previous('2023-01-04'), '2023-01-03')
+        self.assertEqual(self.index.previous('2023-01-03'), None)
+        self.assertEqual(self.index.next('2023-01-04'), '2023-01-05')
+        self.assertEqual(self.index.next('2023-01-06'), None)
+        self.assertEqual(self.index.previous('2023-01-10'), '2023-01-05')
+
+    def test_add(self):
+        """Written dates are inserted in order, once, without reloading."""
+        self.index.all()
+        self.index.add({'2023-01-02', '2023-01-06', '2023-01-04'})
+        self.assertEqual(self.index.all(), ['2023-01-02', '2023-01-03', '2023-01-04', '2023-01-05', '2023-01-06'])
+        self.assertEqual(self.index.latest(), '2023-01-06')
+        self.assertEqual(self.loads, 1)
+
+    def test_reset(self):
+        """A reset index reloads on the next lookup."""
+        self.index.all()
+        self.index.reset()
+        self.index.all()
+        self.assertEqual(self.loads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
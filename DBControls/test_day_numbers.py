@@ -0,0 +1,37 @@
+from DBControls.day_numbers import validateDate, toDayNumber, fromDayNumber, isWeekday, toDatetime64, fromDatetime64
+from datetime import date
+import numpy as np
+import unittest
+
+
+class TestDayNumbers(unittest.TestCase):
+    def test_round_trip(self):
+        """Dates convert to day numbers and back, matching NumPy's datetime64[D] epoch."""
+        for text in ['1970-01-01', '2000-02-29', '2023-04-27']:
+            number = toDayNumber(text)
+            self.assertEqual(fromDayNumber(number), text)
+            self.assertEqual(number, np.datetime64(text, 'D').astype(np.int64))
+        self.assertEqual(toDayNumber(date(2023, 4, 27)), toDayNumber('2023-04-27'))
+
+    def test_weekday(self):
+        """2023-04-28 is a Friday and 2023-04-29 a Saturday, for scalars and arrays."""
+        self.assertTrue(isWeekday(toDayNumber('2023-04-28')))
+        self.assertFalse(isWeekday(toDayNumber('2023-04-29')))
+        days = np.arange(toDayNumber('2023-04-24'), toDayNumber('2023-05-01'))
+        self.assertEqual(isWeekday(days).tolist(), [True] * 5 + [False] * 2)
+
+    def test_arrays(self):
+        """Day number arrays convert to datetime64[D] and back."""
+        days = np.array([toDayNumber('2023-01-03'), toDayNumber('2023-01-04')])
+        self.assertEqual(toDatetime64(days).tolist(), [date(2023, 1, 3), date(2023, 1, 4)])
+        self.assertEqual(fromDatetime64(toDatetime64(days)).tolist(), days.tolist())
+
+    def test_bad_date(self):
+        """Malformed dates raise ValueError."""
+        for bad in ['04-27-2023', '2023/04/27', None]:
+            with self.assertRaises(ValueError):
+                validateDate(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
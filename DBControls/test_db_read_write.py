@@ -1,9 +1,16 @@
 import unittest
-from dbReadWrite import Hedgeye, NASDAQ, NYSE, createSession
+import DBControls.db_read_write as db
+from DBControls.db_read_write import Hedgeye, NASDAQ, NYSE
+from DBControls.fast_read import readHedgeye, readComposite
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+from threading import Thread
+import sqlalchemy as sqla
+import numpy as np
+import sqlite3
+import os
 
-# BEFORE TESTING ... CHANGE db_filename = 'DBControls/market_data.db' in dbReadWrite.py to db_filename = 'market_data.db'
 
-class TestHedgeye(unittest.TestCase):
+class TestHedgeye(TemporaryDatabaseTestCase):
     def test_read_write_functions(self):
         """Tests getData, getAllDates, and writeData."""
         test_data = {
@@ -24,6 +31,8 @@ class TestHedgeye(unittest.TestCase):
             'ra_sell': 8.0
         }
         Hedgeye.writeData(**test_data)
+        for ticker in ['OTHER1', 'OTHER2']: # A newer date with more than one ticker
+            Hedgeye.writeData(**dict(test_data, date='1111-11-12', ticker=ticker, description=ticker))
         
         # Test bad date
         with self.assertRaises(ValueError):
@@ -61,13 +70,8 @@ class TestHedgeye(unittest.TestCase):
         all_dates = Hedgeye.getAllDates()
         self.assertIn('1111-11-11', all_dates)
 
-        # Clean up the test data
-        with createSession() as session:
-            session.query(Hedgeye).filter(Hedgeye.date == '1111-11-11', Hedgeye.ticker == 'TEST').delete()
-            session.commit()
-
 
-class TestNASDAQ(unittest.TestCase):
+class TestNASDAQ(TemporaryDatabaseTestCase):
     def test_read_write_functions(self):
         """Tests getData, getAllDates, and writeData."""
         test_data = {
@@ -117,13 +121,8 @@ class TestNASDAQ(unittest.TestCase):
         all_dates = NASDAQ.getAllDates()
         self.assertIn('1111-11-11', all_dates)
 
-        # Clean up the test data
-        with createSession() as session:
-            session.query(NASDAQ).filter(NASDAQ.date == '1111-11-11').delete()
-            session.commit()
-
 
-class TestNYSE(unittest.TestCase):
+class TestNYSE(TemporaryDatabaseTestCase):
     def test_read_write_functions(self):
         """Tests getData, getAllDates, and writeData."""
         test_data = {
@@ -173,10 +172,226 @@ class TestNYSE(unittest.TestCase):
         all_dates = NYSE.getAllDates()
         self.assertIn('1111-11-11', all_dates)
 
-        # Clean up the test data
-        with createSession() as session:
-            session.query(NYSE).filter(NYSE.date == '1111-11-11').delete()
+
+class TestEngineRegistry(TemporaryDatabaseTestCase):
+    def test_one_engine_per_file(self):
+        """Every caller of the same file shares one engine, another file gets its own."""
+        self.assertIs(db.getEngine(), db.getEngine(self.db_filename))
+        self.assertIsNot(db.getEngine(), db.getEngine(os.path.join(self.directory.name, 'other.db')))
+
+    def test_threads_share_engine(self):
+        """Threads racing to build the engine all end up with the same one."""
+        engines = []
+        threads = [Thread(target=lambda: engines.append(db.getEngine())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(engine) for engine in engines}), 1)
+
+    def test_sessions_use_registry(self):
+        """Sessions are bound to the registry engine instead of building their own."""
+        with db.createSession() as session:
+            self.assertIs(session.get_bind(), db.getEngine())
+
+    def test_dispose(self):
+        """Disposing empties the registry, the next query builds a new engine on the same file."""
+        engine = db.getEngine()
+        db.disposeEngines()
+        self.assertIsNot(db.getEngine(), engine)
+        self.assertEqual(db.getEngine().url.database, self.db_filename)
+
+
+class TestWriteMany(TemporaryDatabaseTestCase):
+    def test_batch(self):
+        """A batch of rows across dates and tickers lands in one call."""
+        Hedgeye.writeMany([{'date': date, 'ticker': ticker, 'description': ticker, 'close': 1.0}
+                           for date in ['2023-01-03', '2023-01-04'] for ticker in ['ABC', 'DEF', 'GHI']])
+        NASDAQ.writeMany([{'date': '2023-01-03', 'close': 1.0}, {'date': '2023-01-04', 'close': 2.0}])
+
+        self.assertEqual(len(Hedgeye.getData(date='2023-01-04')), 3)
+        self.assertEqual(Hedgeye.getAllDates(), ['2023-01-03', '2023-01-04'])
+        self.assertEqual(NASDAQ.getData(date='2023-01-04').close, 2.0)
+
+    def test_bad_row_writes_nothing(self):
+        """One malformed row fails the whole batch instead of leaving half of it behind."""
+        with self.assertRaises(ValueError):
+            NYSE.writeMany([{'date': '2023-01-03', 'close': 1.0}, {'date': '2023-13-04', 'close': 2.0}])
+        self.assertEqual(NYSE.getAllDates(), [])
+
+    def test_shared_session(self):
+        """Writes to several tables in one session commit or roll back together."""
+        with db.createSession() as session:
+            NASDAQ.writeMany([{'date': '2023-01-03', 'close': 1.0}], session=session)
+            NYSE.writeMany([{'date': '2023-01-03', 'close': 1.0}], session=session)
+            session.rollback()
+        self.assertIsNone(NASDAQ.getData(date='2023-01-03'))
+        self.assertIsNone(NYSE.getData(date='2023-01-03'))
+
+        with db.createSession() as session:
+            NASDAQ.writeMany([{'date': '2023-01-03', 'close': 1.0}], session=session)
+            NYSE.writeMany([{'date': '2023-01-03', 'close': 1.0}], session=session)
             session.commit()
+        self.assertEqual(NASDAQ.getData(date='2023-01-03').close, 1.0)
+        self.assertEqual(NYSE.getData(date='2023-01-03').close, 1.0)
+
+
+class TestUpsert(TemporaryDatabaseTestCase):
+    def test_ignore(self):
+        """An existing (date, ticker) keeps its stored values."""
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 1.0}])
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 2.0}, {'date': '2023-01-03', 'ticker': 'DEF', 'close': 3.0}])
+        
+        self.assertEqual([(row.ticker, row.close) for row in Hedgeye.getData(date='2023-01-03')], [('ABC', 1.0), ('DEF', 3.0)])
+
+    def test_update(self):
+        """An existing (date, ticker) takes the new values of the columns given and keeps the rest."""
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'buy': 1.5, 'close': 1.0}])
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 2.0}], on_conflict='update')
+        NASDAQ.writeMany([{'date': '2023-01-03', 'close': 1.0}])
+        NASDAQ.writeMany([{'date': '2023-01-03', 'close': 2.0}], on_conflict='update')
+
+        rows = Hedgeye.getData(date='2023-01-03')
+        self.assertEqual([(row.buy, row.close) for row in rows], [(1.5, 2.0)])
+        self.assertEqual(NASDAQ.getData(date='2023-01-03').close, 2.0)
+
+    def test_bad_mode(self):
+        """Only 'ignore' and 'update' are accepted."""
+        with self.assertRaises(ValueError):
+            Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 1.0}], on_conflict='replace')
+        with self.assertRaises(ValueError):
+            NYSE.writeMany([{'date': '2023-01-03', 'close': 1.0}], on_conflict='replace')
+
+    def test_unique_index(self):
+        """A duplicate (date, ticker) written around the models is rejected by SQLite."""
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 1.0}])
+        with self.assertRaises(sqla.exc.IntegrityError):
+            with db.getEngine().begin() as connection:
+                connection.exec_driver_sql('INSERT INTO "Hedgeye" ("Date", "Ticker ID") SELECT "Date", "Ticker ID" FROM "Hedgeye"')
+
+    def test_old_database_loses_duplicates(self):
+        """Opening a database written before the unique index keeps the oldest copy of each (date, ticker)."""
+        db.disposeEngines()
+        filename = os.path.join(self.directory.name, 'old.db')
+        connection = sqlite3.connect(filename)
+        connection.execute('CREATE TABLE "Hedgeye" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Date" TEXT, "Ticker" TEXT, "Description" TEXT, "Close" REAL)')
+        connection.executemany('INSERT INTO "Hedgeye" ("Date", "Ticker", "Description", "Close") VALUES (?, ?, ?, ?)',
+                               [('2023-01-03', 'ABC', 'ABC INC', 1.0), ('2023-01-03', 'ABC', 'ABC INC', 2.0), ('2023-01-04', 'ABC', 'ABC INC', 3.0)])
+        connection.commit()
+        connection.close()
+        
+        db.configureDatabase(filename)
+        self.assertEqual([(row.date, row.close) for row in Hedgeye.getData(ticker='ABC')], [('2023-01-03', 1.0), ('2023-01-04', 3.0)])
+
+
+class TestPragmas(TemporaryDatabaseTestCase):
+    def pragmas(self, connection):
+        return {pragma: connection.exec_driver_sql(f'PRAGMA {pragma}').scalar() for pragma in db.sqlite_pragmas}
+
+    def test_every_pooled_connection(self):
+        """Connections checked out at the same time (so not the same pooled one) all have the pragmas."""
+        expected = {'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536, 'mmap_size': 268435456, 'temp_store': 2, 'busy_timeout': 5000}
+        engine = db.getEngine()
+        with engine.connect() as first, engine.connect() as second:
+            self.assertIsNot(first.connection.dbapi_connection, second.connection.dbapi_connection)
+            self.assertEqual(self.pragmas(first), expected)
+            self.assertEqual(self.pragmas(second), expected)
+
+    def test_configure(self):
+        """Changed settings apply to connections opened afterwards."""
+        old_cache_size = db.sqlite_pragmas['cache_size']
+        try:
+            db.configureDatabase(cache_size=-1024)
+            with db.getEngine().connect() as connection:
+                self.assertEqual(self.pragmas(connection)['cache_size'], -1024)
+        finally:
+            db.configureDatabase(cache_size=old_cache_size)
+
+        with self.assertRaises(ValueError):
+            db.configureDatabase(page_size=4096)
+
+
+class TestGetSeries(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        Hedgeye.writeMany([{'date': '2023-01-02', 'ticker': 'ABC', 'buy': 11.0, 'sell': 9.0, 'close': 10.0},
+                           {'date': '2023-01-03', 'ticker': 'ABC', 'buy': None, 'sell': 9.5, 'close': 10.5}, # Missing buy level
+                           {'date': '2023-01-09', 'ticker': 'ABC', 'buy': 12.0, 'sell': 10.0, 'close': 11.0}, # A week without data before it
+                           {'date': '2023-01-10', 'ticker': 'ABC', 'buy': 12.5, 'sell': 10.5, 'close': 11.5},
+                           {'date': '2023-01-20', 'ticker': 'DEF', 'buy': 1.0, 'sell': 1.0, 'close': 1.0}])
+
+    def test_arrays(self):
+        """Dates come back as datetime64[D] and missing values as NaN, only for the ticker asked for."""
+        series = Hedgeye.getSeries('ABC')
+        self.assertEqual(series['date'].dtype, np.dtype('datetime64[D]'))
+        np.testing.assert_array_equal(series['date'], np.array(['2023-01-02', '2023-01-03', '2023-01-09', '2023-01-10'], dtype='datetime64[D]'))
+        np.testing.assert_array_equal(series['buy'], [11.0, np.nan, 12.0, 12.5])
+        self.assertEqual(list(np.diff(series['date']).astype(int)), [1, 6, 1]) # Gaps are left for the graph to find
+
+    def test_days(self):
+        """The window ends at the ticker's own newest date and includes the day exactly `days` before it."""
+        np.testing.assert_array_equal(Hedgeye.getSeries('ABC', days=7)['close'], [10.5, 11.0, 11.5])
+        np.testing.assert_array_equal(Hedgeye.getSeries('ABC', days=6)['close'], [11.0, 11.5])
+
+    def test_range_and_columns(self):
+        """start and end are inclusive and only the columns asked for are returned."""
+        series = Hedgeye.getSeries('ABC', start='2023-01-03', end='2023-01-09', columns=('close',))
+        self.assertEqual(set(series), {'date', 'close'})
+        np.testing.assert_array_equal(series['close'], [10.5, 11.0])
+
+    def test_bad_column(self):
+        """Only numeric Hedgeye columns can be asked for."""
+        for column in ['description', 'ticker_id', 'volume']:
+            with self.assertRaises(ValueError):
+                Hedgeye.getSeries('ABC', columns=(column,))
+
+
+class TestFastRead(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        Hedgeye.writeMany([{'date': date, 'ticker': ticker, 'description': f'{ticker} INC', 'buy': close + 1, 'sell': close - 1, 'close': close, 'od_delta': None}
+                           for date, close in [('2023-01-03', 10.0), ('2023-01-04', 11.0)] for ticker in ['ABC', 'DEF']])
+        NASDAQ.writeMany([{'date': '2023-01-03', 'advances': 1500.0, 'declines': 1200.0, 'close': 0.5}, {'date': '2023-01-04', 'advances': 1000.0}])
+
+    def assertSameRows(self, rows, orm_rows, attributes):
+        self.assertEqual(len(rows), len(orm_rows))
+        for row, orm_row in zip(rows, orm_rows):
+            self.assertEqual({attribute: getattr(row, attribute) for attribute in attributes}, 
+                             {attribute: getattr(orm_row, attribute) for attribute in attributes})
+
+    def test_hedgeye_matches_get_data(self):
+        """Every attribute of the ORM rows, ticker and description included, has the same value on the raw rows."""
+        attributes = ['ticker', 'description'] + list(sqla.inspect(Hedgeye).columns.keys())
+        for arguments in [{}, {'date': '2023-01-03'}, {'ticker': 'DEF'}, {'date': '2023-01-04', 'ticker': 'ABC'}, {'ticker': 'XYZ'}]:
+            with self.subTest(**arguments):
+                self.assertSameRows(readHedgeye(**arguments), Hedgeye.getData(**arguments), attributes)
+
+    def test_composite_matches_get_data(self):
+        """Same for the composite tables, including the most recent row and a date without data."""
+        attributes = list(sqla.inspect(NASDAQ).columns.keys())
+        for date in [None, '2023-01-03', '2023-01-05']:
+            with self.subTest(date=date):
+                row, orm_row = readComposite(NASDAQ, date=date), NASDAQ.getData(date=date)
+                self.assertEqual(row is None, orm_row is None)
+                if row is not None:
+                    self.assertSameRows([row], [orm_row], attributes)
+
+
+class TestUnknownTicker(TemporaryDatabaseTestCase):
+    def test_rows_without_ticker_not_matched(self):
+        """A symbol never written finds nothing, not the rows whose ticker is missing (e.g. a NULL symbol before migration 4)."""
+        Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 1.0}])
+        with db.getEngine().begin() as connection:
+            connection.exec_driver_sql('''INSERT INTO "Hedgeye" ("Date", "Day Number", "Ticker ID", "Close") VALUES ('2023-01-03', 19360, NULL, 2.0)''')
+
+        self.assertEqual(Hedgeye.getData(ticker='XYZ'), [])
+        self.assertEqual(Hedgeye.getData(date='2023-01-03', ticker='XYZ'), [])
+        series = Hedgeye.getSeries('XYZ', days=30)
+        self.assertEqual(series['date'].dtype, np.dtype('datetime64[D]'))
+        self.assertEqual([len(values) for values in series.values()], [0, 0, 0, 0])
+
+        with self.assertRaises(ValueError): # Arguments are still checked
+            Hedgeye.getSeries('XYZ', start='2023-13-01')
 
 
 if __name__ == '__main__':
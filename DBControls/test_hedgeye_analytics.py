@@ -0,0 +1,85 @@
+from DBControls.hedgeye_analytics import compute_metrics, percentile_ranks, group_moments, cross_section, load_cross_section, ranking, METRICS
+from DBControls.hedgeye_metrics import add_rows
+from DBControls.fast_read import readHedgeye
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+import numpy as np
+import unittest
+
+
+class TestStatistics(unittest.TestCase):
+    def test_metrics(self):
+        """The range statistics do not depend on which side of the range buy is on."""
+        metrics = compute_metrics(np.array([12.0, 8.0, 1.0]), np.array([8.0, 12.0, 1.0]), np.array([9.0, 9.0, 0.0]))
+        self.assertEqual(metrics['range_width'][0], 4 / 9 * 100)
+        self.assertEqual(metrics['close_position'][1], 0.25)
+        self.assertEqual(metrics['asymmetry'][0], metrics['asymmetry'][1])
+        self.assertTrue(np.isnan(metrics['asymmetry'][2])) # Zero close
+
+    def test_percentile_ranks(self):
+        """Ranks go from 0 for the smallest to 100 for the largest, ties share a rank, NaN is skipped."""
+        ranks = percentile_ranks(np.array([3.0, 1.0, np.nan, 2.0, 2.0, 5.0]))
+        np.testing.assert_array_equal(ranks, [75.0, 0.0, np.nan, 37.5, 37.5, 100.0])
+
+    def test_group_moments(self):
+        """Grouped moments match numpy's per group."""
+        random = np.random.default_rng(0)
+        ids, values = random.integers(0, 4, 500), random.normal(50, 3, 500)
+        values[::7] = np.nan
+        mean, std = group_moments(ids, values, 6)
+        for i in range(4):
+            group = values[(ids == i) & ~np.isnan(values)]
+            self.assertAlmostEqual(mean[i], group.mean())
+            self.assertAlmostEqual(std[i], group.std())
+        self.assertTrue(np.isnan(mean[5]))
+
+
+class TestCrossSection(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        random = np.random.default_rng(1)
+        self.dates = ['2023-01-03', '2023-01-04', '2023-01-05', '2023-01-06']
+        for date in self.dates:
+            add_rows(date, [{'Ticker': ticker, 'Description': ticker, 'Buy': close * random.uniform(1.01, 1.1),
+                             'Sell': close * random.uniform(0.9, 0.99), 'Close': close}
+                            for ticker, close in zip(['ABC', 'DEF', 'GHI'], random.uniform(10, 100, 3))])
+
+    def test_matches_rows(self):
+        """Statistics match the stored rows, and z-scores match each ticker's history computed one by one."""
+        section = cross_section('2023-01-06')
+        self.assertEqual(section['ticker'], ('ABC', 'DEF', 'GHI'))
+
+        for i, ticker in enumerate(section['ticker']):
+            rows = readHedgeye(ticker=ticker)
+            history = np.array([compute_metrics(r.buy, r.sell, r.close)['range_width'] for r in rows])
+            self.assertAlmostEqual(section['asymmetry'][i], rows[-1].ra_buy + rows[-1].ra_sell, delta=0.01) # Stored values are rounded
+            self.assertAlmostEqual(section['range_width_z'][i], (history[-1] - history.mean()) / history.std())
+
+    def test_cache_follows_writes(self):
+        """A date is served from the cache until that date is written, and z-scores pick up writes to other dates."""
+        self.assertIs(load_cross_section('2023-01-06'), load_cross_section('2023-01-06'))
+        before = cross_section('2023-01-06')
+
+        add_rows('2023-01-09', [{'Ticker': 'ABC', 'Description': 'ABC', 'Buy': 500.0, 'Sell': 1.0, 'Close': 10.0}])
+        after = cross_section('2023-01-06')
+        self.assertIs(after['asymmetry'], before['asymmetry']) # Same day, still cached
+        self.assertNotEqual(after['range_width_z'][0], before['range_width_z'][0]) # ABC's history changed
+
+        add_rows('2023-01-06', [{'Ticker': 'JKL', 'Description': 'JKL', 'Buy': 11.0, 'Sell': 9.0, 'Close': 10.0}])
+        self.assertEqual(cross_section('2023-01-06')['ticker'], ('ABC', 'DEF', 'GHI', 'JKL'))
+        with self.assertRaises(ValueError):
+            before['asymmetry'][0] = 0 # Shared arrays are read-only
+
+    def test_ranking(self):
+        """Rows come out sorted by the statistic, with every metric, percentile, and z-score."""
+        rows = ranking('2023-01-06', by='range_width')
+        widths = [row['range_width'] for row in rows]
+        self.assertEqual(widths, sorted(widths, reverse=True))
+        self.assertEqual(len(rows[0]), 1 + 3 + 3 * len(METRICS))
+
+        with self.assertRaises(ValueError):
+            ranking('2023-01-06', by='ticker')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+from DBControls.hedgeye_backtest import forward_fill, prepare, load_matrix, range_rule, range_position, backtest, sweep
+from DBControls.hedgeye_metrics import add_rows
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+import numpy as np
+import unittest
+
+
+def makeMatrix(days, tickers, seed):
+    """Random walk closes with ranges around them and gaps where tickers are out of the universe."""
+    random = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(random.normal(0, 0.02, (days, tickers)), axis=0))
+    matrix = {'close': close, 'buy': close * random.uniform(0.9, 1.0, close.shape), 'sell': close * random.uniform(1.0, 1.1, close.shape)}
+    for column in matrix.values():
+        column[:days // 4, 0] = np.nan # Enters late
+        column[days // 2:, 1] = np.nan # Leaves early
+        column[random.random(close.shape) < 0.05] = np.nan # Missing days
+    return prepare(matrix)
+
+
+def walkBacktest(matrix, ticker, **params):
+    """One ticker, one day at a time: the state machine the vectorized backtest replaces."""
+    target = range_rule(matrix, **params)[:, ticker]
+    close = matrix['close'][:, ticker]
+    exposure, last_close, trades, total = 0.0, None, [], 1.0
+    for day in range(len(close)):
+        if not np.isnan(close[day]):
+            if last_close is not None and exposure > 0:
+                change = 1 + exposure * (close[day] / last_close - 1)
+                total *= change
+                trades[-1] *= change
+            last_close = close[day]
+        if not np.isnan(target[day]):
+            if target[day] > 0 and exposure == 0 and day < len(close) - 1:
+                trades.append(1.0)
+            exposure = target[day]
+    return len(trades), sum(trade > 1 for trade in trades), total - 1
+
+
+class TestBacktest(unittest.TestCase):
+    def test_forward_fill(self):
+        """Gaps take the value above them, leading gaps stay empty."""
+        filled = forward_fill(np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan]]))
+        np.testing.assert_array_equal(filled, [[np.nan, 1.0], [2.0, 1.0], [2.0, 1.0]])
+
+    def test_matches_walk(self):
+        """Trades, hits, and returns match walking every ticker day by day."""
+        matrix = makeMatrix(400, 6, 0)
+        for params in [{'entry': 0.2, 'exit': 0.8}, {'entry': 0.4, 'exit': 0.6, 'trim': 0.5}]:
+            result = backtest(matrix, **params)
+            for ticker in range(6):
+                trades, hits, total = walkBacktest(matrix, ticker, **params)
+                self.assertEqual(result['trades'][ticker], trades)
+                self.assertAlmostEqual(result['hit_rate'][ticker], hits / trades)
+                self.assertAlmostEqual(result['total_return'][ticker], total)
+
+    def test_range_position(self):
+        """0 at the buy level and 1 at the sell level, whichever is higher."""
+        matrix = {'buy': np.array([10.0, 12.0]), 'sell': np.array([12.0, 10.0]), 'close': np.array([11.5, 11.5])}
+        np.testing.assert_array_equal(range_position(matrix), [0.75, 0.25])
+
+    def test_sweep(self):
+        """A process pool gives the same results as running in this process, and invalid combinations are skipped."""
+        matrix = makeMatrix(300, 4, 1)
+        grid = {'entry': [0.1, 0.5], 'exit': [0.5, 0.9]}
+        local, pooled = sweep(matrix, grid, processes=1), sweep(matrix, grid, processes=2)
+
+        self.assertEqual([params for params, _ in local], [{'entry': 0.1, 'exit': 0.5}, {'entry': 0.1, 'exit': 0.9}, {'entry': 0.5, 'exit': 0.9}])
+        self.assertEqual([params for params, _ in pooled], [params for params, _ in local])
+        for (_, a), (_, b) in zip(local, pooled):
+            np.testing.assert_array_equal(a['total_return'], b['total_return'])
+
+
+class TestLoadMatrix(TemporaryDatabaseTestCase):
+    def test_masks_missing_tickers(self):
+        """A ticker that enters later is NaN before it and earns nothing there."""
+        add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC', 'Buy': 9.0, 'Sell': 11.0, 'Close': 10.0}])
+        add_rows('2023-01-04', [{'Ticker': 'ABC', 'Description': 'ABC', 'Buy': 10.0, 'Sell': 12.0, 'Close': 11.0},
+                                {'Ticker': 'DEF', 'Description': 'DEF', 'Buy': 4.0, 'Sell': 6.0, 'Close': 5.0}])
+        matrix = load_matrix()
+
+        self.assertEqual(matrix['tickers'], ('ABC', 'DEF'))
+        np.testing.assert_array_equal(matrix['close'], [[10.0, np.nan], [11.0, 5.0]])
+        np.testing.assert_allclose(matrix['returns'], [[0.1, 0.0]])
+
+    def test_empty(self):
+        """A fresh database, or a range without data, raises a clear error instead of failing on an empty matrix."""
+        with self.assertRaisesRegex(ValueError, 'No Hedgeye data'):
+            load_matrix()
+        add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC', 'Buy': 9.0, 'Sell': 11.0, 'Close': 10.0}])
+        with self.assertRaisesRegex(ValueError, 'No Hedgeye data'):
+            load_matrix(start='2023-02-01')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+from DBControls.hedgeye_correlation import log_returns, rolling_moments, rolling_correlation, correlation_on, cache_path
+from DBControls.day_numbers import toDayNumber
+from DBControls.hedgeye_metrics import add_rows
+import DBControls.db_read_write as db
+import DBControls.hedgeye_correlation as hedgeye_correlation
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+from unittest import mock
+import numpy as np
+import unittest
+import os
+
+
+class TestRollingMoments(unittest.TestCase):
+    def test_matches_pairwise_numpy(self):
+        """Every window and pair matches numpy over the days both tickers have a return."""
+        random = np.random.default_rng(0)
+        returns = random.normal(0, 0.01, (120, 4))
+        returns[:40, 0] = np.nan # Enters late
+        returns[70:, 1] = np.nan # Leaves early
+        returns[random.random(returns.shape) < 0.1] = np.nan
+        window, rows = 30, np.arange(0, 120)
+        covariance, correlation = rolling_moments(returns, window, rows, min_periods=10)
+
+        for n, row in enumerate(rows):
+            block = returns[max(0, row - window + 1):row + 1]
+            for i in range(4):
+                for j in range(4):
+                    shared = ~np.isnan(block[:, i]) & ~np.isnan(block[:, j])
+                    if shared.sum() < 10:
+                        self.assertTrue(np.isnan(correlation[n, i, j]))
+                        continue
+                    self.assertAlmostEqual(covariance[n, i, j], np.cov(block[shared, i], block[shared, j])[0, 1])
+                    self.assertAlmostEqual(correlation[n, i, j], np.corrcoef(block[shared, i], block[shared, j])[0, 1])
+
+    def test_some_rows(self):
+        """Computing only the last windows gives the same values as computing all of them."""
+        returns = np.random.default_rng(1).normal(0, 0.01, (80, 3))
+        everything = rolling_moments(returns, 20, np.arange(80))[1]
+        np.testing.assert_allclose(rolling_moments(returns, 20, np.arange(60, 80))[1], everything[60:])
+
+    def test_log_returns(self):
+        """Gaps and the first day have no return instead of a multi-day or zero one."""
+        returns = log_returns(np.array([[1.0], [np.e], [np.nan], [1.0]]))
+        np.testing.assert_allclose(returns[:, 0], [np.nan, 1.0, np.nan, np.nan])
+
+
+class TestCorrelationOn(TemporaryDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.random = np.random.default_rng(2)
+        self.dates = [str(date) for date in np.arange('2023-01-02', '2023-03-31', dtype='datetime64[D]')]
+        for date in self.dates:
+            self.addDay(date)
+
+    def addDay(self, date, tickers=('ABC', 'DEF', 'GHI')):
+        add_rows(date, [{'Ticker': ticker, 'Description': ticker, 'Buy': 11.0, 'Sell': 9.0, 'Close': float(self.random.uniform(9, 11))}
+                        for ticker in tickers])
+
+    def test_matches_whole_history(self):
+        """Reading only one window, or only a range of days, gives the same matrices as computing every day."""
+        everything = rolling_correlation(window=20)
+        for date in (self.dates[20], self.dates[-1]):
+            tickers, correlation = correlation_on(date, window=20, cache=False)
+            self.assertEqual(tickers, everything['tickers'])
+            np.testing.assert_allclose(correlation, everything['correlation'][everything['day'] == toDayNumber(date)][0])
+
+        some = rolling_correlation(window=20, start=self.dates[40], end=self.dates[50])
+        rows = (everything['day'] >= toDayNumber(self.dates[40])) & (everything['day'] <= toDayNumber(self.dates[50]))
+        np.testing.assert_array_equal(some['day'], everything['day'][rows])
+        np.testing.assert_allclose(some['covariance'], everything['covariance'][rows])
+
+    def test_reads_only_the_window(self):
+        """Only the window's days are loaded, however long the history is."""
+        with mock.patch.object(hedgeye_correlation, 'readHedgeyeMatrix', wraps=hedgeye_correlation.readHedgeyeMatrix) as read:
+            correlation_on(self.dates[-1], window=20)
+        self.assertEqual(read.call_args.kwargs['start'], toDayNumber(self.dates[-21]))
+
+    def test_repeat_is_free(self):
+        """A second view of the same day reads the matrix back, one file per view and day."""
+        first = correlation_on(self.dates[-1], window=20)[1]
+        self.assertTrue(os.path.exists(cache_path(20, None, None, toDayNumber(self.dates[-1]))))
+
+        with mock.patch.object(hedgeye_correlation, 'rolling_moments', wraps=rolling_moments) as computed:
+            second = correlation_on('2023-12-31', window=20)[1] # The same newest day
+        computed.assert_not_called()
+        np.testing.assert_array_equal(second, first)
+        self.assertEqual(len(os.listdir(os.path.dirname(cache_path(20, None, None, 0)))), 1) # No temporary files left
+
+    def test_changed_close_recomputes(self):
+        """A close changed inside the window makes the saved matrix stale."""
+        correlation_on(self.dates[-1], window=20)
+        ID = db.Hedgeye.getData(date=self.dates[-5], ticker='ABC')[0].ID
+        db.Hedgeye.updateMany([{'ID': ID, 'date': self.dates[-5], 'ticker': 'ABC', 'close': 20.0}])
+
+        with mock.patch.object(hedgeye_correlation, 'rolling_moments', wraps=rolling_moments) as computed:
+            correlation = correlation_on(self.dates[-1], window=20)[1]
+        computed.assert_called_once()
+        np.testing.assert_allclose(correlation, correlation_on(self.dates[-1], window=20, cache=False)[1])
+
+    def test_no_data(self):
+        """A date before the first day with data has no matrix."""
+        self.assertEqual(correlation_on('2022-12-31', window=20), ((), None))
+        tickers, correlation = correlation_on(self.dates[-1], window=20, tickers=['GHI', 'ABC'])
+        self.assertEqual(tickers, ('ABC', 'GHI'))
+        np.testing.assert_allclose(np.diag(correlation), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+from DBControls.hedgeye_metrics import find_lookback, percent_delta, compute_od_delta, compute_ow_delta, compute_om_delta, compute_tm_delta, compute_sm_delta, compute_oy_delta, compute_delta_ww, lookback_indices, compute_derived, LOOKBACK_WINDOWS, add_row, add_rows, compute_row, recompute
+from DBControls.fast_read import readHedgeye, readHedgeyeArrays
+import DBControls.db_read_write as db
+from DBControls.day_numbers import toDayNumber, fromDayNumber, isWeekday
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+from collections import namedtuple
+from unittest import mock
+import numpy as np
+import sqlite3
+import unittest
+
+
+Row = namedtuple('Row', ['day', 'buy', 'sell', 'close'])
+
+
+def makeHistory(*dates_and_closes):
+    """Builds a `load_history` style (days, rows) pair from (date, close) pairs."""
+    rows = [Row(toDayNumber(date), close + 1, close - 1, close) for date, close in dates_and_closes]
+    return [row.day for row in rows], rows
+
+
+class TestFindLookback(unittest.TestCase):
+    def test_newest_day_in_window(self):
+        """The walk back stops at the newest weekday at least `start` days before the date."""
+        history = makeHistory(('2023-04-17', 1.0), ('2023-04-19', 2.0), ('2023-04-21', 3.0))
+        self.assertEqual(find_lookback('2023-04-27', 'ABC', 7, 30, history).close, 2.0) # 04-20 has no data, 04-19 does
+        self.assertEqual(find_lookback('2023-04-24', 'ABC', 1, 30, history).close, 3.0) # Skips the weekend
+
+    def test_window_end_is_exclusive(self):
+        """A day exactly `stop` days back is outside the window."""
+        history = makeHistory(('2023-03-28', 1.0))
+        self.assertIsNone(find_lookback('2023-04-27', 'ABC', 7, 30, history))
+        self.assertEqual(find_lookback('2023-04-26', 'ABC', 7, 30, history).close, 1.0)
+
+    def test_no_history(self):
+        """Nothing to compare against gives None."""
+        self.assertIsNone(compute_od_delta('2023-04-27', 'ABC', 10.0, ([], [])))
+        self.assertIsNone(compute_delta_ww('2023-04-27', 'ABC', 10.0, 9.0, ([], [])))
+
+    def test_deltas(self):
+        """The formulas are applied to the row found."""
+        history = makeHistory(('2023-04-26', 8.0))
+        self.assertEqual(compute_od_delta('2023-04-27', 'ABC', 10.0, history), 25.0)
+
+        self.assertIsNone(compute_od_delta('2023-04-27', 'ABC', 10.0, makeHistory(('2023-04-26', 0.0)))) # Like no row at all
+
+
+class TestVectorizedLookback(unittest.TestCase):
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.ticker_ids = np.repeat([1, 2, 5], 300)
+        self.days = np.concatenate([np.sort(random.choice(np.arange(19000, 19800), 300, replace=False)) for _ in range(3)]) # Includes weekends
+        self.close = random.uniform(1, 100, len(self.days))
+
+    def test_matches_find_lookback(self):
+        """Every row finds the same lookback row as the scalar binary search over its own ticker."""
+        for start, stop in LOOKBACK_WINDOWS.values():
+            indices = lookback_indices(self.ticker_ids, self.days, start, stop)
+            for ticker in [1, 2, 5]:
+                rows = np.flatnonzero(self.ticker_ids == ticker)
+                weekdays = [i for i in rows if isWeekday(self.days[i])]
+                history = ([int(self.days[i]) for i in weekdays], [Row(int(self.days[i]), 0, 0, i) for i in weekdays]) # close holds the row index
+                for i in rows:
+                    found = find_lookback(fromDayNumber(self.days[i]), ticker, start, stop, history)
+                    self.assertEqual(indices[i], found.close if found else -1)
+
+    def test_zero_close(self):
+        """A zero close gives NaN instead of raising for the whole history."""
+        close = self.close.copy()
+        close[0] = 0
+        derived = compute_derived(self.ticker_ids, self.days, close, close, close)
+        self.assertTrue(np.isnan(derived['ra_buy'][0]))
+
+    def test_zero_close_scalar(self):
+        """A delta against a zero close is None on the scalar path (it used to raise ZeroDivisionError) and NaN on the vectorized one."""
+        self.assertIsNone(percent_delta(10.0, Row(toDayNumber('2022-04-26'), 1.0, -1.0, 0.0)))
+        scalar = {'od_delta': compute_od_delta, 'ow_delta': compute_ow_delta, 'om_delta': compute_om_delta,
+                  'tm_delta': compute_tm_delta, 'sm_delta': compute_sm_delta, 'oy_delta': compute_oy_delta}
+        old = toDayNumber('2022-04-26')
+        for column, compute in scalar.items():
+            with self.subTest(column=column):
+                day = old + LOOKBACK_WINDOWS[column][0]
+                self.assertIsNone(compute(fromDayNumber(day), 'ABC', 10.0, makeHistory(('2022-04-26', 0.0))))
+                derived = compute_derived(np.array([1, 1]), np.array([old, day]), np.ones(2), np.ones(2), np.array([0.0, 10.0]))
+                self.assertTrue(np.isnan(derived[column][1]))
+
+
+class TestBacklog(TemporaryDatabaseTestCase):
+    def test_backlog_updates_later_rows(self):
+        """Inserting a past day rewrites the deltas of the later days that now look back to it."""
+        for date, close in [('2023-01-02', 10.0), ('2023-01-04', 12.0), ('2023-01-05', 15.0)]:
+            add_row(date, 'ABC', 'ABC INC', close + 1, close - 1, close)
+        self.assertEqual(readHedgeye(date='2023-01-04', ticker='ABC')[0].od_delta, 20.0) # Compared with 01-02
+
+        add_row('2023-01-03', 'ABC', 'ABC INC', 9.0, 7.0, 8.0)
+        self.assertEqual(readHedgeye(date='2023-01-04', ticker='ABC')[0].od_delta, 50.0) # Now compared with 01-03
+        self.assertEqual(readHedgeye(date='2023-01-05', ticker='ABC')[0].od_delta, 25.0) # Unchanged
+        self.assertEqual(recompute(), 0) # Nothing left for a full recompute to fix
+
+    def test_backlog_before_rows_of_another_process(self):
+        """Later rows are found in the table, not in this process's date index, which misses another process's writes."""
+        for date, close in [('2023-01-02', 10.0), ('2023-01-03', 12.0)]:
+            add_row(date, 'ABC', 'ABC INC', close + 1, close - 1, close)
+        self.assertEqual(db.Hedgeye.getLatestDate(), '2023-01-03')
+        
+        other_process = sqlite3.connect(self.db_filename)
+        other_process.execute('''INSERT INTO "Hedgeye" ("Date", "Day Number", "Ticker ID", "Buy", "Sell", "Close", "1D Delta (%)") 
+                                 VALUES ('2023-01-05', 19362, (SELECT "ID" FROM "Tickers" WHERE "Symbol" = 'ABC'), 16.0, 14.0, 15.0, 25.0)''')
+        other_process.commit()
+        other_process.close()
+        
+        add_row('2023-01-04', 'ABC', 'ABC INC', 13.0, 11.0, 12.0) # The newest date this process knows of
+        self.assertEqual(readHedgeye(date='2023-01-05', ticker='ABC')[0].od_delta, 25.0) # Now compared with 01-04
+        self.assertEqual(recompute(), 0)
+
+    def test_latest_date_skips_history(self):
+        """Looking for later rows after an ingest on the newest date reads only the days after it, never the lookback history."""
+        add_row('2023-01-02', 'ABC', 'ABC INC', 11.0, 9.0, 10.0)
+        with mock.patch('DBControls.hedgeye_metrics.readHedgeyeArrays', wraps=readHedgeyeArrays) as read:
+            add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC INC', 'Buy': 13.0, 'Sell': 11.0, 'Close': 12.0}])
+        dependents = [call for call in read.call_args_list if 'session' in call.kwargs] # compute_rows reads the history without one
+        self.assertEqual(len(dependents), 1)
+        self.assertEqual(dependents[0].args, (('close',),))
+        self.assertEqual(dependents[0].kwargs['start'], toDayNumber('2023-01-03') + 1)
+        self.assertEqual(readHedgeye(date='2023-01-03', ticker='ABC')[0].od_delta, 20.0)
+
+    def test_backlog_is_one_transaction(self):
+        """If updating the later rows fails, the backlogged rows are not written either."""
+        for date, close in [('2023-01-02', 10.0), ('2023-01-04', 12.0)]:
+            add_row(date, 'ABC', 'ABC INC', close + 1, close - 1, close)
+
+        with mock.patch.object(db.Hedgeye, 'updateMany', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC INC', 'Buy': 9.0, 'Sell': 7.0, 'Close': 8.0},
+                                        {'Ticker': 'NEW', 'Description': 'NEW INC', 'Buy': 2.0, 'Sell': 1.0, 'Close': 1.5}])
+        self.assertEqual(readHedgeye(date='2023-01-03'), [])
+        self.assertIsNone(db.Tickers.getId('NEW'))
+        self.assertEqual(readHedgeye(date='2023-01-04', ticker='ABC')[0].od_delta, 20.0) # Still compared with 01-02
+
+    def test_zero_previous_close(self):
+        """A stored zero close gives None deltas on the days that look back to it, on ingest and in a recompute alike."""
+        db.Hedgeye.writeMany([{'date': '2023-01-02', 'ticker': 'ABC', 'buy': 1.0, 'sell': 1.0, 'close': 0.0}]) # Written before add_row validated closes
+        self.assertIsNone(compute_row('2023-01-03', 'ABC', 'ABC INC', 11.0, 9.0, 10.0)['od_delta'])
+        self.assertIsNone(add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC INC', 'Buy': 11.0, 'Sell': 9.0, 'Close': 10.0}])[0]['od_delta'])
+        self.assertIsNone(readHedgeye(date='2023-01-03', ticker='ABC')[0].od_delta)
+        self.assertEqual(recompute(tickers=['ABC'], start='2023-01-03'), 0) # Both paths agree
+
+    def test_add_rows_matches_add_row(self):
+        """The batch ingest computes the same rows as one compute_row per ticker, including for new tickers."""
+        add_rows('2023-01-03', [{'Ticker': 'ABC', 'Description': 'ABC INC', 'Buy': 11.0, 'Sell': 9.0, 'Close': 10.0}])
+        stocks = [{'Ticker': 'ABC', 'Description': 'ABC INC', 'Buy': 13.0, 'Sell': 10.0, 'Close': 12.5},
+                  {'Ticker': 'DEF', 'Description': 'DEF INC', 'Buy': 3.0, 'Sell': 2.0, 'Close': 2.5}]
+        expected = [compute_row('2023-01-04', stock['Ticker'], stock['Description'], stock['Buy'], stock['Sell'], stock['Close']) for stock in stocks]
+
+        self.assertEqual(add_rows('2023-01-04', stocks), expected)
+        self.assertEqual(readHedgeye(date='2023-01-04', ticker='ABC')[0].od_delta, 25.0)
+
+        with self.assertRaises(ZeroDivisionError):
+            add_rows('2023-01-05', [dict(stocks[0], Close=0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
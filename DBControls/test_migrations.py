@@ -0,0 +1,145 @@
+from DBControls.migrations import migrate, getVersion, MIGRATIONS
+from unittest import mock
+import sqlalchemy as sqla
+import tempfile
+import unittest
+import os
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = sqla.create_engine(f'sqlite:///{os.path.join(self.directory.name, "test.db")}')
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def tableNames(self):
+        return sqla.inspect(self.engine).get_table_names()
+
+    def indexNames(self, table):
+        return [index['name'] for index in sqla.inspect(self.engine).get_indexes(table)]
+
+    def test_fresh_database(self):
+        """An empty file is bootstrapped with every table and index."""
+        version = migrate(self.engine)
+        self.assertEqual(version, MIGRATIONS[-1][0])
+
+        for table in ['Hedgeye', 'NASDAQ', 'NYSE', 'Ingest Log', 'Tickers', 'Breadth Indicators', 'Indicator State']:
+            self.assertIn(table, self.tableNames())
+        self.assertIn('ix_hedgeye_date_ticker', self.indexNames('Hedgeye'))
+
+        with self.engine.connect() as connection:
+            self.assertEqual(getVersion(connection), version)
+
+    def test_idempotent(self):
+        """Running the migrations twice changes nothing."""
+        first = migrate(self.engine)
+        second = migrate(self.engine)
+        self.assertEqual(first, second)
+
+    def test_upgrade_removes_duplicates(self):
+        """A version 0 database with duplicate Hedgeye rows keeps the oldest row and gains the unique index."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE "Hedgeye" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Date" TEXT, "Ticker" TEXT, "Close" REAL)')
+            connection.exec_driver_sql('''INSERT INTO "Hedgeye" ("Date", "Ticker", "Close") VALUES
+                                          ('2023-01-03', 'ABC', 1.0), ('2023-01-03', 'ABC', 2.0), ('2023-01-04', 'ABC', 3.0)''')
+        migrate(self.engine)
+
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql('SELECT "Date", "Close" FROM "Hedgeye" ORDER BY "Date"').all()
+        self.assertEqual(rows, [('2023-01-03', 1.0), ('2023-01-04', 3.0)])
+
+        with self.assertRaises(sqla.exc.IntegrityError):
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql('''INSERT INTO "Hedgeye" ("Date", "Ticker ID") VALUES ('2023-01-04', (SELECT "ID" FROM "Tickers" WHERE "Symbol" = 'ABC'))''')
+
+    def test_upgrade_moves_tickers(self):
+        """Tickers and their newest description move to the Tickers table and every row keeps its ticker."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE "Hedgeye" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Date" TEXT, "Ticker" TEXT, "Description" TEXT, "Close" REAL)')
+            connection.exec_driver_sql('''INSERT INTO "Hedgeye" ("Date", "Ticker", "Description", "Close") VALUES
+                                          ('2023-01-03', 'ABC', 'OLD NAME', 1.0), ('2023-01-04', 'ABC', 'NEW NAME', 2.0), ('2023-01-04', 'DEF', 'DEF INC', 3.0)''')
+        migrate(self.engine)
+
+        with self.engine.connect() as connection:
+            tickers = connection.exec_driver_sql('SELECT "Symbol", "Description", "First Seen", "Last Seen" FROM "Tickers" ORDER BY "Symbol"').all()
+            rows = connection.exec_driver_sql('''SELECT h."Date", t."Symbol", h."Close" FROM "Hedgeye" h JOIN "Tickers" t ON t."ID" = h."Ticker ID" 
+                                                 ORDER BY h."ID"''').all()
+        self.assertEqual(tickers, [('ABC', 'NEW NAME', '2023-01-03', '2023-01-04'), ('DEF', 'DEF INC', '2023-01-04', '2023-01-04')])
+        self.assertEqual(rows, [('2023-01-03', 'ABC', 1.0), ('2023-01-04', 'ABC', 2.0), ('2023-01-04', 'DEF', 3.0)])
+        self.assertNotIn('Ticker', [column['name'] for column in sqla.inspect(self.engine).get_columns('Hedgeye')])
+
+    def createVersionZero(self):
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE "Hedgeye" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Date" TEXT, "Ticker" TEXT, "Description" TEXT, "Close" REAL)')
+            connection.exec_driver_sql('CREATE TABLE "NASDAQ" ("Date" TEXT PRIMARY KEY, "Close (%)" REAL)')
+            connection.exec_driver_sql('CREATE TABLE "NYSE" ("Date" TEXT PRIMARY KEY, "Close (%)" REAL)')
+            connection.exec_driver_sql('''INSERT INTO "Hedgeye" ("Date", "Ticker", "Description", "Close") VALUES
+                                          ('2023-01-03', 'ABC', 'ABC INC', 1.0), ('2023-01-04', 'ABC', 'ABC INC', 2.0), ('2023-01-04', 'DEF', 'DEF INC', 3.0)''')
+
+    def storedRows(self):
+        with self.engine.connect() as connection:
+            return connection.exec_driver_sql('''SELECT h."Date", t."Symbol", h."Close", h."Day Number" FROM "Hedgeye" h JOIN "Tickers" t ON t."ID" = h."Ticker ID" 
+                                                 ORDER BY h."ID"''').all()
+
+    def test_failure_rolls_back(self):
+        """A migration failing after its DDL ran leaves no trace of it, and the next run finishes the upgrade."""
+        self.createVersionZero()
+        
+        for failing in [4, 5]:
+            with self.subTest(version=failing):
+                def fail(connection, function=dict((version, function) for version, _, function in MIGRATIONS)[failing]):
+                    function(connection)
+                    raise sqla.exc.OperationalError('injected', (), Exception('injected failure'))
+
+                with mock.patch('DBControls.migrations.MIGRATIONS', [(version, description, fail if version == failing else function) 
+                                                                      for version, description, function in MIGRATIONS]):
+                    with self.assertRaises(sqla.exc.OperationalError):
+                        migrate(self.engine)
+                
+                with self.engine.connect() as connection:
+                    self.assertEqual(getVersion(connection), failing - 1)
+                if failing == 4: # Tickers table, rebuild, and dropped column all rolled back
+                    self.assertNotIn('Tickers', self.tableNames())
+                    self.assertIn('Ticker', [column['name'] for column in sqla.inspect(self.engine).get_columns('Hedgeye')])
+                else:
+                    self.assertNotIn('Day Number', [column['name'] for column in sqla.inspect(self.engine).get_columns('NASDAQ')])
+
+        self.assertEqual(migrate(self.engine), MIGRATIONS[-1][0])
+        self.assertEqual(self.storedRows(), [('2023-01-03', 'ABC', 1.0, 19360), ('2023-01-04', 'ABC', 2.0, 19361), ('2023-01-04', 'DEF', 3.0, 19361)])
+
+    def test_rerun_over_partial_migration(self):
+        """Migrations 4 and 5 finish a partial run of themselves (as left behind by a commit after each DDL statement)."""
+        self.createVersionZero()
+        functions = {version: function for version, _, function in MIGRATIONS}
+        with mock.patch('DBControls.migrations.MIGRATIONS', MIGRATIONS[:3]):
+            migrate(self.engine)
+        
+        with self.engine.begin() as connection: # The Tickers table and a half-copied rebuild already exist
+            connection.exec_driver_sql('CREATE TABLE "Tickers" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Symbol" TEXT NOT NULL UNIQUE, "Description" TEXT, "First Seen" TEXT, "Last Seen" TEXT)')
+            connection.exec_driver_sql('''INSERT INTO "Tickers" ("Symbol", "Description", "First Seen", "Last Seen") VALUES ('ABC', 'ABC INC', '2023-01-03', '2023-01-04')''')
+            connection.exec_driver_sql('CREATE TABLE "Hedgeye New" ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Date" TEXT, "Ticker ID" INTEGER, "Close" REAL)')
+            connection.exec_driver_sql('''INSERT INTO "Hedgeye New" ("ID", "Date", "Ticker ID", "Close") VALUES (1, '2023-01-03', 1, 1.0)''')
+            functions[4](connection)
+            connection.exec_driver_sql('ALTER TABLE "NASDAQ" ADD COLUMN "Day Number" INTEGER') # Migration 5 stopped after one table
+            functions[5](connection)
+            functions[5](connection) # And a whole rerun changes nothing
+            connection.exec_driver_sql('PRAGMA user_version = 5')
+        
+        self.assertEqual(migrate(self.engine), MIGRATIONS[-1][0])
+        self.assertEqual(self.storedRows(), [('2023-01-03', 'ABC', 1.0, 19360), ('2023-01-04', 'ABC', 2.0, 19361), ('2023-01-04', 'DEF', 3.0, 19361)])
+        self.assertIn('ix_nasdaq_day', self.indexNames('NASDAQ'))
+
+    def test_newer_database(self):
+        """Refuses to touch a database written by a newer app."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(f'PRAGMA user_version = {MIGRATIONS[-1][0] + 1}')
+
+        with self.assertRaises(RuntimeError):
+            migrate(self.engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
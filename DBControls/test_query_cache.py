@@ -0,0 +1,92 @@
+from DBControls.query_cache import QueryCache, query_cache
+import DBControls.db_read_write as db
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+import unittest
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = QueryCache(maxsize=2)
+        cache.put(('Hedgeye', 'q', '2023-01-03', None, ()), 1, 0)
+        cache.put(('Hedgeye', 'q', '2023-01-04', None, ()), 2, 0)
+        cache.get(('Hedgeye', 'q', '2023-01-03', None, ()))
+        cache.put(('Hedgeye', 'q', '2023-01-05', None, ()), 3, 0)
+
+        self.assertEqual(cache.get(('Hedgeye', 'q', '2023-01-03', None, ())), (True, 1))
+        self.assertEqual(cache.get(('Hedgeye', 'q', '2023-01-04', None, ())), (False, None))
+
+    def test_precise_invalidation(self):
+        """Only entries that could hold the written (date, ticker) are dropped."""
+        cache = QueryCache()
+        keys = {
+            'same': ('Hedgeye', 'q', '2023-01-03', 'ABC', ()),
+            'other_ticker': ('Hedgeye', 'q', '2023-01-03', 'DEF', ()),
+            'other_date': ('Hedgeye', 'q', '2023-01-04', 'ABC', ()),
+            'whole_date': ('Hedgeye', 'q', '2023-01-03', None, ()),
+            'ticker_history': ('Hedgeye', 'q', None, 'ABC', ()),
+            'other_table': ('NASDAQ', 'q', '2023-01-03', None, ())
+        }
+        for key in keys.values():
+            cache.put(key, 0, 0)
+
+        cache.invalidate('Hedgeye', dates={'2023-01-03'}, tickers={'ABC'})
+        cached = {name for name, key in keys.items() if cache.get(key)[0]}
+        self.assertEqual(cached, {'other_ticker', 'other_date', 'other_table'})
+
+    def test_stale_put_is_ignored(self):
+        """A value read before an invalidation is not cached after it."""
+        cache = QueryCache()
+        generation = cache.generation('NASDAQ')
+        cache.invalidate('NASDAQ')
+        cache.put(('NASDAQ', 'q', None, None, ()), 'old', generation)
+        self.assertEqual(cache.get(('NASDAQ', 'q', None, None, ()))[0], False)
+
+    def test_stats(self):
+        """Hits and misses are counted."""
+        cache = QueryCache()
+        cache.get(('NYSE', 'q', None, None, ()))
+        cache.put(('NYSE', 'q', None, None, ()), 1, 0)
+        cache.get(('NYSE', 'q', None, None, ()))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+
+class TestCachedModels(TemporaryDatabaseTestCase):
+    def test_write_invalidates(self):
+        """Repeated reads are hits and a committed write is visible on the next read."""
+        db.Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'close': 1.0}])
+        self.assertEqual(len(db.Hedgeye.getData(ticker='ABC')), 1)
+
+        hits = query_cache.stats()['hits']
+        db.Hedgeye.getData(ticker='ABC')
+        self.assertEqual(query_cache.stats()['hits'], hits + 1)
+
+        db.Hedgeye.writeMany([{'date': '2023-01-04', 'ticker': 'ABC', 'close': 2.0}])
+        self.assertEqual(len(db.Hedgeye.getData(ticker='ABC')), 2)
+        self.assertEqual(db.Hedgeye.getAllDates(), ['2023-01-03', '2023-01-04'])
+
+        db.Hedgeye.writeMany([{'date': '2023-01-04', 'ticker': 'ABC', 'close': 3.0}], on_conflict='update')
+        self.assertEqual(db.Hedgeye.getData(date='2023-01-04', ticker='ABC')[0].close, 3.0)
+
+    def test_new_description_invalidates(self):
+        """A newer description in the Tickers table shows up on cached rows of older dates."""
+        db.Hedgeye.writeMany([{'date': '2023-01-03', 'ticker': 'ABC', 'description': 'OLD NAME', 'close': 1.0}])
+        self.assertEqual(db.Hedgeye.getData(date='2023-01-03', ticker='ABC')[0].description, 'OLD NAME')
+
+        db.Hedgeye.writeMany([{'date': '2023-01-04', 'ticker': 'ABC', 'description': 'NEW NAME', 'close': 2.0}])
+        self.assertEqual(db.Hedgeye.getData(date='2023-01-03', ticker='ABC')[0].description, 'NEW NAME')
+
+        db.Hedgeye.writeMany([{'date': '2023-01-02', 'ticker': 'ABC', 'description': 'OLDEST NAME', 'close': 0.5}]) # Backlog keeps the newest name
+        self.assertEqual(db.Hedgeye.getData(date='2023-01-02', ticker='ABC')[0].description, 'NEW NAME')
+
+    def test_cached_list_is_a_copy(self):
+        """Reversing a returned list (as the GUI does) does not corrupt the cache."""
+        db.NASDAQ.writeMany([{'date': '2023-01-03'}, {'date': '2023-01-04'}])
+        db.NASDAQ.getAllDates().reverse()
+        self.assertEqual(db.NASDAQ.getAllDates(), ['2023-01-03', '2023-01-04'])
+
+
+if __name__ == '__main__':
+    unittest.main()
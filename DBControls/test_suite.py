@@ -1,53 +1,52 @@
 """
-You need to remove 'DBControls/' on line 7 in 'dbReadWrite.py' before running tests.
-You also need to remove the prepended 'DBControls' for identifying folder location in hedgeyePrep.py.
+Run from the repository root: python -m DBControls.test_suite
+Every test uses its own temporary database, the real one is never touched.
+test_hedgeye_metrics.py and test_composite_metrics.py check answers against the author's market_data.db and are not included.
 """
 
 import unittest
-from test_dbReadWrite import TestHedgeye, TestNASDAQ, TestNYSE
-import test_hedgeyePrep as hedgeye
-import test_compositePrep as composite
-
-
+import DBControls.test_db_read_write as db_read_write
+import DBControls.test_migrations as migrations
+import DBControls.test_query_cache as query_cache
+import DBControls.test_date_index as date_index
+import DBControls.test_day_numbers as day_numbers
+import DBControls.test_trading_calendar as trading_calendar
+import DBControls.test_hedgeye_lookback as hedgeye_lookback
+import DBControls.test_composite_lookback as composite_lookback
+import DBControls.test_hedgeye_analytics as hedgeye_analytics
+import DBControls.test_hedgeye_backtest as hedgeye_backtest
+import DBControls.test_hedgeye_correlation as hedgeye_correlation
+import test_interface as interface
+
+
+loader = unittest.defaultTestLoader
 test_suite = unittest.TestSuite()
 
 # Testing all read and write functions
-test_suite.addTest(unittest.makeSuite(TestHedgeye))
-test_suite.addTest(unittest.makeSuite(TestNYSE))
-test_suite.addTest(unittest.makeSuite(TestNASDAQ))
+test_suite.addTest(loader.loadTestsFromTestCase(db_read_write.TestHedgeye))
+test_suite.addTest(loader.loadTestsFromTestCase(db_read_write.TestNYSE))
+test_suite.addTest(loader.loadTestsFromTestCase(db_read_write.TestNASDAQ))
 
-# Testing all metric calculations
-test_suite.addTest(unittest.makeSuite(hedgeye.TestDelta_WW))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestOD_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestOW_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestOM_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestTM_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestSM_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestOY_Delta))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestRA_Buy))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestRA_Sell))
-test_suite.addTest(unittest.makeSuite(hedgeye.TestAddRow))
+# Testing the schema, caching, and date handling
+test_suite.addTest(loader.loadTestsFromModule(migrations))
+test_suite.addTest(loader.loadTestsFromModule(query_cache))
+test_suite.addTest(loader.loadTestsFromModule(date_index))
+test_suite.addTest(loader.loadTestsFromModule(day_numbers))
+test_suite.addTest(loader.loadTestsFromModule(trading_calendar))
 
 # Testing all metric calculations
-test_suite.addTest(unittest.makeSuite(composite.TestVolumeDelta))
-test_suite.addTest(unittest.makeSuite(composite.TestUpsideDay))
-test_suite.addTest(unittest.makeSuite(composite.TestDownsideDay))
-test_suite.addTest(unittest.makeSuite(composite.TestNetAD))
-test_suite.addTest(unittest.makeSuite(composite.TesttdBreakawayMomentum))
-test_suite.addTest(unittest.makeSuite(composite.TestTdBreakawayMomentum))
-test_suite.addTest(unittest.makeSuite(composite.TestAdvanceDeclineRatio))
-test_suite.addTest(unittest.makeSuite(composite.TestAdvanceDeclineThrust))
-test_suite.addTest(unittest.makeSuite(composite.TestFDAdvanceDeclineThrust))
-test_suite.addTest(unittest.makeSuite(composite.TestFDUpDownVolume))
-test_suite.addTest(unittest.makeSuite(composite.TestNetHighsLows))
-test_suite.addTest(unittest.makeSuite(composite.TestTODAverageHighsLows))
-test_suite.addTest(unittest.makeSuite(composite.TestSTDAverageHighsLows))
-test_suite.addTest(unittest.makeSuite(composite.TestAddRow))
+test_suite.addTest(loader.loadTestsFromModule(hedgeye_lookback))
+test_suite.addTest(loader.loadTestsFromModule(composite_lookback))
 
+# Testing the analytics
+test_suite.addTest(loader.loadTestsFromModule(hedgeye_analytics))
+test_suite.addTest(loader.loadTestsFromModule(hedgeye_backtest))
+test_suite.addTest(loader.loadTestsFromModule(hedgeye_correlation))
+
+# Testing when the app fetches
+test_suite.addTest(loader.loadTestsFromModule(interface))
 
 
 if __name__ == '__main__':
     runner = unittest.TextTestRunner()
     runner.run(test_suite)
-
-    
\ No newline at end of file
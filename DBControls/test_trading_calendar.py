@@ -0,0 +1,37 @@
+from DBControls.trading_calendar import trading_calendar, holidays, easterSunday
+from DBControls.day_numbers import toDayNumber
+from datetime import date
+import unittest
+
+
+class TestTradingCalendar(unittest.TestCase):
+    def test_2023_holidays(self):
+        """The rules reproduce the published 2023 NYSE holiday schedule."""
+        expected = ['2023-01-02', '2023-01-16', '2023-02-20', '2023-04-07', '2023-05-29',
+                    '2023-06-19', '2023-07-04', '2023-09-04', '2023-11-23', '2023-12-25']
+        self.assertEqual([str(day) for day in holidays(2023)], expected)
+        self.assertEqual(len(trading_calendar.sessionDays('2023-01-01', '2023-12-31')), 250)
+
+    def test_observed_and_special_days(self):
+        """Weekend holidays move to the nearest weekday, except a Saturday New Year's Day, and one-off closures count."""
+        self.assertFalse(trading_calendar.isTradingDay('2021-12-24')) # Christmas on a Saturday
+        self.assertTrue(trading_calendar.isTradingDay('2021-12-31')) # New Year's Day 2022 on a Saturday
+        self.assertFalse(trading_calendar.isTradingDay('2012-10-29')) # Hurricane Sandy
+        self.assertEqual(easterSunday(2024), date(2024, 3, 31))
+
+    def test_navigation(self):
+        """Lookups accept strings, dates, and day numbers, and never land on a closed day."""
+        self.assertEqual(trading_calendar.sessionOnOrBefore('2023-07-04'), '2023-07-03')
+        self.assertEqual(trading_calendar.sessionOnOrBefore(date(2023, 7, 5)), '2023-07-05')
+        self.assertEqual(trading_calendar.previousSession('2023-07-05'), '2023-07-03')
+        self.assertEqual(trading_calendar.previousSession(toDayNumber('2023-04-10')), '2023-04-06') # Good Friday and a weekend
+        self.assertEqual(trading_calendar.sessionsBack('2023-07-05', 3), '2023-06-29')
+
+        with self.assertRaises(ValueError):
+            trading_calendar.isTradingDay('1900-01-02')
+        with self.assertRaises(ValueError):
+            trading_calendar.sessionOnOrBefore('1990-01-01') # In the calendar, but a holiday before its first session
+
+
+if __name__ == '__main__':
+    unittest.main()
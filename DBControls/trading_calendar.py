@@ -0,0 +1,152 @@
+from DBControls.day_numbers import toDayNumber, fromDayNumber, isWeekday
+from datetime import date as Date, timedelta
+import numpy as np
+
+# Offline NYSE/NASDAQ calendar (both exchanges close on the same days). Every session from FIRST_YEAR through LAST_YEAR
+# is precomputed into a sorted array of day numbers (see day_numbers.py), so lookups are a bisect or an array index.
+
+FIRST_YEAR = 1990
+LAST_YEAR = 2100
+
+# Unscheduled full-day closures that no rule predicts
+SPECIAL_CLOSURES = [
+    '1994-04-27', # President Nixon's funeral
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', # September 11
+    '2004-06-11', # President Reagan's funeral
+    '2007-01-02', # President Ford's funeral
+    '2012-10-29', '2012-10-30', # Hurricane Sandy
+    '2018-12-05', # President George H. W. Bush's funeral
+    '2025-01-09' # President Carter's funeral
+]
+
+
+def easterSunday(year):
+    """Returns the date of Easter Sunday (Gregorian calendar, anonymous algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return Date(year, month, day)
+
+
+def nthWeekday(year, month, weekday, n):
+    """Returns the nth (1 = first, -1 = last) given weekday (0 = Monday) of a month."""
+    if n > 0:
+        first = Date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    last = Date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(holiday):
+    """A holiday on a Saturday is observed the Friday before, one on a Sunday the Monday after."""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+
+def holidays(year):
+    """
+    Args:\n
+        year (int): Calendar year.\n
+    Returns:\n
+        list(datetime.date): Weekday full-day exchange holidays of the year (without `SPECIAL_CLOSURES`).
+    """
+    days = []
+
+    new_years = Date(year, 1, 1)
+    if new_years.weekday() != 5: # On a Saturday it is not moved back into the old year
+        days.append(observed(new_years))
+    if year >= 1998:
+        days.append(nthWeekday(year, 1, 0, 3)) # Martin Luther King Jr. Day
+    days.append(nthWeekday(year, 2, 0, 3)) # Washington's Birthday
+    days.append(easterSunday(year) - timedelta(days=2)) # Good Friday
+    days.append(nthWeekday(year, 5, 0, -1)) # Memorial Day
+    if year >= 2022:
+        days.append(observed(Date(year, 6, 19))) # Juneteenth
+    days.append(observed(Date(year, 7, 4))) # Independence Day
+    days.append(nthWeekday(year, 9, 0, 1)) # Labor Day
+    days.append(nthWeekday(year, 11, 3, 4)) # Thanksgiving
+    days.append(observed(Date(year, 12, 25))) # Christmas
+
+    return [day for day in days if day.weekday() < 5]
+
+
+class TradingCalendar:
+    """
+    Array-backed index of exchange sessions. Dates can be given as 'yyyy-mm-dd', datetime.date, or day numbers.
+    """
+    def __init__(self, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+        self.first_day = toDayNumber(Date(first_year, 1, 1))
+        self.last_day = toDayNumber(Date(last_year, 12, 31))
+
+        days = np.arange(self.first_day, self.last_day + 1, dtype=np.int64)
+        closed = [toDayNumber(day) for year in range(first_year, last_year + 1) for day in holidays(year)]
+        closed += [toDayNumber(day) for day in SPECIAL_CLOSURES]
+
+        self._is_session = isWeekday(days) & ~np.isin(days, closed) # Indexed by day - first_day
+        self.sessions = days[self._is_session] # Sorted day numbers of every session
+
+
+    def _day(self, date):
+        """Returns the day number of a date and checks that the calendar covers it."""
+        day = int(date) if isinstance(date, (int, np.integer)) else toDayNumber(date)
+        if not self.first_day <= day <= self.last_day:
+            raise ValueError(f'{fromDayNumber(day)} is outside the trading calendar ({fromDayNumber(self.first_day)} to {fromDayNumber(self.last_day)}).')
+        return day
+
+
+    def isTradingDay(self, date):
+        """Returns True if the exchanges are open on the date. O(1)."""
+        return bool(self._is_session[self._day(date) - self.first_day])
+
+
+    def sessionOnOrBefore(self, date):
+        """Returns the date itself if it is a session, otherwise the session before it, as 'yyyy-mm-dd'."""
+        i = np.searchsorted(self.sessions, self._day(date), side='right') - 1
+        if i < 0: # Index -1 would wrap around to the last session
+            raise ValueError(f'The trading calendar has no session on or before {date}.')
+        return fromDayNumber(self.sessions[i])
+
+
+    def previousSession(self, date):
+        """Returns the last session strictly before the date, as 'yyyy-mm-dd'."""
+        return self.sessionsBack(date, 1)
+
+
+    def sessionsBack(self, date, n):
+        """
+        Args:\n
+            date (str, datetime.date, or int): Any day, session or not.\n
+            n (int): How many sessions to go back (1 = the last session before the date).\n
+        Returns:\n
+            str: The nth session before the date, 'yyyy-mm-dd'.
+        """
+        i = np.searchsorted(self.sessions, self._day(date), side='left') - n
+        if i < 0:
+            raise ValueError(f'The trading calendar does not reach {n} sessions before {date}.')
+        return fromDayNumber(self.sessions[i])
+
+
+    def sessionDays(self, start, end):
+        """
+        Args:\n
+            start (str, datetime.date, or int): First day, inclusive.\n
+            end (str, datetime.date, or int): Last day, inclusive.\n
+        Returns:\n
+            numpy.ndarray: Day numbers of the sessions between the two days, ascending.
+        """
+        first, last = self._day(start), self._day(end)
+        return self.sessions[np.searchsorted(self.sessions, first, side='left'):np.searchsorted(self.sessions, last, side='right')]
+
+
+trading_calendar = TradingCalendar() # Shared, built once on import (a few milliseconds)
@@ -66,3 +66,59 @@ def reformatData(data):
                 'Close': cleanData(pieces[6])
                     })
     return result
+
+
+# Market diary row labels (lowercase, single spaces) and the names their values are stored under
+MARKET_DIARY_LABELS = {
+    'advances': 'Advances',
+    'declines': 'Declines',
+    'new highs': 'New Highs',
+    'new lows': 'New Lows',
+    'advancing volume': 'Advancing Volume',
+    'declining volume': 'Declining Volume',
+    'total volume': 'Total Volume'
+}
+
+# Which occurrence of a label is read when a table repeats it, counting from 0. The NYSE table lists the volumes of every
+# NYSE-listed stock (composite) first and the volumes traded on the NYSE itself second, the app has always stored the second.
+MARKET_DIARY_OCCURRENCES = {
+    'NYSE': {'Advancing Volume': 1, 'Declining Volume': 1, 'Total Volume': 1}
+}
+
+
+def normalizeLabel(label):
+    """Lowercases a row label and drops footnote markers, extra whitespace, and trailing colons. Ex. ' New  Highs*:' -> 'new highs'"""
+    return ' '.join(re.sub(r'[*†‡]', '', label).split()).rstrip(':').strip().lower()
+
+
+def mapDiaryRows(sections, exchanges=('NYSE', 'NASDAQ')):
+    """
+    Maps the rows of the WSJ market diary table to values by their label instead of their position.
+    A repeated label is read at the occurrence in MARKET_DIARY_OCCURRENCES, the first otherwise.\n
+    Args:\n
+        sections (list(list(list(str)))): Cell texts of every row of every table body, in page order.\n
+        exchanges (tuple(str), optional): Exchange of each table body, in page order. Defaults to ('NYSE', 'NASDAQ').\n
+    Raises:\n
+        ValueError: If an exchange's table body is missing, or a label in MARKET_DIARY_LABELS is not there as many times as expected.\n
+    Returns:\n
+        dict: Raw values by name. Ex. {'NYSE Advances': '1,234', ...}
+    """
+    if len(sections) < len(exchanges):
+        raise ValueError(f'Expected {len(exchanges)} market diary sections, found {len(sections)}.')
+    
+    data = {}
+    for exchange, rows in zip(exchanges, sections):
+        found = {} # {name: [value of every occurrence]}
+        for cells in rows:
+            name = MARKET_DIARY_LABELS.get(normalizeLabel(cells[0])) if len(cells) > 1 else None
+            if name: # The latest value is the column right after the label
+                found.setdefault(name, []).append(cells[1].strip())
+        
+        occurrences = MARKET_DIARY_OCCURRENCES.get(exchange, {})
+        for name in MARKET_DIARY_LABELS.values():
+            expected = occurrences.get(name, 0) + 1
+            if len(found.get(name, [])) != expected: # A moved or dropped group must not shift the values silently
+                raise ValueError(f'{exchange} market diary has {len(found.get(name, []))} {name} rows, expected {expected}.')
+            data[f'{exchange} {name}'] = found[name][expected - 1]
+    
+    return data
@@ -77,5 +77,72 @@ class TestClean(unittest.TestCase):
                                   })
 
 
+# Cell texts of the WSJ market diary table bodies as the page lays them out (Latest Close, Previous Close, Week Ago).
+# The NYSE body has the composite volumes first and the NYSE-only volumes second, under the same labels.
+MARKET_DIARY_PAGE = [
+    [['Issues traded', '3,012', '3,001', '3,025'],
+     ['Advances', '1,800', '2,000', '1,500'],
+     ['Declines', '1,100', '900', '1,400'],
+     ['Unchanged', '112', '101', '125'],
+     ['New highs', '40', '35', '22'],
+     ['New lows', '12', '10', '31'],
+     ['Advancing volume*', '2,600,000,000', '2,400,000,000', '1,900,000,000'],
+     ['Declining volume*', '1,300,000,000', '1,500,000,000', '2,200,000,000'],
+     ['Unchanged volume*', '90,000,000', '80,000,000', '95,000,000'],
+     ['Total volume*', '3,990,000,000', '3,980,000,000', '4,195,000,000'],
+     ['Closing Arms (TRIN)*', '0.8', '1.1', '1.3'],
+     ['Advancing volume', '600,000,000', '400,000,000', '350,000,000'],
+     ['Declining volume', '280,000,000', '430,000,000', '500,000,000'],
+     ['Total volume', '900,000,000', '850,000,000', '870,000,000'],
+     ['Unchanged volume', '20,000,000', '20,000,000', '20,000,000']],
+    [['Issues traded', '4,512', '4,498', '4,530'],
+     ['Advances', '2,700', '2,100', '1,900'],
+     ['Declines', '1,600', '2,200', '2,400'],
+     ['Unchanged', '212', '198', '230'],
+     ['New highs', '95', '80', '60'],
+     ['New lows', '70', '75', '120'],
+     ['Closing Arms (TRIN)*', '0.9', '1.0', '1.2'],
+     ['Block trades*', '30,000', '29,000', '31,000'],
+     ['Advancing volume', '3,100,000,000', '2,500,000,000', '2,000,000,000'],
+     ['Declining volume', '1,700,000,000', '2,600,000,000', '2,900,000,000'],
+     ['Total volume', '4,900,000,000', '5,200,000,000', '5,000,000,000']]
+]
+
+
+class TestMapDiaryRows(unittest.TestCase):
+    def test_answer(self):
+        """Values are found by their label, and the NYSE volumes come from the NYSE-only group (tbody[1] tr[12] to tr[14])."""
+        result = mapDiaryRows(MARKET_DIARY_PAGE)
+        self.assertEqual(result['NYSE Advances'], '1,800')
+        self.assertEqual(result['NYSE New Lows'], '12')
+        self.assertEqual(result['NYSE Advancing Volume'], MARKET_DIARY_PAGE[0][11][1])
+        self.assertEqual(result['NYSE Declining Volume'], MARKET_DIARY_PAGE[0][12][1])
+        self.assertEqual(result['NYSE Total Volume'], MARKET_DIARY_PAGE[0][13][1])
+        self.assertEqual(result['NASDAQ Advancing Volume'], MARKET_DIARY_PAGE[1][8][1]) # tbody[2] tr[9]
+        self.assertEqual(result['NASDAQ Total Volume'], '4,900,000,000')
+        self.assertEqual(len(result), 14)
+
+        nyse, nasdaq = MARKET_DIARY_PAGE
+        reordered = [[[' New  Highs:', '40'], *nyse[3::-1], *nyse[5:]], nasdaq[::-1]] # Spacing changed and rows moved
+        self.assertEqual(mapDiaryRows(reordered), result)
+
+    def test_missing_rows(self):
+        """A missing label or volume group raises instead of reading the wrong row."""
+        nyse, nasdaq = MARKET_DIARY_PAGE
+        with self.assertRaises(ValueError):
+            mapDiaryRows([nyse[:2] + nyse[3:], nasdaq]) # No Declines row
+        with self.assertRaises(ValueError):
+            mapDiaryRows([nyse[:11], nasdaq]) # Only the composite volumes
+        with self.assertRaises(ValueError):
+            mapDiaryRows([nyse, nasdaq + nasdaq[8:]]) # NASDAQ volumes twice
+        with self.assertRaises(ValueError):
+            mapDiaryRows([nyse])
+
+    def test_normalize_label(self):
+        """Footnote markers, spacing, and colons do not change a label."""
+        self.assertEqual(normalizeLabel(' Advancing  volume*:'), 'advancing volume')
+        self.assertEqual(normalizeLabel('Total volume\u2020'), 'total volume')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -3,7 +3,7 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from DataCollection.format import cleanData, reformatData, reformatDate
+from DataCollection.format import cleanData, reformatData, reformatDate, mapDiaryRows
 from contextlib import contextmanager
 import json
 
@@ -140,39 +140,36 @@ def fetchHedgeyeData(RISK_RANGE_SIGNALS_URL):
 # -------------------------------------------------------------------------------------------------
 # Composites web controller functions
     
+# Reads the diary date and the text of every cell of the diary table in one WebDriver round trip
+MARKET_DIARY_SCRIPT = """
+const table = arguments[0];
+return {
+    date: arguments[1].textContent,
+    sections: Array.from(table.tBodies, body => Array.from(body.rows, row => Array.from(row.cells, cell => cell.textContent)))
+};
+"""
+
+
 def fetchMarketDiaryData(driver):
     """
-    Requests newest WSJ market diary data for the NASDAQ and NYSE.\n
+    Requests newest WSJ market diary data for the NASDAQ and NYSE.
+    Waits for the diary table and its date once and reads them with a single script call, values are matched by row label.\n
     Args:\n
         driver (webdriver): Webdriver used to navigate to page and collect data.\n
     Returns:\n
         dict: Raw data.
     """
-    raw_data = {}
     try:         
         MARKET_DIARY_URL = 'https://www.wsj.com/market-data/stocks/marketsdiary'
         driver.get(MARKET_DIARY_URL) # Goto specified webpage
         
         wait_driver = createWaitDriver(driver)
-
-        raw_date = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/div[1]/h3/span[2]'))).get_attribute('textContent')
-        raw_data['Date'] = reformatDate(raw_date)
-        
-        raw_data['NYSE Advancing Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[12]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE Declining Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[13]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE Total Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[14]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE Advances'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[2]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE Declines'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[3]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE New Highs'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[5]/td[2]'))).get_attribute('textContent')
-        raw_data['NYSE New Lows'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[1]/tr[6]/td[2]'))).get_attribute('textContent')
+        table = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table')))
+        date = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/div[1]/h3/span[2]'))) # Can render after the table
+        page = driver.execute_script(MARKET_DIARY_SCRIPT, table, date)
         
-        raw_data['NASDAQ Advancing Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[9]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ Declining Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[10]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ Total Volume'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[11]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ Advances'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[2]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ Declines'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[3]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ New Highs'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[5]/td[2]'))).get_attribute('textContent')
-        raw_data['NASDAQ New Lows'] = wait_driver.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="root"]/div/div/div/div[2]/div/div/div[2]/table/tbody[2]/tr[6]/td[2]'))).get_attribute('textContent')
+        raw_data = {'Date': reformatDate(page['date'])}
+        raw_data.update(mapDiaryRows(page['sections'])) # tbody[1] is the NYSE, tbody[2] the NASDAQ
     except:
         return 'Cannot scrape NASDAQ or NYSE composite data from WSJ Market Diary page. Website page has changed to something unrecognizable.'
     
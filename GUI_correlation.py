@@ -0,0 +1,58 @@
+import customtkinter as ctk
+from interface import summonHedgeyeCorrelation
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+class CorrelationWindow(ctk.CTkToplevel):
+    def __init__(self, parent, date=None):
+        super().__init__(parent)
+        self.geometry('760x760')
+        self.geometry(f'+460+140')
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        # Class globals
+        self.date = date
+        self.canvas = None
+        self.title(f'Correlation {date}' if date else 'Correlation')
+
+        # Window size selector, in days with data
+        self.window_seg_buttons = ctk.CTkSegmentedButton(self, values=['20', '60', '120'], command=lambda value: self.drawGraph())
+        self.window_seg_buttons.set('60')
+        self.window_seg_buttons.grid(row=0, column=0, padx=10, pady=10, sticky='e')
+
+        self.drawGraph()
+
+
+    def drawGraph(self):
+        """Shows the correlation of every pair of tickers over the selected window ending on the date, blank where a pair shares too few days."""
+        # Setting color scheme based on color mode of computer
+        color_modes = {
+            'dark': ('#131e23', 'white'),
+            'light': ('white', 'black')
+        }
+        face_color, label_color = color_modes[self._get_appearance_mode()]
+
+        data = summonHedgeyeCorrelation(self.date, window=int(self.window_seg_buttons.get()))
+        correlation = np.array(data['Correlation'], dtype=np.float64).reshape(len(data['Tickers']), len(data['Tickers'])) # None becomes NaN
+
+        # Create figure
+        fig = plt.Figure(figsize=(7, 7), tight_layout=True, facecolor=face_color)
+        ax = fig.add_subplot(111)
+        ax.set_facecolor(face_color)
+
+        image = ax.imshow(correlation, cmap='RdYlGn', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(data['Tickers'])), data['Tickers'], rotation=90)
+        ax.set_yticks(range(len(data['Tickers'])), data['Tickers'])
+        ax.tick_params(colors=label_color)
+        colorbar = fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        colorbar.ax.tick_params(colors=label_color)
+
+        # Create the canvas and draw the plot, replacing the previous window size's
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().destroy()
+        self.canvas = FigureCanvasTkAgg(fig, master=self)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().grid(row=1, column=0, padx=10, pady=(0, 10), sticky='nsew')
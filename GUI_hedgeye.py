@@ -1,10 +1,11 @@
 from GUI_settings import Settings
-from interface import summonHedgeyeData
+from GUI_ranking import RankingWindow
+from GUI_correlation import CorrelationWindow
+from interface import summonHedgeyeData, summonHedgeyeSeries
 import customtkinter as ctk
 from tkinter import ttk
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
 from threading import Thread
+import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -34,6 +35,14 @@ class HedgeyePage(ctk.CTkFrame):
         # Backlog data
         button4 = ctk.CTkButton(self, text='Backlog Data', command=self.backLog)
         button4.grid(row=0, column=8, padx=(10, 40), pady=10, sticky='ew')
+        
+        # Every ticker of the shown date ranked by a statistic
+        button6 = ctk.CTkButton(self, text='Rankings', command=lambda: RankingWindow(self, self.master.pages['Hedgeye'][1]))
+        button6.grid(row=0, column=3, padx=10, pady=10, sticky='ew')
+        
+        # Rolling correlation of every pair of tickers on the shown date
+        button7 = ctk.CTkButton(self, text='Correlation', command=lambda: CorrelationWindow(self, self.master.pages['Hedgeye'][1]))
+        button7.grid(row=0, column=4, padx=10, pady=10, sticky='ew')
 
         # Open settings
         button5 = ctk.CTkButton(self, text='Settings', command=lambda: Settings(self.master))
@@ -232,14 +241,6 @@ class HedgeyePage(ctk.CTkFrame):
         ax = fig.add_subplot(111)
         ax.set_facecolor(face_color)
         
-        # Process the data summoned
-        data = summonHedgeyeData(ticker=ticker)
-        dates = [datetime.strptime(d['Date'], '%Y-%m-%d') for d in data[:-1]] # Excludes 10s/2s data        
-        y1_values = [d['Buy'] for d in data[0:-1]]
-        y2_values = [d['Sell'] for d in data[0:-1]]
-        y3_values = [d['Close'] for d in data[0:-1]]
-        
-        
         # ------------------------------------------------------------------------------------------------
         # Changes the view of the grid by the segmented button and takes care of gaps in the data
         
@@ -252,26 +253,18 @@ class HedgeyePage(ctk.CTkFrame):
         button_selected = self.grid_split_seg_buttons.get() # Get the current selected button
         week_delta = week_deltas.get(button_selected, None) # Calculate the week delta
 
-        # Set the start and end date
-        end_date = dates[-1]
-        start_date = end_date - relativedelta(weeks=week_delta)
-
-        # Filter the data
-        filtered_data = [(date, y1, y2, y3) 
-                        for date, y1, y2, y3 in zip(dates, y1_values, y2_values, y3_values) 
-                        if start_date <= date <= end_date or start_date == end_date]
-
-        # Unzip the filtered_data list into separate lists
-        filtered_dates, filtered_y1_values, filtered_y2_values, filtered_y3_values = zip(*filtered_data)
+        # The database only returns the selected window ending at the ticker's most recent date
+        series = summonHedgeyeSeries(ticker, days=week_delta * 7 if week_delta else None)
+        filtered_dates = series['date']
         
-        gaps = [i for i in range(1, len(filtered_dates)) if (filtered_dates[i] - filtered_dates[i - 1]).days > 7] # Find gaps in dates larger than 7 days
-        segments = [0] + gaps + [len(filtered_dates)] # Add start and end indices
+        gaps = np.flatnonzero(np.diff(filtered_dates) > np.timedelta64(7, 'D')) + 1 # Find gaps in dates larger than 7 days
+        segments = [0] + gaps.tolist() + [len(filtered_dates)] # Add start and end indices
 
         for i, (start, end) in enumerate(zip(segments[:-1], segments[1:])):
             is_first_segment = i == 0 # True if i == 0    
             _plotSegment(ax, 
                         filtered_dates[start:end], 
-                        [filtered_y1_values[start:end], filtered_y2_values[start:end], filtered_y3_values[start:end]], 
+                        [series['buy'][start:end], series['sell'][start:end], series['close'][start:end]], 
                         colors=['green', 'red', close_line_color], 
                         labels=['Buy', 'Sell', 'Close'], 
                         linestyles=['-', '-', '--'], 
@@ -0,0 +1,70 @@
+import customtkinter as ctk
+from tkinter import ttk
+from interface import summonHedgeyeRanking, RANKING_LABELS
+
+
+class RankingWindow(ctk.CTkToplevel):
+    def __init__(self, parent, date=None):
+        super().__init__(parent)
+        self.geometry('1150x600')
+        self.geometry(f'+260+240')
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        # Class globals
+        self.parent = parent
+        self.date = date
+        self.table = None
+        self.keys = {label: key for key, label in RANKING_LABELS.items()} # Column heading -> statistic it sorts by
+        self.title(f'Rankings {date}' if date else 'Rankings')
+
+        # Sort selector
+        self.sort_drop_down = ctk.CTkOptionMenu(self, values=list(self.keys), command=self.drawTable, anchor='center')
+        self.sort_drop_down.set(RANKING_LABELS['asymmetry_percentile'])
+        self.sort_drop_down.grid(row=0, column=0, padx=10, pady=10, sticky='w')
+
+        self.drawTable(self.sort_drop_down.get())
+
+
+    def drawTable(self, label):
+        """
+        Shows every ticker of the day ranked by a statistic, largest first. Clicking a column heading ranks by that column
+        and double-clicking a row opens the ticker on the Hedgeye page.\n
+        Args:\n
+            label (str): Column heading to rank by, one of the RANKING_LABELS values.
+        """
+        self.sort_drop_down.set(label)
+        data = summonHedgeyeRanking(self.date, by=self.keys[label])
+
+        # Setting color scheme based on color mode of computer
+        color_modes = {
+            'dark': ('#373737', '#4B4B4B', 'white'),
+            'light': ('#F0F0F0', '#D9D9D9', 'black')
+        }
+        row_color, row_color2, text_color = color_modes[self._get_appearance_mode()]
+
+        if self.table is not None:
+            self.table.destroy()
+        columns = ['Ticker'] + list(self.keys)
+        self.table = ttk.Treeview(self, columns=columns, show='headings')
+        for column in columns:
+            command = (lambda column=column: self.drawTable(column)) if column in self.keys else ''
+            self.table.heading(column, text=column, command=command)
+            self.table.column(column, width=110, anchor='e' if column in self.keys else 'w')
+
+        for i, row in enumerate(data):
+            values = ['' if row[column] is None else row[column] for column in columns] # No value for tickers missing a statistic
+            self.table.insert('', 'end', values=values, tags='even' if i % 2 == 0 else 'odd')
+
+        # Coloring the rows differently so the table is better contrasted
+        self.table.tag_configure('odd', background=row_color, foreground=text_color)
+        self.table.tag_configure('even', background=row_color2, foreground=text_color)
+        self.table.bind('<Double-1>', self.tickerAction)
+        self.table.grid(row=1, column=0, padx=10, pady=(0, 10), sticky='nsew')
+
+
+    def tickerAction(self, event):
+        """Shows the double-clicked ticker on the Hedgeye page."""
+        selected = self.table.focus()
+        if selected:
+            self.parent.reloadPage(target_date=self.date, target_tick=self.table.item(selected, 'values')[0])
@@ -1,13 +1,35 @@
 from DataCollection.web_controllers import fetchHedgeyeData, fetchCompositeData
-from DBControls.hedgeye_metrics import add_row as addHedgeyeRow
-from DBControls.composite_metrics import add_row as addCompositeRow
-from DBControls.db_read_write import Hedgeye, NASDAQ, NYSE
+from DBControls.hedgeye_metrics import add_rows as addHedgeyeRows, round_values as roundValues
+from DBControls.hedgeye_analytics import ranking as rankHedgeye
+from DBControls.hedgeye_correlation import correlation_on as correlationOn
+from DBControls.composite_metrics import add_rows as addCompositeRows, INDICATORS
+from DBControls.db_read_write import Hedgeye, NASDAQ, NYSE, IngestLog
+from DBControls.fast_read import readHedgeye, readComposite, readIndicators
+from DBControls.trading_calendar import trading_calendar
 from socket import create_connection
 from threading import Thread
-from tzlocal import get_localzone
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time, timezone
+from zoneinfo import ZoneInfo
 import json
 
+
+HEDGEYE_URL = 'https://app.hedgeye.com/feed_items/all?page=1&with_category=33-risk-range-signals' # Newest risk range signals
+MARKET_DIARY_URL = 'https://www.wsj.com/market-data/stocks/marketsdiary'
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+HEDGEYE_PUBLISH_TIME = time(8, 0) # Risk ranges are posted before the open
+MARKET_DIARY_PUBLISH_TIME = time(17, 0) # Diaries are final about an hour after the close
+RANKING_LABELS = { # hedgeye_analytics statistic -> column shown in the ranking view
+    'close': 'Close',
+    'asymmetry': 'Range Asym (%)',
+    'asymmetry_percentile': 'Range Asym Percentile',
+    'asymmetry_z': 'Range Asym Z-Score',
+    'range_width': 'Range Width (%)',
+    'range_width_percentile': 'Range Width Percentile',
+    'range_width_z': 'Range Width Z-Score',
+    'close_position': 'Close in Range',
+    'close_position_z': 'Close in Range Z-Score'
+}
+
 # Functions below are the middle man between the backend and the app
 
 def updateHedgeyeTable(url):
@@ -21,19 +43,17 @@ def updateHedgeyeTable(url):
     """
     data = fetchHedgeyeData(url)
     if type(data) == str:
+        IngestLog.record('Hedgeye', url, 'error', message=data)
         return data # Error message
 
+    outcome = 'new data' if not readHedgeye(date=data[0]) else 'no new data'
     try:
-        for stock in data[1]:
-            addHedgeyeRow(date=data[0], 
-                          ticker=stock['Ticker'], 
-                          description=stock['Description'], 
-                          buy=stock['Buy'], 
-                          sell=stock['Sell'], 
-                          close=stock['Close'])
+        addHedgeyeRows(data[0], data[1]) # One transaction for the whole risk range, also fixes the days after a backlogged one
     except:
+        IngestLog.record('Hedgeye', url, 'error', data_date=data[0], message='Cannot load newest Hedgeye data into database.')
         return 'Cannot load newest Hedgeye data into database.'
         
+    IngestLog.record('Hedgeye', url, outcome, data_date=data[0])
     return 0 # Successful
         
             
@@ -46,19 +66,20 @@ def updateCompositeTables():
     """
     data = fetchCompositeData()
     if type(data) == str:
+        IngestLog.record('Composites', MARKET_DIARY_URL, 'error', message=data)
         return data # Error message
     
+    outcome = 'new data' if readComposite(NASDAQ, date=data['Date']) == None else 'no new data'
     try:
-        addCompositeRow(NASDAQ, date=data['Date'], advancing_V=data['NASDAQ Advancing Volume'], declining_V=data['NASDAQ Declining Volume'], 
-                        total_V=data['NASDAQ Total Volume'], close=data['NASDAQ Close'], advances=data['NASDAQ Advances'], 
-                        declines=data['NASDAQ Declines'], new_highs=data['NASDAQ New Highs'], new_lows=data['NASDAQ New Lows'])
-            
-        addCompositeRow(NYSE, date=data['Date'], advancing_V=data['NYSE Advancing Volume'], declining_V=data['NYSE Declining Volume'], 
-                        total_V=data['NYSE Total Volume'], close=data['NYSE Close'], advances=data['NYSE Advances'], 
-                        declines=data['NYSE Declines'], new_highs=data['NYSE New Highs'], new_lows=data['NYSE New Lows'])
+        addCompositeRows(data['Date'], {table: {'advancing_V': data[f'{name} Advancing Volume'], 'declining_V': data[f'{name} Declining Volume'], 
+                                                'total_V': data[f'{name} Total Volume'], 'close': data[f'{name} Close'], 'advances': data[f'{name} Advances'], 
+                                                'declines': data[f'{name} Declines'], 'new_highs': data[f'{name} New Highs'], 'new_lows': data[f'{name} New Lows']}
+                                        for table, name in [(NASDAQ, 'NASDAQ'), (NYSE, 'NYSE')]}) # Both composites are committed together
     except:
+        IngestLog.record('Composites', MARKET_DIARY_URL, 'error', data_date=data['Date'], message='Cannot load newest NASDAQ or NYSE data into database.')
         return 'Cannot load newest NASDAQ or NYSE data into database.'
         
+    IngestLog.record('Composites', MARKET_DIARY_URL, outcome, data_date=data['Date'])
     return 0 # Successful
 
 
@@ -92,6 +113,43 @@ def connectedToWiFi():
         return False
     
     
+def lastPublication(now, publish_time):
+    """
+    Finds the most recent trading-session moment, at or before now, when a source publishes.\n
+    Args:\n
+        now (datetime): Timezone aware current time.\n
+        publish_time (time): Time of day the source publishes, in market (New York) time.\n
+    Returns:\n
+        datetime: The publication moment in UTC.
+    """
+    market_now = now.astimezone(MARKET_TIMEZONE)
+    day = market_now.date()
+    if market_now.time() < publish_time:
+        day -= timedelta(days=1)
+    day = datetime.strptime(trading_calendar.sessionOnOrBefore(day), '%Y-%m-%d').date() # Nothing is published on weekends and holidays
+    return datetime.combine(day, publish_time, tzinfo=MARKET_TIMEZONE).astimezone(timezone.utc)
+
+
+def fetchedSince(source, url, publication):
+    """
+    Checks the ingest log for a successful fetch of a source after its last publication that returned the data published then. 
+    If there was one, fetching again cannot return anything newer (e.g. on a market holiday, or when launching before publication time).
+    A fetch that ran after the publication time but still got an older session (the site was late) does not count, so it is retried.\n
+    Args:\n
+        source (str): 'Hedgeye' or 'Composites'.\n
+        url (str): Page the fetch must have scraped.\n
+        publication (datetime): Timezone aware result of `lastPublication`.\n
+    Returns:\n
+        bool: True = already fetched since the publication.
+    """
+    last = IngestLog.getLastFetch(source, url=url)
+    if last is None or last.data_date is None:
+        return False
+    
+    published_session = datetime.strftime(publication.astimezone(MARKET_TIMEZONE).date(), '%Y-%m-%d')
+    return datetime.fromisoformat(last.fetched_at) >= publication and last.data_date >= published_session
+    
+    
 # ------------------------------------------------------------------------------
 # Functions called while interacting with the pages
     
@@ -104,25 +162,30 @@ def updateDatabase(hedgeye_url):
     Returns:\n
         list: If [0,0], then total success. Else, it will be a list of error messages.
     """
-    current_time = datetime.now(get_localzone()) # Gets the time of where the computer is
+    current_time = datetime.now(MARKET_TIMEZONE) # Sessions and publication times are New York dates and times, wherever the computer is
     todays_date = datetime.strftime(current_time.date(), '%Y-%m-%d')
-    yesterdays_date = datetime.strftime(current_time.date() - timedelta(days=1), '%Y-%m-%d')
     j1, j2 = False, False
     
     if not connectedToWiFi():
         return 'WiFi is down. Please check your connection.'
-    
-    if current_time.weekday() in [5, 6]: # Do not scrape data on weekends
-        return [0, 0]
 
-    # Request new data if todays date is not in the database, or the user is making a backlog request
-    if todays_date != Hedgeye.getAllDates()[-1] or hedgeye_url != 'https://app.hedgeye.com/feed_items/all?page=1&with_category=33-risk-range-signals':
+    # Request new data if the user is making a backlog request, or today is a trading day whose risk ranges are not in
+    # the database and nothing was published since the last successful fetch (no scrapes on weekends and holidays)
+    hedgeye_fetched = fetchedSince('Hedgeye', HEDGEYE_URL, lastPublication(current_time, HEDGEYE_PUBLISH_TIME))
+    trading_today = trading_calendar.isTradingDay(todays_date)
+    if hedgeye_url != HEDGEYE_URL or (trading_today and todays_date != Hedgeye.getLatestDate() and not hedgeye_fetched):
         thread1 = ThreadUpdate(target=updateHedgeyeTable, args=(hedgeye_url,))
         thread1.start()
         j1 = True
 
-    # Request new data if yesterdays date is not in the database, or (its past 4 PM and todays date is not in the database)
-    if NASDAQ.getData(date=yesterdays_date) == None or (current_time.hour > 16 and NASDAQ.getData(date=todays_date) == None):
+    # Request new data if the newest diary that can exist (today's once it is published, otherwise the previous
+    # session's) is not in the database, unless the diary was already fetched since it was last published
+    market_date = current_time.date()
+    if trading_calendar.isTradingDay(market_date) and current_time.time() >= MARKET_DIARY_PUBLISH_TIME:
+        diary_date = datetime.strftime(market_date, '%Y-%m-%d')
+    else:
+        diary_date = trading_calendar.previousSession(market_date)
+    if readComposite(NASDAQ, date=diary_date) == None and not fetchedSince('Composites', MARKET_DIARY_URL, lastPublication(current_time, MARKET_DIARY_PUBLISH_TIME)):
         thread2 = ThreadUpdate(target=updateCompositeTables)
         thread2.start()
         j2 = True
@@ -156,7 +219,7 @@ def summonHedgeyeData(date=None, ticker=None, all_dates=False):
         return Hedgeye.getAllDates()
         
     data = []
-    results = Hedgeye.getData(date=date, ticker=ticker)
+    results = readHedgeye(date=date, ticker=ticker)
     tens_close = 0
     twos_close = 0
     
@@ -190,6 +253,55 @@ def summonHedgeyeData(date=None, ticker=None, all_dates=False):
     return data
 
 
+def summonHedgeyeSeries(ticker, days=None):
+    """
+    Gets a ticker's buy, sell, and close history as arrays for graphing.
+    Reference the Hedgeye class in dbReadWrite.py for how getSeries is used.\n
+    Args:\n
+        ticker (str): 'ABC...Z'.\n
+        days (int, optional): Only get the last `days` calendar days of data. Defaults to None (all data).\n
+    Returns:\n
+        dict: {'date': datetime64[D] array, 'buy': array, 'sell': array, 'close': array}.
+    """
+    return Hedgeye.getSeries(ticker, columns=('buy', 'sell', 'close'), days=days)
+
+
+def summonHedgeyeRanking(date=None, by='asymmetry_percentile'):
+    """
+    Ranks every ticker of a day by a cross-sectional statistic, for the universe view.
+    Reference hedgeye_analytics.py for the statistics.\n
+    Args:\n
+        date (str, optional): 'yyyy-mm-dd'. Defaults to None (latest date).\n
+        by (str, optional): Key of RANKING_LABELS to sort by, largest first. Defaults to 'asymmetry_percentile'.\n
+    Returns:\n
+        list: List of dictionaries with data, keyed by 'Ticker' and the labels in RANKING_LABELS.
+    """
+    date = date or Hedgeye.getLatestDate()
+    if date is None:
+        return []
+    
+    return [{'Ticker': r['ticker'], **{label: r[key] for key, label in RANKING_LABELS.items()}} for r in rankHedgeye(date, by=by)]
+
+
+def summonHedgeyeCorrelation(date=None, window=60):
+    """
+    Gets the rolling correlation of every pair of tickers on a day, for the correlation view. Only that day's window is read.
+    Reference hedgeye_correlation.py for how the windows are computed and cached.\n
+    Args:\n
+        date (str, optional): 'yyyy-mm-dd'. Defaults to None (latest date).\n
+        window (int, optional): Days with data per window. Defaults to 60.\n
+    Returns:\n
+        dict: {'Tickers': list of symbols, 'Correlation': list of rows, None where a pair has too little shared data}.
+    """
+    date = date or Hedgeye.getLatestDate()
+    if date is None:
+        return {'Tickers': [], 'Correlation': []}
+    
+    tickers, correlation = correlationOn(date, window=window)
+    return {'Tickers': list(tickers),
+            'Correlation': [roundValues(row) for row in correlation] if correlation is not None else []}
+
+
 def summonNasdaqData(date=None, all_dates=False):
     """
     Gets desired data from database and formats it for GUI use.
@@ -203,7 +315,7 @@ def summonNasdaqData(date=None, all_dates=False):
     if all_dates:
         return NASDAQ.getAllDates()
 
-    results = NASDAQ.getData(date=date)
+    results = readComposite(NASDAQ, date=date)
     if results:
         return {
             'Date': results.date,
@@ -227,7 +339,8 @@ def summonNasdaqData(date=None, all_dates=False):
             'New Lows': results.new_lows,
             'Net (Highs/Lows)': results.net_hl,
             '21-Day Average (Highs/Lows)': results.tod_avg,
-            '63-Day Average (Highs/Lows)': results.std_avg
+            '63-Day Average (Highs/Lows)': results.std_avg,
+            **summonIndicators(NASDAQ, results.date)
         }
     return results # None
     
@@ -245,7 +358,7 @@ def summonNyseData(date=None, all_dates=False):
     if all_dates:
         return NYSE.getAllDates()
         
-    results = NYSE.getData(date=date)
+    results = readComposite(NYSE, date=date)
     if results:
         return {
             'Date': results.date,
@@ -269,9 +382,23 @@ def summonNyseData(date=None, all_dates=False):
             'New Lows': results.new_lows,
             'Net (Highs/Lows)': results.net_hl,
             '21-Day Average (Highs/Lows)': results.tod_avg,
-            '63-Day Average (Highs/Lows)': results.std_avg
+            '63-Day Average (Highs/Lows)': results.std_avg,
+            **summonIndicators(NYSE, results.date)
         }
     return results # None
+
+
+def summonIndicators(table, date):
+    """
+    Gets the registered breadth indicators of a composite row, in registration order, for GUI use.\n
+    Args:\n
+        table (Table object): NASDAQ or NYSE.\n
+        date (str): 'yyyy-mm-dd'.\n
+    Returns:\n
+        dict: {label: value}. None for indicators without a stored value (run `python -m DBControls.recompute` to fill them in).
+    """
+    values = readIndicators(table, date=date)
+    return {indicator.label: values.get(name) for name, indicator in INDICATORS.items() if indicator.label is not None}
     
     
 def getCredentials():
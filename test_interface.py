@@ -0,0 +1,108 @@
+from interface import lastPublication, fetchedSince, updateCompositeTables, summonHedgeyeRanking, RANKING_LABELS, HEDGEYE_PUBLISH_TIME, MARKET_DIARY_PUBLISH_TIME, MARKET_TIMEZONE
+from DBControls.db_read_write import IngestLog, NASDAQ, NYSE, createSession
+from DBControls.composite_metrics import recompute_indicators, verify_state
+from DBControls.hedgeye_metrics import add_rows
+from DBControls.fast_read import readIndicators, readIndicatorHistory
+from DBControls.trading_calendar import trading_calendar
+from DBControls.day_numbers import fromDayNumber
+from DBControls.temporary_database import TemporaryDatabaseTestCase
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from unittest import mock
+import numpy as np
+import interface
+import unittest
+
+
+def marketTime(text):
+    """'yyyy-mm-dd hh:mm' in New York time."""
+    return datetime.strptime(text, '%Y-%m-%d %H:%M').replace(tzinfo=MARKET_TIMEZONE)
+
+
+class TestFetchedSince(TemporaryDatabaseTestCase):
+    def logFetch(self, source, fetched_at, data_date, outcome='new data'):
+        with createSession() as session:
+            session.add(IngestLog(source=source, url='url', fetched_at=marketTime(fetched_at).astimezone(timezone.utc).isoformat(timespec='seconds'),
+                                  data_date=data_date, outcome=outcome))
+            session.commit()
+
+    def test_last_publication(self):
+        """Before publication time, on weekends, and on holidays the last publication is an earlier session's."""
+        self.assertEqual(lastPublication(marketTime('2023-07-05 09:00'), HEDGEYE_PUBLISH_TIME), marketTime('2023-07-05 08:00'))
+        self.assertEqual(lastPublication(marketTime('2023-07-05 07:00'), HEDGEYE_PUBLISH_TIME), marketTime('2023-07-03 08:00')) # 07-04 is a holiday
+        self.assertEqual(lastPublication(marketTime('2023-07-09 12:00'), MARKET_DIARY_PUBLISH_TIME), marketTime('2023-07-07 17:00'))
+
+        in_tokyo = marketTime('2023-07-05 09:00').astimezone(ZoneInfo('Asia/Tokyo')) # 22:00 there, the computer's time zone does not matter
+        self.assertEqual(lastPublication(in_tokyo, HEDGEYE_PUBLISH_TIME), marketTime('2023-07-05 08:00'))
+
+    def test_skips_when_published_session_was_fetched(self):
+        """A fetch after the publication that returned its session proves fetching again is pointless."""
+        self.logFetch('Hedgeye', '2023-07-03 09:00', '2023-07-03')
+        self.assertTrue(fetchedSince('Hedgeye', 'url', lastPublication(marketTime('2023-07-04 10:00'), HEDGEYE_PUBLISH_TIME))) # Holiday
+
+    def test_retries_late_publication(self):
+        """A fetch after the publication time that still got the previous session is retried."""
+        self.logFetch('Composites', '2023-07-05 17:05', '2023-07-03')
+        publication = lastPublication(marketTime('2023-07-05 18:00'), MARKET_DIARY_PUBLISH_TIME)
+        self.assertFalse(fetchedSince('Composites', 'url', publication))
+
+        self.logFetch('Composites', '2023-07-05 17:30', '2023-07-05')
+        self.assertTrue(fetchedSince('Composites', 'url', publication))
+
+    def test_retries_old_or_failed_fetch(self):
+        """Fetches before the publication, errors, and other sources or URLs do not count."""
+        self.logFetch('Hedgeye', '2023-07-05 07:30', '2023-07-03')
+        self.logFetch('Hedgeye', '2023-07-05 08:30', None, outcome='error')
+        self.logFetch('Composites', '2023-07-05 08:30', '2023-07-05')
+        publication = lastPublication(marketTime('2023-07-05 09:00'), HEDGEYE_PUBLISH_TIME)
+
+        self.assertFalse(fetchedSince('Hedgeye', 'url', publication))
+        self.assertFalse(fetchedSince('Hedgeye', 'other url', publication))
+
+
+class TestUpdateCompositeTables(TemporaryDatabaseTestCase):
+    def diary(self, date, random):
+        """What fetchCompositeData returns for one session."""
+        data = {'Date': date}
+        for name in ['NASDAQ', 'NYSE']:
+            for label in ['Advancing Volume', 'Declining Volume', 'Total Volume', 'Advances', 'Declines', 'New Highs', 'New Lows', 'Close']:
+                data[f'{name} {label}'] = float(random.integers(1, 3000))
+        return data
+
+    def ingest(self, data):
+        with mock.patch.object(interface, 'fetchCompositeData', return_value=data):
+            self.assertEqual(updateCompositeTables(), 0)
+
+    def test_backlog_rewrites_later_indicators(self):
+        """A backlogged diary rewrites the stored indicators of every later session, for both composites."""
+        random = np.random.default_rng(5)
+        sessions = [fromDayNumber(day) for day in trading_calendar.sessionDays('2023-02-01', '2023-03-31')][:41]
+        diaries = {date: self.diary(date, random) for date in sessions}
+        for date in sessions:
+            if date != sessions[10]:
+                self.ingest(diaries[date])
+        before = readIndicators(NASDAQ, date=sessions[-2])['mcclellan_summation']
+        
+        self.ingest(diaries[sessions[10]])
+        self.assertNotEqual(readIndicators(NASDAQ, date=sessions[-2])['mcclellan_summation'], before)
+        for table in [NASDAQ, NYSE]:
+            stored = readIndicatorHistory(table)
+            self.assertEqual(recompute_indicators(table), 0) # Nothing left for a full rebuild to change
+            self.assertEqual(readIndicatorHistory(table), stored)
+            self.assertEqual(verify_state(table, tolerance=0), [])
+
+
+class TestSummonHedgeyeRanking(TemporaryDatabaseTestCase):
+    def test_columns_and_order(self):
+        """Every ranking column is labelled and the rows come largest first by the chosen statistic."""
+        self.assertEqual(summonHedgeyeRanking(), [])
+        add_rows('2023-01-03', [{'Ticker': ticker, 'Description': ticker, 'Buy': buy, 'Sell': 9.0, 'Close': 10.0} 
+                                for ticker, buy in [('ABC', 11.0), ('DEF', 13.0), ('GHI', 12.0)]])
+        
+        rows = summonHedgeyeRanking(by='range_width')
+        self.assertEqual(list(rows[0]), ['Ticker'] + list(RANKING_LABELS.values()))
+        self.assertEqual([row['Ticker'] for row in rows], ['DEF', 'GHI', 'ABC'])
+
+
+if __name__ == '__main__':
+    unittest.main()